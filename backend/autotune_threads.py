@@ -0,0 +1,166 @@
+"""
+Thread-Pool Auto-Tuning
+
+Finds the split of cores between worker processes, torch intra-op threads
+and OpenCV threads that gives the highest throughput on this machine.
+Every candidate runs W worker processes side by side (as serve.py would),
+each configured through runtime_config.apply_runtime_config and looping
+over the workload for a fixed time. The library defaults (every pool
+sized to all cores) are measured as a baseline for each worker count.
+
+Workloads:
+    pipeline - frame extraction + face detection + ViT on a fixture video
+    vit      - ViT inference only, on random face crops
+
+Usage:
+    python autotune_threads.py
+    python autotune_threads.py --workload vit --duration 10
+    python autotune_threads.py --workers 1 2 4 --pin_cores --output tune.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import time
+from typing import Dict, List, Optional
+
+from runtime_config import apply_runtime_config, available_cores
+
+def powers_of_two(limit: int) -> List[int]:
+    """1, 2, 4, ... up to and including limit (limit itself is always included)"""
+    values, value = [], 1
+    while value < limit:
+        values.append(value)
+        value *= 2
+    return values + [limit]
+
+def candidate_configs(cores: int, worker_counts: List[int]) -> List[Dict]:
+    """Baseline plus explicit splits with workers * torch_threads <= cores"""
+    configs = []
+    for workers in worker_counts:
+        configs.append({'workers': workers, 'torch_threads': None, 'opencv_threads': None})
+        for threads in powers_of_two(max(1, cores // workers)):
+            for opencv_threads in sorted({1, threads}):
+                configs.append({'workers': workers, 'torch_threads': threads, 'opencv_threads': opencv_threads})
+    return configs
+
+def label(config: Dict) -> str:
+    if config['torch_threads'] is None:
+        return f"{config['workers']} worker(s), library defaults"
+    return (f"{config['workers']} worker(s) x {config['torch_threads']} torch / "
+            f"{config['opencv_threads']} OpenCV thread(s)")
+
+def worker_loop(index: int, config: Dict, args, barrier, results):
+    """One worker process: configure threads, warm up, then report items/sec over args.duration"""
+    import numpy as np
+    from vit_model import load_vit_model, predict_with_vit
+
+    affinity = None
+    if args.pin_cores and config['torch_threads']:
+        cores = available_cores()
+        start = index * config['torch_threads']
+        affinity = ','.join(str(cores[(start + i) % len(cores)]) for i in range(config['torch_threads']))
+    apply_runtime_config(
+        torch_threads=config['torch_threads'],
+        opencv_threads=config['opencv_threads'],
+        cpu_affinity=affinity
+    )
+
+    model = load_vit_model(args.model_path)
+    rng = np.random.default_rng(index)
+    crops = [rng.integers(0, 255, (224, 224, 3), dtype=np.uint8) for _ in range(args.num_frames)]
+
+    def run_item():
+        if args.workload == 'pipeline':
+            from enhanced_processor import extract_frames_smart, detect_and_crop_faces
+            frames, _ = extract_frames_smart(args.video, num_frames=args.num_frames)
+            faces, _ = detect_and_crop_faces(frames)
+            predict_with_vit(model, faces or crops)
+        else:
+            predict_with_vit(model, crops)
+
+    run_item()
+    barrier.wait()
+
+    items = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < args.duration:
+        run_item()
+        items += 1
+    results.put(items / (time.perf_counter() - start))
+
+def measure(config: Dict, args) -> float:
+    """Items/sec across all workers for one configuration"""
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(config['workers'])
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=worker_loop, args=(i, config, args, barrier, results))
+        for i in range(config['workers'])
+    ]
+    for process in processes:
+        process.start()
+    total = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return total
+
+def main(args):
+    cores = len(available_cores())
+    worker_counts = args.workers or powers_of_two(cores)
+
+    if args.workload == 'pipeline' and not args.video:
+        from synthetic_videos import make_video_set
+        args.video = make_video_set('benchmark_videos', resolutions=((320, 240),),
+                                    lengths=(2.0,), codecs=('mp4v',))[0]['path']
+
+    configs = candidate_configs(cores, worker_counts)
+    print(f"Tuning on {cores} core(s), workload '{args.workload}', "
+          f"{len(configs)} configurations x {args.duration:.0f}s")
+
+    results = []
+    for config in configs:
+        rate = measure(config, args)
+        results.append({**config, 'items_per_sec': round(rate, 3)})
+        print(f"   {label(config):50s} {rate:8.3f} items/s")
+
+    best = max(results, key=lambda r: r['items_per_sec'])
+    baseline: Optional[Dict] = next(
+        (r for r in results if r['workers'] == best['workers'] and r['torch_threads'] is None), None
+    )
+
+    print(f"\n{'='*60}")
+    print(f"Best: {label(best)} -> {best['items_per_sec']:.3f} items/s")
+    if baseline and baseline['items_per_sec'] > 0:
+        print(f"      {best['items_per_sec'] / baseline['items_per_sec']:.2f}x the library defaults "
+              f"with the same worker count")
+    if best['torch_threads'] is not None:
+        print(f"\nTORCH_NUM_THREADS={best['torch_threads']} OPENCV_NUM_THREADS={best['opencv_threads']} "
+              f"python serve.py --workers {best['workers']}{' --pin_cores' if args.pin_cores else ''}")
+    print(f"{'='*60}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cores': cores, 'workload': args.workload, 'results': results, 'best': best}, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Find the best torch/OpenCV thread split for this machine')
+    parser.add_argument('--workload', choices=['pipeline', 'vit'], default='pipeline',
+                        help='What each worker runs in a loop')
+    parser.add_argument('--video', type=str, default=None,
+                        help='Fixture video for the pipeline workload (synthetic if omitted)')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Worker counts to try (default: powers of two up to the core count)')
+    parser.add_argument('--pin_cores', action='store_true',
+                        help='Bind each worker to its own cores, as serve.py --pin_cores does')
+    parser.add_argument('--num_frames', type=int, default=10,
+                        help='Frames per item')
+    parser.add_argument('--duration', type=float, default=15.0,
+                        help='Seconds to run each configuration')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='Weights to load (random init if omitted)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write JSON report to this path')
+
+    main(parser.parse_args())
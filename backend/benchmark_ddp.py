@@ -0,0 +1,141 @@
+"""
+DDP Scaling Benchmark on a Single CPU Node
+
+Spawns 1, 2 and 4 local processes over the gloo backend, trains the ViT
+on random sequences split with DistributedSampler, and reports aggregate
+throughput and scaling efficiency. This exercises the same
+setup_distributed/train_epoch path that torchrun uses, without needing a
+dataset.
+
+Usage:
+    python benchmark_ddp.py
+    python benchmark_ddp.py --world_sizes 1 2 4 --samples 16 --num_frames 8
+    python benchmark_ddp.py --output ddp_scaling.json
+
+Real multi-process training on one machine:
+    torchrun --standalone --nproc_per_node=2 train_vit.py --train_dir data/train --val_dir data/val
+"""
+
+import argparse
+import json
+import os
+import socket
+import time
+
+import torch
+import torch.multiprocessing as mp
+
+def find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def worker(rank, world_size, port, args, queue):
+    """One DDP rank: train one epoch on synthetic data"""
+    os.environ.update({
+        'RANK': str(rank),
+        'WORLD_SIZE': str(world_size),
+        'LOCAL_WORLD_SIZE': str(world_size),
+        'MASTER_ADDR': '127.0.0.1',
+        'MASTER_PORT': str(port)
+    })
+
+    import torch.nn as nn
+    import torch.distributed as dist
+    from torch.nn.parallel import DistributedDataParallel as DDP
+    from torch.utils.data import DataLoader, TensorDataset
+    from torch.utils.data.distributed import DistributedSampler
+    from vit_model import ViTDeepfakeDetector
+    from train_vit import setup_distributed, train_epoch
+
+    threads = max(1, args.total_threads // world_size)
+    torch.set_num_threads(threads)
+    setup_distributed(threads_per_proc=threads)
+
+    generator = torch.Generator().manual_seed(0)
+    dataset = TensorDataset(
+        torch.randn(args.samples, args.num_frames, 3, 224, 224, generator=generator),
+        torch.randint(0, 2, (args.samples,), generator=generator)
+    )
+    sampler = DistributedSampler(dataset, shuffle=True) if world_size > 1 else None
+    loader = DataLoader(dataset, batch_size=args.batch_size, sampler=sampler, shuffle=sampler is None)
+
+    torch.manual_seed(0)
+    model = ViTDeepfakeDetector(
+        img_size=224,
+        patch_size=16,
+        embed_dim=384,
+        depth=6,
+        num_heads=6,
+        dropout=0.1
+    )
+    if world_size > 1:
+        model = DDP(model)
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+
+    if world_size > 1:
+        dist.barrier()
+    start = time.perf_counter()
+    train_loss, _, perf = train_epoch(model, loader, nn.CrossEntropyLoss(), optimizer, torch.device('cpu'))
+    elapsed = time.perf_counter() - start
+
+    if rank == 0:
+        queue.put({
+            'world_size': world_size,
+            'threads_per_proc': threads,
+            'epoch_seconds': round(elapsed, 3),
+            'samples_per_sec': round(args.samples / elapsed, 3),
+            'step_time': round(perf['step_time'], 3),
+            'train_loss': round(train_loss, 4)
+        })
+
+    if world_size > 1:
+        dist.destroy_process_group()
+
+def main(args):
+    ctx = mp.get_context('spawn')
+    results = []
+
+    for world_size in args.world_sizes:
+        queue = ctx.Queue()
+        port = find_free_port()
+        mp.start_processes(worker, args=(world_size, port, args, queue), nprocs=world_size,
+                           join=True, start_method='spawn')
+        result = queue.get()
+        results.append(result)
+        print(f"✓ {world_size} process(es): {result['samples_per_sec']:.2f} samples/s "
+              f"({result['epoch_seconds']:.1f}s/epoch)")
+
+    baseline = next((r for r in results if r['world_size'] == 1), results[0])
+    for r in results:
+        speedup = r['samples_per_sec'] / baseline['samples_per_sec']
+        r['speedup'] = round(speedup, 3)
+        r['efficiency'] = round(speedup / (r['world_size'] / baseline['world_size']), 3)
+
+    print(f"\n{'='*60}")
+    print(f"{'procs':>6} {'samples/s':>10} {'speedup':>8} {'efficiency':>11}")
+    for r in results:
+        print(f"{r['world_size']:>6} {r['samples_per_sec']:>10.2f} {r['speedup']:>7.2f}x {r['efficiency']:>10.0%}")
+    print(f"{'='*60}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark DDP scaling over local CPU processes')
+    parser.add_argument('--world_sizes', type=int, nargs='+', default=[1, 2, 4],
+                        help='Process counts to benchmark')
+    parser.add_argument('--samples', type=int, default=16,
+                        help='Synthetic sequences per epoch')
+    parser.add_argument('--num_frames', type=int, default=8,
+                        help='Frames per sequence')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='Per-process batch size')
+    parser.add_argument('--total_threads', type=int, default=os.cpu_count() or 1,
+                        help='Cores to split across processes')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write JSON report to this path')
+
+    main(parser.parse_args())
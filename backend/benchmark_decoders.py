@@ -0,0 +1,151 @@
+"""
+Video Decoder Backends: Decode Time vs Detection
+
+Runs extract_frames_smart with each decoder configuration (backend x
+output size x keyframes-only) on HD synthetic videos (synthetic_videos.py)
+or on --videos, then face detection on the frames it returned, and reports
+per video and configuration:
+
+    decode   - median extract_frames_smart seconds (decode + quality filter)
+    detect   - median detect_and_crop_faces seconds on those frames
+    frames   - frames decoded / selected
+    faces    - faces detected (lower output sizes can miss small faces)
+    speedup  - decode + detect vs opencv at full resolution
+
+Backends that are not installed (ffmpeg without the ffmpeg/ffprobe binaries)
+are skipped. Pick the winner with VIDEO_DECODER, DECODE_MAX_SIDE and
+DECODE_KEYFRAMES_ONLY.
+
+Usage:
+    python benchmark_decoders.py
+    python benchmark_decoders.py --videos upload1.mp4 upload2.webm --max_sides 0 720 480 --keyframes
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from enhanced_processor import DECODERS, FFmpegDecoder, extract_frames_smart, detect_and_crop_faces
+from benchmark_pipeline import summarize
+from synthetic_videos import make_video_set
+
+def decoder_configs(args) -> List[Dict]:
+    """open_video option sets to compare; the first is the reference"""
+    backends = [b for b in args.backends if b != 'ffmpeg' or FFmpegDecoder.available()]
+    if len(backends) < len(args.backends):
+        print("⚠ ffmpeg/ffprobe not found on PATH; skipping the ffmpeg backend")
+
+    configs = [{'backend': 'opencv', 'max_side': 0, 'keyframes_only': False}]
+    for backend in backends:
+        for max_side in args.max_sides:
+            config = {'backend': backend, 'max_side': max_side, 'keyframes_only': False}
+            if config not in configs:
+                configs.append(config)
+        if args.keyframes and backend == 'ffmpeg':
+            configs.extend({'backend': backend, 'max_side': max_side, 'keyframes_only': True}
+                           for max_side in args.max_sides)
+    return configs
+
+def config_name(config: Dict) -> str:
+    name = f"{config['backend']}@{config['max_side'] or 'full'}"
+    return name + '+keyframes' if config['keyframes_only'] else name
+
+def time_config(path: str, config: Dict, args) -> Dict:
+    """Median decode/detect seconds of one configuration on one video"""
+    decode, detect = [], []
+    for repeat in range(args.repeats + 1):
+        start = time.perf_counter()
+        frames, metadata = extract_frames_smart(path, num_frames=args.num_frames, decode_options=config)
+        decode_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, stats = detect_and_crop_faces(frames, verify_with_eyes=True)
+        detect_seconds = time.perf_counter() - start
+
+        # First pass is an untimed warm-up
+        if repeat > 0:
+            decode.append(decode_seconds)
+            detect.append(detect_seconds)
+
+    return {
+        'decode': summarize(decode),
+        'detect': summarize(detect),
+        'frames_decoded': metadata['frames_decoded'],
+        'frames_selected': metadata['selected_frames'],
+        'frame_size': list(frames[0].shape[1::-1]) if frames else None,
+        'faces_detected': stats['faces_detected'],
+        'fallback_used': stats['fallback_used']
+    }
+
+def main(args):
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.videos:
+        videos = [{'name': Path(p).name, 'path': p} for p in args.videos]
+    else:
+        resolutions = tuple(tuple(int(v) for v in r.split('x')) for r in args.resolutions)
+        print(f"Generating synthetic videos in {args.video_dir}...")
+        videos = [v for v in make_video_set(args.video_dir, resolutions=resolutions,
+                                            lengths=(args.length,), codecs=tuple(args.codecs))
+                  if not v['manipulated']]
+    if not videos:
+        raise SystemExit("No videos to benchmark")
+
+    configs = decoder_configs(args)
+    report = {'num_frames': args.num_frames, 'repeats': args.repeats, 'videos': {}}
+
+    for video in videos:
+        print(f"\n▶ {video['name']}")
+        results = {}
+        for config in configs:
+            name = config_name(config)
+            results[name] = {**config, **time_config(video['path'], config, args)}
+
+        reference = results[config_name(configs[0])]
+        reference_total = reference['decode']['median'] + reference['detect']['median']
+        print(f"   {'config':24s} {'decode':>9s} {'detect':>9s} {'frames':>7s} {'size':>10s} {'faces':>5s} {'speedup':>7s}")
+        for name, r in results.items():
+            total = r['decode']['median'] + r['detect']['median']
+            r['speedup'] = round(reference_total / total, 3) if total > 0 else None
+            size = 'x'.join(map(str, r['frame_size'])) if r['frame_size'] else '-'
+            print(f"   {name:24s} {r['decode']['median'] * 1000:7.1f}ms {r['detect']['median'] * 1000:7.1f}ms "
+                  f"{r['frames_decoded']:3d}/{r['frames_selected']:<3d} {size:>10s} {r['faces_detected']:5d} "
+                  f"{r['speedup'] or 0:6.2f}x")
+        report['videos'][video['name']] = results
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare video decoder backends on decode time and face detection')
+    parser.add_argument('--videos', type=str, nargs='+', default=None,
+                        help='Videos to decode (default: generate synthetic HD clips)')
+    parser.add_argument('--video_dir', type=str, default='benchmark_videos',
+                        help='Where synthetic videos are generated (reused between runs)')
+    parser.add_argument('--resolutions', type=str, nargs='+', default=['1280x720', '1920x1080'],
+                        help='Synthetic video sizes as WIDTHxHEIGHT')
+    parser.add_argument('--length', type=float, default=10.0,
+                        help='Synthetic clip length in seconds')
+    parser.add_argument('--codecs', type=str, nargs='+', default=['mp4v'],
+                        help='FourCC codecs for synthetic clips')
+    parser.add_argument('--backends', type=str, nargs='+', default=sorted(DECODERS), choices=sorted(DECODERS),
+                        help='Decoder backends to compare')
+    parser.add_argument('--max_sides', type=int, nargs='+', default=[0, 720],
+                        help='DECODE_MAX_SIDE values (0 = full resolution)')
+    parser.add_argument('--keyframes', action='store_true',
+                        help='Also time keyframes-only decoding (ffmpeg backend)')
+    parser.add_argument('--num_frames', type=int, default=30,
+                        help='Frames requested from extract_frames_smart')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Timed runs per configuration')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write JSON report to this path')
+
+    main(parser.parse_args())
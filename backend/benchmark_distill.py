@@ -0,0 +1,116 @@
+"""
+Teacher vs Distilled Student: Latency and Accuracy Trade-off
+
+Loads each model with load_vit_model (the architecture comes from the
+weights file, so a student trained with train_vit.py --distill_from loads
+the same way as the full detector) and reports per model:
+
+    parameters, tokens per frame, depth
+    latency        - mean seconds per sequence (one video, batch size 1)
+    speedup        - vs the first model (the reference, usually the teacher)
+    accuracy       - on --val_dir if given
+    agreement      - share of predictions matching the reference model
+    max_fake_diff  - largest fake-probability gap to the reference
+
+Usage:
+    python benchmark_distill.py --models models/model_best.safetensors models/student_model_best.safetensors
+    python benchmark_distill.py --models models/model_best.pt models/student_model_best.pt --val_dir data/val --output distill.json
+"""
+
+import argparse
+import json
+import time
+
+import torch
+
+from vit_model import load_vit_model
+from benchmark_precision import load_batches
+
+def time_model(model, batches, warmup: int = 1):
+    """Per-sequence latency (seconds) and fake probabilities over all batches"""
+    probabilities = []
+    latencies = []
+    with torch.no_grad():
+        for sequences in batches[:warmup]:
+            model(sequences[:1])
+
+        for sequences in batches:
+            for sequence in sequences.split(1):
+                start = time.perf_counter()
+                logits = model(sequence)
+                latencies.append(time.perf_counter() - start)
+                probabilities.append(torch.softmax(logits.float(), dim=1)[:, 1])
+
+    return sum(latencies) / len(latencies), torch.cat(probabilities).cpu()
+
+def describe(model) -> dict:
+    config = model.config
+    return {
+        'depth': config['depth'],
+        'embed_dim': config['embed_dim'],
+        'patch_size': config['patch_size'],
+        'tokens_per_frame': (config['img_size'] // config['patch_size']) ** 2 + 1,
+        'parameters': sum(p.numel() for p in model.parameters())
+    }
+
+def main(args):
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Using device: {device}")
+
+    batches, labels = load_batches(args, device)
+    if not batches:
+        raise SystemExit("No sequences to benchmark")
+
+    results = []
+    reference_probs = None
+    for path in args.models:
+        print(f"\nBenchmarking {path}...")
+        try:
+            model = load_vit_model(path, device=device, strict=True)
+        except Exception as e:
+            raise SystemExit(f"Could not load {path}: {e}")
+        latency, fake_probs = time_model(model, batches)
+        predictions = fake_probs >= 0.5
+
+        entry = {'model': path, **describe(model), 'latency': round(latency, 4)}
+        if reference_probs is None:
+            reference_probs, reference_latency = fake_probs, latency
+        entry['speedup'] = round(reference_latency / latency, 3)
+        entry['agreement'] = round(((reference_probs >= 0.5) == predictions).float().mean().item(), 4)
+        entry['max_fake_diff'] = round((reference_probs - fake_probs).abs().max().item(), 4)
+        if labels is not None:
+            entry['accuracy'] = round((predictions.long() == labels).float().mean().item(), 4)
+        results.append(entry)
+
+        del model
+
+    print(f"\n{'='*60}")
+    print(f"{'model':40s} {'params':>11s} {'tokens':>6s} {'depth':>5s} "
+          f"{'latency':>8s} {'speedup':>7s} {'agree':>6s} {'accuracy':>8s}")
+    for r in results:
+        accuracy = f"{r['accuracy']:.2%}" if 'accuracy' in r else '-'
+        print(f"{r['model'][-40:]:40s} {r['parameters']:11,d} {r['tokens_per_frame']:6d} {r['depth']:5d} "
+              f"{r['latency']:7.3f}s {r['speedup']:6.2f}x {r['agreement']:6.1%} {accuracy:>8s}")
+    print(f"{'='*60}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'device': str(device), 'num_frames': args.num_frames, 'results': results}, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare latency and accuracy of the ViT and distilled students')
+    parser.add_argument('--models', type=str, nargs='+', required=True,
+                        help='Weight files; the first is the reference (teacher)')
+    parser.add_argument('--val_dir', type=str, default=None,
+                        help='Labelled data directory (real/ and fake/) for accuracy')
+    parser.add_argument('--num_frames', type=int, default=20,
+                        help='Frames per sequence (predict_with_vit uses up to 20)')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='Sequences loaded per batch (timing is per sequence)')
+    parser.add_argument('--num_batches', type=int, default=4,
+                        help='Batches to time (random sequences without --val_dir)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write JSON report to this path')
+
+    main(parser.parse_args())
@@ -0,0 +1,110 @@
+"""
+Peak Memory vs Step Time for Activation Checkpointing
+
+Trains a few steps on random sequences for each configuration in a fresh
+process (so peak RSS is not shared between runs) and reports the
+trade-off between peak resident memory and optimizer step time.
+
+Usage:
+    python benchmark_memory.py
+    python benchmark_memory.py --frames 20 50 --batch_size 1 --steps 3
+    python benchmark_memory.py --output memory.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import time
+
+def run_config(num_frames, batch_size, grad_checkpoint, steps, queue):
+    """Child process: build the model, train a few steps, report stats"""
+    import torch
+    import torch.nn as nn
+    from vit_model import ViTDeepfakeDetector
+    from train_vit import peak_rss_mb
+
+    torch.manual_seed(0)
+    model = ViTDeepfakeDetector(
+        img_size=224,
+        patch_size=16,
+        embed_dim=384,
+        depth=6,
+        num_heads=6,
+        dropout=0.1
+    )
+    model.set_grad_checkpointing(grad_checkpoint)
+    model.train()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-4)
+    criterion = nn.CrossEntropyLoss()
+
+    sequences = torch.randn(batch_size, num_frames, 3, 224, 224)
+    labels = torch.randint(0, 2, (batch_size,))
+    baseline_rss = peak_rss_mb()
+
+    step_times = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        optimizer.zero_grad()
+        loss = criterion(model(sequences), labels)
+        loss.backward()
+        optimizer.step()
+        step_times.append(time.perf_counter() - start)
+
+    queue.put({
+        'num_frames': num_frames,
+        'batch_size': batch_size,
+        'grad_checkpoint': grad_checkpoint,
+        'step_time': round(sum(step_times) / len(step_times), 3),
+        'baseline_rss_mb': round(baseline_rss, 1),
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    })
+
+def main(args):
+    ctx = mp.get_context('spawn')
+    results = []
+
+    for num_frames in args.frames:
+        for grad_checkpoint in (False, True):
+            queue = ctx.Queue()
+            proc = ctx.Process(
+                target=run_config,
+                args=(num_frames, args.batch_size, grad_checkpoint, args.steps, queue)
+            )
+            proc.start()
+            proc.join()
+            if proc.exitcode != 0:
+                print(f"✗ T={num_frames} checkpoint={grad_checkpoint} failed (exit {proc.exitcode})")
+                continue
+            result = queue.get()
+            results.append(result)
+            print(f"✓ T={num_frames:3d} checkpoint={str(grad_checkpoint):5s} "
+                  f"step={result['step_time']:.2f}s peak_rss={result['peak_rss_mb']:.0f} MB")
+
+    # Relative cost of checkpointing at each T
+    print(f"\n{'='*60}")
+    print(f"{'T':>4} {'RSS saved':>12} {'Step slowdown':>15}")
+    for num_frames in args.frames:
+        pair = {r['grad_checkpoint']: r for r in results if r['num_frames'] == num_frames}
+        if len(pair) == 2:
+            saved = pair[False]['peak_rss_mb'] - pair[True]['peak_rss_mb']
+            slowdown = pair[True]['step_time'] / pair[False]['step_time']
+            print(f"{num_frames:>4} {saved:>9.0f} MB {slowdown:>14.2f}x")
+    print(f"{'='*60}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure activation checkpointing memory/time trade-off')
+    parser.add_argument('--frames', type=int, nargs='+', default=[20, 50],
+                        help='Sequence lengths (T) to test')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='Micro-batch size')
+    parser.add_argument('--steps', type=int, default=2,
+                        help='Training steps per configuration')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write JSON report to this path')
+
+    main(parser.parse_args())
@@ -0,0 +1,223 @@
+"""
+End-to-End Pipeline Benchmark on Synthetic Videos
+
+Generates a grid of synthetic face videos (see synthetic_videos.py), times
+each pipeline stage and the full /api/predict/ request through a FastAPI
+TestClient, and writes a JSON report. Passing a previous report as
+--baseline fails the run (exit code 1) when any stage got slower than the
+tolerance allows, so regressions are caught before deploy.
+
+Usage:
+    python benchmark_pipeline.py
+    python benchmark_pipeline.py --quick --output bench.json
+    python benchmark_pipeline.py --baseline bench.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import torch
+
+from enhanced_processor import (
+    extract_frames_smart,
+    detect_and_crop_faces,
+    analyze_temporal_consistency,
+    detect_compression_artifacts
+)
+from synthetic_videos import make_video_set
+from vit_model import load_vit_model, predict_with_vit
+
+# Regressions smaller than this (seconds) are treated as timer noise
+MIN_REGRESSION_SECONDS = 0.005
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Median, p95 and min of a list of durations (seconds)"""
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'median': round(statistics.median(ordered), 4),
+        'p95': round(ordered[p95_index], 4),
+        'min': round(ordered[0], 4)
+    }
+
+def time_stages(video: Dict, model, num_frames: int) -> Dict[str, float]:
+    """Run the pipeline stages once on a video and return per-stage seconds"""
+    timings = {}
+
+    start = time.perf_counter()
+    frames, _ = extract_frames_smart(video['path'], num_frames=num_frames)
+    timings['extract_frames_smart'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    face_crops, _ = detect_and_crop_faces(frames, verify_with_eyes=True)
+    timings['detect_and_crop_faces'] = time.perf_counter() - start
+
+    if not face_crops:
+        return timings
+
+    start = time.perf_counter()
+    analyze_temporal_consistency(face_crops)
+    timings['analyze_temporal_consistency'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    detect_compression_artifacts(face_crops[0])
+    timings['detect_compression_artifacts'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predict_with_vit(model, face_crops)
+    timings['predict_with_vit'] = time.perf_counter() - start
+
+    return timings
+
+def time_request(client, video: Dict, num_frames: int) -> float:
+    """Time one /api/predict/ upload of the video"""
+    path = Path(video['path'])
+    start = time.perf_counter()
+    with open(path, 'rb') as f:
+        response = client.post(
+            '/api/predict/',
+            files={'upload_video_file': (path.name, f, 'video/mp4')},
+            data={'num_frames': str(num_frames)}
+        )
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"/api/predict/ returned {response.status_code} for {path.name}")
+    return elapsed
+
+def compare_reports(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Stages whose median got slower than baseline * (1 + tolerance)"""
+    regressions = []
+    for name, result in current['videos'].items():
+        base = baseline.get('videos', {}).get(name)
+        if not base:
+            continue
+        for stage, stats in result['stages'].items():
+            base_stats = base['stages'].get(stage)
+            if not base_stats:
+                continue
+            limit = base_stats['median'] * (1 + tolerance)
+            if stats['median'] > limit and stats['median'] - base_stats['median'] > MIN_REGRESSION_SECONDS:
+                regressions.append(
+                    f"{name} / {stage}: {stats['median']:.4f}s vs baseline {base_stats['median']:.4f}s"
+                )
+    return regressions
+
+def main(args):
+    # Keep the pipeline's per-request logs out of the benchmark output
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    logging.getLogger().setLevel(logging.WARNING)
+    torch.manual_seed(0)
+
+    if args.quick:
+        resolutions, lengths, codecs = ((320, 240), (640, 480)), (2.0,), ('mp4v',)
+    else:
+        resolutions = tuple(tuple(int(v) for v in r.split('x')) for r in args.resolutions)
+        lengths, codecs = tuple(args.lengths), tuple(args.codecs)
+
+    print(f"Generating synthetic videos in {args.video_dir}...")
+    videos = make_video_set(args.video_dir, resolutions=resolutions, lengths=lengths, codecs=codecs)
+    if not videos:
+        raise SystemExit("No videos could be generated")
+
+    model = load_vit_model(args.model_path)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'threads': torch.get_num_threads(),
+        'num_frames': args.num_frames,
+        'repeats': args.repeats,
+        'videos': {}
+    }
+
+    client = None
+    if not args.skip_api:
+        from fastapi.testclient import TestClient
+        import main as api
+        client = TestClient(api.app)
+        client.__enter__()  # run the lifespan (model load) once for all requests
+        while client.get('/ready').json()['model_status'] == 'loading':
+            time.sleep(0.5)
+
+    try:
+        for video in videos:
+            print(f"\n▶ {video['name']} ({video['frames']} frames, {video['bytes'] / 1e6:.1f} MB)")
+            samples: Dict[str, List[float]] = {}
+
+            # One untimed warm-up pass, then the timed repeats
+            time_stages(video, model, args.num_frames)
+            for _ in range(args.repeats):
+                for stage, seconds in time_stages(video, model, args.num_frames).items():
+                    samples.setdefault(stage, []).append(seconds)
+                if client is not None:
+                    samples.setdefault('api_predict', []).append(time_request(client, video, args.num_frames))
+
+            stages = {stage: summarize(values) for stage, values in samples.items()}
+            report['videos'][video['name']] = {
+                'width': video['width'],
+                'height': video['height'],
+                'frames': video['frames'],
+                'codec': video['codec'],
+                'manipulated': video['manipulated'],
+                'bytes': video['bytes'],
+                'stages': stages
+            }
+            for stage, stats in stages.items():
+                print(f"   {stage:30s} median {stats['median'] * 1000:8.1f} ms   p95 {stats['p95'] * 1000:8.1f} ms")
+    finally:
+        if client is not None:
+            client.__exit__(None, None, None)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✓ Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print(f"\n✓ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the detection pipeline on synthetic videos')
+    parser.add_argument('--video_dir', type=str, default='benchmark_videos',
+                        help='Where synthetic videos are generated (reused between runs)')
+    parser.add_argument('--resolutions', type=str, nargs='+', default=['320x240', '640x480', '1280x720'],
+                        help='Video sizes as WIDTHxHEIGHT')
+    parser.add_argument('--lengths', type=float, nargs='+', default=[2.0, 10.0],
+                        help='Clip lengths in seconds')
+    parser.add_argument('--codecs', type=str, nargs='+', default=['mp4v', 'MJPG'],
+                        help='FourCC codecs to encode with')
+    parser.add_argument('--quick', action='store_true',
+                        help='Small grid (320x240 and 640x480, 2s, mp4v) for CI')
+    parser.add_argument('--num_frames', type=int, default=20,
+                        help='Frames extracted per video')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Timed runs per video')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='Checkpoint to load (random init if omitted)')
+    parser.add_argument('--skip_api', action='store_true',
+                        help='Only time the stages, not the /api/predict/ call')
+    parser.add_argument('--output', type=str, default='benchmark_pipeline.json',
+                        help='Write JSON report to this path')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Previous report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed slowdown per stage before failing (0.25 = 25%%)')
+
+    main(parser.parse_args())
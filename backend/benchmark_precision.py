@@ -0,0 +1,152 @@
+"""
+fp32 vs bfloat16 Throughput and Accuracy Comparison
+
+Measures inference and training-step throughput of the ViT detector with
+and without bfloat16 autocast, and how much the bf16 predictions drift
+from fp32 on the same inputs.
+
+Usage:
+    python benchmark_precision.py
+    python benchmark_precision.py --model_path models/model_best.pt --val_dir data/val
+    python benchmark_precision.py --num_frames 20 --batch_size 2 --output precision.json
+"""
+
+import argparse
+import json
+import time
+
+import torch
+import torch.nn as nn
+
+from vit_model import load_vit_model, autocast_context, bf16_autocast_supported
+
+def time_inference(model, batches, use_bf16: bool, warmup: int = 1):
+    """Run inference over batches and return (sequences/sec, probabilities)"""
+    probabilities = []
+    with torch.no_grad():
+        for sequences in batches[:warmup]:
+            with autocast_context(sequences.device, enabled=use_bf16):
+                model(sequences)
+
+        start = time.perf_counter()
+        for sequences in batches:
+            with autocast_context(sequences.device, enabled=use_bf16):
+                logits = model(sequences)
+            probabilities.append(torch.softmax(logits.float(), dim=1))
+        elapsed = time.perf_counter() - start
+
+    num_sequences = sum(b.shape[0] for b in batches)
+    return num_sequences / elapsed, torch.cat(probabilities)
+
+def time_training(model, batches, use_bf16: bool, steps: int):
+    """Run a few optimizer steps and return sequences/sec"""
+    model.train()
+    optimizer = torch.optim.AdamW(model.parameters(), lr=1e-5)
+    criterion = nn.CrossEntropyLoss()
+    initial_state = {k: v.clone() for k, v in model.state_dict().items()}
+
+    start = time.perf_counter()
+    num_sequences = 0
+    for step in range(steps):
+        sequences = batches[step % len(batches)]
+        labels = torch.randint(0, 2, (sequences.shape[0],), device=sequences.device)
+
+        optimizer.zero_grad()
+        with autocast_context(sequences.device, enabled=use_bf16):
+            logits = model(sequences)
+            loss = criterion(logits.float(), labels)
+        loss.backward()
+        optimizer.step()
+        num_sequences += sequences.shape[0]
+    elapsed = time.perf_counter() - start
+
+    # Restore weights so both precisions train from the same starting point
+    model.load_state_dict(initial_state)
+    model.eval()
+    return num_sequences / elapsed
+
+def load_batches(args, device):
+    """Real validation sequences if --val_dir is set, random ones otherwise"""
+    if args.val_dir:
+        from train_vit import DeepfakeVideoDataset
+        dataset = DeepfakeVideoDataset(args.val_dir, num_frames=args.num_frames)
+        batches, labels = [], []
+        for start in range(0, min(len(dataset), args.num_batches * args.batch_size), args.batch_size):
+            items = [dataset[i] for i in range(start, min(start + args.batch_size, len(dataset)))]
+            batches.append(torch.stack([seq for seq, _ in items]).to(device))
+            labels.extend(label for _, label in items)
+        return batches, torch.tensor(labels)
+
+    generator = torch.Generator().manual_seed(0)
+    batches = [
+        torch.randn(args.batch_size, args.num_frames, 3, 224, 224, generator=generator).to(device)
+        for _ in range(args.num_batches)
+    ]
+    return batches, None
+
+def main(args):
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Using device: {device}")
+    print(f"bfloat16 autocast supported: {bf16_autocast_supported(device)}")
+
+    model = load_vit_model(args.model_path, device=device)
+    batches, labels = load_batches(args, device)
+    if not batches:
+        raise SystemExit("No sequences to benchmark")
+
+    report = {'device': str(device), 'bf16_supported': bf16_autocast_supported(device)}
+
+    print("\nInference throughput...")
+    fp32_rate, fp32_probs = time_inference(model, batches, use_bf16=False)
+    bf16_rate, bf16_probs = time_inference(model, batches, use_bf16=True)
+
+    fp32_preds = fp32_probs.argmax(dim=1)
+    bf16_preds = bf16_probs.argmax(dim=1)
+    report['inference'] = {
+        'fp32_sequences_per_sec': round(fp32_rate, 3),
+        'bf16_sequences_per_sec': round(bf16_rate, 3),
+        'speedup': round(bf16_rate / fp32_rate, 3),
+        'prediction_agreement': round((fp32_preds == bf16_preds).float().mean().item(), 4),
+        'max_probability_diff': round((fp32_probs - bf16_probs).abs().max().item(), 5)
+    }
+    if labels is not None:
+        report['inference']['fp32_accuracy'] = round((fp32_preds.cpu() == labels).float().mean().item(), 4)
+        report['inference']['bf16_accuracy'] = round((bf16_preds.cpu() == labels).float().mean().item(), 4)
+
+    if args.train_steps > 0:
+        print("Training throughput...")
+        report['training'] = {
+            'fp32_sequences_per_sec': round(time_training(model, batches, False, args.train_steps), 3),
+            'bf16_sequences_per_sec': round(time_training(model, batches, True, args.train_steps), 3)
+        }
+        report['training']['speedup'] = round(
+            report['training']['bf16_sequences_per_sec'] / report['training']['fp32_sequences_per_sec'], 3
+        )
+
+    print(f"\n{'='*60}")
+    print(json.dumps(report, indent=2))
+    print(f"{'='*60}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare fp32 and bf16 ViT throughput and accuracy')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='Checkpoint to load (random init if omitted)')
+    parser.add_argument('--val_dir', type=str, default=None,
+                        help='Labelled data directory (real/ and fake/) for accuracy')
+    parser.add_argument('--num_frames', type=int, default=20,
+                        help='Frames per sequence')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='Sequences per batch')
+    parser.add_argument('--num_batches', type=int, default=4,
+                        help='Number of batches to time')
+    parser.add_argument('--train_steps', type=int, default=2,
+                        help='Optimizer steps to time per precision (0 to skip)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write JSON report to this path')
+
+    main(parser.parse_args())
@@ -0,0 +1,108 @@
+"""
+Spatial Token Pruning: Latency vs Accuracy
+
+Runs the same sequences through the ViT with several VIT_TOKEN_KEEP_RATIO
+values (ViTDeepfakeDetector.set_token_pruning) and reports per ratio:
+
+    tokens         - tokens per frame in the blocks after the prune point
+    latency        - mean seconds per sequence (one video, batch size 1)
+    speedup        - vs keep ratio 1.0 (no pruning)
+    agreement      - share of predictions matching the unpruned model
+    max_fake_diff  - largest fake-probability gap to the unpruned model
+    accuracy       - on --val_dir if given
+
+Usage:
+    python benchmark_token_pruning.py --model_path models/model_best.safetensors
+    python benchmark_token_pruning.py --val_dir data/val --keep_ratios 1.0 0.7 0.5 --mode drop --output pruning.json
+"""
+
+import argparse
+import json
+
+import torch
+
+from vit_model import load_vit_model
+from benchmark_precision import load_batches
+from benchmark_distill import time_model
+
+def main(args):
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    print(f"Using device: {device}")
+
+    model = load_vit_model(args.model_path, device=device)
+    batches, labels = load_batches(args, device)
+    if not batches:
+        raise SystemExit("No sequences to benchmark")
+
+    num_patches = model.patch_embed.n_patches
+    prune_after = args.prune_after
+    if not 1 <= prune_after < len(model.blocks):
+        raise SystemExit(f"--prune_after must be in [1, {len(model.blocks)}) for this {len(model.blocks)}-block model")
+    print(f"{num_patches} patch tokens per frame, pruning after block {prune_after}/{len(model.blocks)} "
+          f"({args.mode})")
+
+    results = []
+    keep_ratios = [1.0] + [r for r in args.keep_ratios if r != 1.0]
+    for keep_ratio in keep_ratios:
+        model.set_token_pruning(keep_ratio, prune_after, args.mode)
+        latency, fake_probs = time_model(model, batches)
+        predictions = fake_probs >= 0.5
+
+        if keep_ratio == 1.0:
+            reference_probs, reference_latency = fake_probs, latency
+        num_keep = max(1, int(round(num_patches * keep_ratio)))
+        entry = {
+            'keep_ratio': keep_ratio,
+            'tokens': 1 + num_keep + (args.mode == 'merge' and num_keep < num_patches),
+            'latency': round(latency, 4),
+            'speedup': round(reference_latency / latency, 3),
+            'agreement': round(((reference_probs >= 0.5) == predictions).float().mean().item(), 4),
+            'max_fake_diff': round((reference_probs - fake_probs).abs().max().item(), 4)
+        }
+        if labels is not None:
+            entry['accuracy'] = round((predictions.long() == labels).float().mean().item(), 4)
+        results.append(entry)
+
+    print(f"\n{'='*60}")
+    print(f"{'keep':>5s} {'tokens':>6s} {'latency':>8s} {'speedup':>7s} {'agree':>6s} {'max diff':>8s} {'accuracy':>8s}")
+    for r in results:
+        accuracy = f"{r['accuracy']:.2%}" if 'accuracy' in r else '-'
+        print(f"{r['keep_ratio']:5.2f} {r['tokens']:6d} {r['latency']:7.3f}s {r['speedup']:6.2f}x "
+              f"{r['agreement']:6.1%} {r['max_fake_diff']:8.4f} {accuracy:>8s}")
+    print(f"{'='*60}")
+    print(f"Serve with VIT_TOKEN_KEEP_RATIO=<keep> VIT_TOKEN_PRUNE_AFTER={prune_after} "
+          f"VIT_TOKEN_PRUNE_MODE={args.mode}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'device': str(device),
+                'num_frames': args.num_frames,
+                'prune_after': prune_after,
+                'mode': args.mode,
+                'results': results
+            }, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare ViT latency and accuracy across token keep ratios')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='Weights to load (random init if omitted)')
+    parser.add_argument('--val_dir', type=str, default=None,
+                        help='Labelled data directory (real/ and fake/) for accuracy')
+    parser.add_argument('--keep_ratios', type=float, nargs='+', default=[0.9, 0.7, 0.5, 0.3],
+                        help='VIT_TOKEN_KEEP_RATIO values to compare against 1.0')
+    parser.add_argument('--prune_after', type=int, default=2,
+                        help='Blocks run on all tokens (VIT_TOKEN_PRUNE_AFTER)')
+    parser.add_argument('--mode', type=str, default='merge', choices=['merge', 'drop'],
+                        help='Fold pruned tokens into one (merge) or discard them (drop)')
+    parser.add_argument('--num_frames', type=int, default=20,
+                        help='Frames per sequence (predict_with_vit uses up to 20)')
+    parser.add_argument('--batch_size', type=int, default=1,
+                        help='Sequences loaded per batch (timing is per sequence)')
+    parser.add_argument('--num_batches', type=int, default=4,
+                        help='Batches to time (random sequences without --val_dir)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write JSON report to this path')
+
+    main(parser.parse_args())
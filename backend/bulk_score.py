@@ -0,0 +1,247 @@
+"""
+Offline Bulk Scoring
+
+Walks a directory tree and scores every video with the same pipeline as
+/api/predict/ (pipeline.extract_signals -> ViT -> build_result), without
+going through HTTP. Decoding and face detection run in a process pool;
+at most --max_in_flight videos are queued there at a time, so memory stays
+bounded however large the tree is. Decoded videos are scored in ViT
+batches of --batch_size in the main process while the pool keeps decoding.
+
+Results are appended to a JSONL file as they finish. Every finished video
+is also appended to a completed-set index (<output>.done, one relative path
+per line), so an interrupted run picks up where it stopped. With
+--format parquet the rows are staged in <output stem>.partial.jsonl and
+converted to a columnar Parquet file at the end (needs pyarrow).
+
+Usage:
+    python bulk_score.py /data/videos --output scores.jsonl
+    python bulk_score.py /data/videos --output scores.jsonl --model_path models/model_best.safetensors
+    python bulk_score.py /data/videos --output scores.parquet --format parquet --workers 6 --batch_size 16
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Dict, Iterator, List, Set
+
+from runtime_config import available_cores
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+
+def find_videos(root: Path) -> Iterator[Path]:
+    """Video files under root, in a stable order"""
+    for path in sorted(root.rglob('*')):
+        if path.suffix.lower() in VIDEO_EXTENSIONS and path.is_file():
+            yield path
+
+def load_completed(index_path: Path) -> Set[str]:
+    """Relative paths already scored by a previous run"""
+    if not index_path.exists():
+        return set()
+    with open(index_path) as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+def flatten_result(relative_path: str, result: Dict, timings: Dict) -> Dict:
+    """One flat record per video (Parquet needs fixed scalar columns)"""
+    analysis = result.get('analysis', {})
+    return {
+        'path': relative_path,
+        'output': result.get('output'),
+        'confidence': result.get('confidence'),
+        'raw_confidence': result.get('raw_confidence'),
+        'prob_real': result.get('probabilities', {}).get('real'),
+        'prob_fake': result.get('probabilities', {}).get('fake'),
+        'frames_extracted': analysis.get('frames_extracted'),
+        'faces_detected': analysis.get('faces_detected'),
+        'frame_quality': analysis.get('frame_quality'),
+        'face_detection_confidence': analysis.get('face_detection_confidence'),
+        'temporal_consistency': analysis.get('temporal_consistency'),
+        'compression_artifacts': analysis.get('compression_artifacts'),
+        'warning_flags': ';'.join(analysis.get('warning_flags', [])),
+        'error': result.get('error'),
+        'seconds': round(sum(timings.values()), 3)
+    }
+
+def error_record(relative_path: str, error: Exception) -> Dict:
+    return flatten_result(relative_path, {'output': 'ERROR', 'error': str(error)}, {})
+
+def write_parquet(jsonl_path: Path, parquet_path: Path):
+    """Convert the JSONL results into a Parquet file"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("⚠ pyarrow is not installed; results are left in JSONL form "
+              f"at {jsonl_path} (pip install pyarrow)")
+        return
+
+    with open(jsonl_path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    pq.write_table(pa.Table.from_pylist(records), parquet_path)
+    print(f"✓ Wrote {len(records)} rows to {parquet_path}")
+
+class ResultWriter:
+    """Appends records to the JSONL file and paths to the completed-set index"""
+
+    def __init__(self, jsonl_path: Path, index_path: Path):
+        self.results = open(jsonl_path, 'a')
+        self.index = open(index_path, 'a')
+        self.counts = {'scored': 0, 'errors': 0}
+
+    def write(self, record: Dict):
+        self.results.write(json.dumps(record) + '\n')
+        self.results.flush()
+        # Only mark a video done once its result line is on disk
+        self.index.write(record['path'] + '\n')
+        self.index.flush()
+        self.counts['errors' if record['output'] == 'ERROR' else 'scored'] += 1
+
+    def close(self):
+        self.results.close()
+        self.index.close()
+
+def score_ready(model, ready: List, writer: ResultWriter, args):
+    """Batched ViT pass over decoded videos, then fuse and write each result"""
+    from pipeline import build_result
+    from vit_model import predict_with_vit_batch
+
+    start = time.perf_counter()
+    try:
+        vit_results = predict_with_vit_batch(model, [signals['face_crops'] for _, signals in ready],
+                                             batch_size=args.batch_size)
+    except Exception as e:
+        for relative_path, _ in ready:
+            writer.write(error_record(relative_path, e))
+        return
+    vit_seconds = (time.perf_counter() - start) / len(ready)
+
+    for (relative_path, signals), vit_result in zip(ready, vit_results):
+        result = build_result(signals, vit_result, include_previews=False)
+        writer.write(flatten_result(relative_path, result, {**signals['timings'], 'vit': vit_seconds}))
+
+def main(args):
+    from pipeline import extract_signals, init_decode_worker
+    from vit_model import load_vit_model
+
+    root = Path(args.input_dir)
+    output = Path(args.output)
+    # Parquet runs stage rows in their own JSONL, never the output path itself
+    # (with_suffix('.jsonl') is the output when it already ends in .jsonl)
+    jsonl_path = output if args.format == 'jsonl' else output.with_name(output.stem + '.partial.jsonl')
+    index_path = Path(str(jsonl_path) + '.done')
+
+    completed = load_completed(index_path) if not args.restart else set()
+    if args.restart:
+        for path in (jsonl_path, index_path):
+            path.unlink(missing_ok=True)
+
+    videos = [p for p in find_videos(root) if str(p.relative_to(root)) not in completed]
+    if args.limit:
+        videos = videos[:args.limit]
+    print(f"Found {len(videos) + len(completed)} video(s) under {root}; "
+          f"{len(completed)} already scored, {len(videos)} to go")
+    if not videos:
+        if args.format == 'parquet' and jsonl_path.exists():
+            write_parquet(jsonl_path, output)
+        return
+
+    model = load_vit_model(args.model_path)
+    model.eval()
+
+    writer = ResultWriter(jsonl_path, index_path)
+    start_time = time.perf_counter()
+    queue = iter(videos)
+    in_flight = {}
+    ready = []
+    last_logged = 0
+
+    # spawn: forking a process that has torch's thread pools running is unsafe
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context('spawn'),
+                             initializer=init_decode_worker) as pool:
+        try:
+            while True:
+                # Producer: keep the pool topped up to max_in_flight
+                while len(in_flight) < args.max_in_flight:
+                    path = next(queue, None)
+                    if path is None:
+                        break
+                    future = pool.submit(extract_signals, str(path), args.num_frames)
+                    in_flight[future] = str(path.relative_to(root))
+
+                if not in_flight and not ready:
+                    break
+
+                if in_flight:
+                    # Block until something decodes, unless a full batch is already waiting
+                    done, _ = wait(in_flight, timeout=0 if len(ready) >= args.batch_size else None,
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        relative_path = in_flight.pop(future)
+                        try:
+                            ready.append((relative_path, future.result()))
+                        except Exception as e:
+                            writer.write(error_record(relative_path, e))
+
+                # Consumer: score a full batch, or whatever is left at the end
+                if len(ready) >= args.batch_size or (ready and not in_flight):
+                    batch, ready = ready[:args.batch_size], ready[args.batch_size:]
+                    score_ready(model, batch, writer, args)
+
+                finished = writer.counts['scored'] + writer.counts['errors']
+                if finished - last_logged >= args.log_every:
+                    last_logged = finished
+                    elapsed = time.perf_counter() - start_time
+                    print(f"   {finished}/{len(videos)} videos, {finished / elapsed * 3600:.0f} videos/hour")
+        except KeyboardInterrupt:
+            print("\n⚠ Interrupted; rerun the same command to resume")
+            pool.shutdown(wait=False, cancel_futures=True)
+        finally:
+            writer.close()
+
+    elapsed = time.perf_counter() - start_time
+    finished = writer.counts['scored'] + writer.counts['errors']
+    cores = len(available_cores())
+    per_hour = finished / elapsed * 3600 if elapsed > 0 else 0.0
+
+    print(f"\n{'='*60}")
+    print(f"Scored {writer.counts['scored']} video(s), {writer.counts['errors']} error(s) in {elapsed:.1f}s")
+    print(f"Throughput: {per_hour:.0f} videos/hour, {per_hour / cores:.0f} videos/hour/core ({cores} core(s))")
+    print(f"Results: {jsonl_path}")
+    print(f"{'='*60}")
+
+    if args.format == 'parquet' and finished == len(videos):
+        write_parquet(jsonl_path, output)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score every video under a directory tree')
+    parser.add_argument('input_dir', type=str,
+                        help='Directory to search (recursively) for videos')
+    parser.add_argument('--output', type=str, default='scores.jsonl',
+                        help='Results file (.jsonl, or .parquet with --format parquet)')
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default='jsonl',
+                        help='Output format; parquet is written from the JSONL at the end (needs pyarrow)')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='Weights to load (random init if omitted)')
+    parser.add_argument('--num_frames', type=int, default=30,
+                        help='Frames to extract per video')
+    parser.add_argument('--workers', type=int, default=max(1, len(available_cores()) - 1),
+                        help='Decode processes (default: cores - 1, leaving one for inference)')
+    parser.add_argument('--batch_size', type=int, default=8,
+                        help='Videos per ViT forward pass')
+    parser.add_argument('--max_in_flight', type=int, default=None,
+                        help='Videos queued in the decode pool at once (default: 2 x workers)')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='Score at most this many new videos')
+    parser.add_argument('--restart', action='store_true',
+                        help='Ignore and overwrite previous results instead of resuming')
+    parser.add_argument('--log_every', type=int, default=50,
+                        help='Print progress every N videos')
+
+    args = parser.parse_args()
+    if args.max_in_flight is None:
+        args.max_in_flight = 2 * args.workers
+    main(args)
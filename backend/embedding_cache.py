@@ -0,0 +1,146 @@
+"""
+Frame Embedding Cache for Head-Only Fine-Tuning
+
+Runs the frozen spatial encoder (patch embedding + transformer blocks) and
+the frequency analyzer once per video, stores the per-frame CLS embeddings
+and frequency features on disk as a float16 memory-mapped array, and
+trains only temporal_attn, fusion, norm and head on the cached tensors.
+
+Cache layout (one directory per split):
+    features.npy  - (N, T, 2, embed_dim) float16; [:, :, 0] CLS, [:, :, 1] frequency
+    labels.npy    - (N,) int64
+    meta.json     - model config and source directory, used to detect stale caches
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import Dataset, DataLoader
+from tqdm import tqdm
+
+from vit_model import ViTDeepfakeDetector
+
+# Submodules trained in head-only mode; everything else is frozen
+HEAD_MODULES = ('temporal_attn', 'fusion', 'norm', 'head')
+
+def build_embedding_cache(
+    model: ViTDeepfakeDetector,
+    dataset: Dataset,
+    cache_dir: str,
+    meta: Dict,
+    batch_size: int = 4,
+    num_workers: int = 0,
+    device=None
+) -> Path:
+    """
+    Encode every sequence in the dataset once and write the cache
+
+    Args:
+        model: Model whose (frozen) encoder produces the features
+        dataset: Dataset yielding (sequence, label) like DeepfakeVideoDataset
+        cache_dir: Output directory
+        meta: Identifying info (model config, source dir, num_frames) stored alongside
+        batch_size: Sequences encoded per forward pass
+        num_workers: DataLoader workers for video decoding
+        device: Device to run the encoder on
+
+    Returns:
+        Path to the cache directory
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    device = device or next(model.parameters()).device
+
+    num_frames = meta['num_frames']
+    embed_dim = model.cls_token.shape[-1]
+
+    features = np.lib.format.open_memmap(
+        cache_dir / 'features.npy', mode='w+', dtype=np.float16,
+        shape=(len(dataset), num_frames, 2, embed_dim)
+    )
+    labels = np.zeros(len(dataset), dtype=np.int64)
+
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=False, num_workers=num_workers)
+    was_training = model.training
+    model.eval()
+
+    offset = 0
+    with torch.no_grad():
+        for sequences, batch_labels in tqdm(loader, desc=f'Caching {cache_dir.name}'):
+            sequences = sequences.to(device)
+            frame_features, _ = model.encode_frames(sequences)
+            freq_features = model.freq_analyzer(sequences)
+
+            batch = torch.stack([frame_features, freq_features], dim=2)  # (B, T, 2, D)
+            features[offset:offset + len(batch)] = batch.cpu().numpy().astype(np.float16)
+            labels[offset:offset + len(batch)] = batch_labels.numpy()
+            offset += len(batch)
+
+    model.train(was_training)
+    features.flush()
+    del features
+
+    np.save(cache_dir / 'labels.npy', labels)
+    with open(cache_dir / 'meta.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    print(f"✓ Cached {offset} sequences to {cache_dir}")
+    return cache_dir
+
+def cache_is_valid(cache_dir: str, meta: Dict) -> bool:
+    """True if the cache exists and was built with the same meta"""
+    cache_dir = Path(cache_dir)
+    meta_path = cache_dir / 'meta.json'
+    if not (meta_path.exists() and (cache_dir / 'features.npy').exists()):
+        return False
+    with open(meta_path) as f:
+        return json.load(f) == meta
+
+class CachedEmbeddingDataset(Dataset):
+    """Serves cached (T, 2, embed_dim) feature tensors, memory-mapped from disk"""
+
+    def __init__(self, cache_dir: str):
+        cache_dir = Path(cache_dir)
+        self.features = np.load(cache_dir / 'features.npy', mmap_mode='r')
+        self.labels = np.load(cache_dir / 'labels.npy')
+        print(f"Loaded {len(self.labels)} cached sequences from {cache_dir}")
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        features = torch.from_numpy(self.features[idx].astype(np.float32))
+        return features, int(self.labels[idx])
+
+class CachedFeatureHead(nn.Module):
+    """
+    Adapter so train_epoch/validate can drive the head from cached features
+
+    Takes (B, T, 2, embed_dim) batches and runs only
+    ViTDeepfakeDetector.classify_features.
+    """
+
+    def __init__(self, model: ViTDeepfakeDetector):
+        super().__init__()
+        self.model = model
+
+    def forward(self, features):
+        return self.model.classify_features(features[:, :, 0], features[:, :, 1])[0]
+
+def freeze_for_head_training(model: ViTDeepfakeDetector) -> List[nn.Parameter]:
+    """
+    Freeze everything except the temporal/fusion/classification head
+
+    Returns:
+        List of trainable parameters for the optimizer
+    """
+    trainable = []
+    for name, param in model.named_parameters():
+        param.requires_grad = name.split('.')[0] in HEAD_MODULES
+        if param.requires_grad:
+            trainable.append(param)
+    return trainable
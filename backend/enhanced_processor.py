@@ -6,17 +6,57 @@ Includes:
 3. Temporal consistency checking
 4. Artifact detection
 5. Frame quality filtering
+
+Frames are read through a pluggable decoder (OpenCVDecoder, FFmpegDecoder);
+see open_video.
+
+Environment:
+    VIDEO_DECODER         - Decode backend: opencv or ffmpeg (default: opencv;
+                            ffmpeg is experimental and falls back to opencv if
+                            the binaries are missing)
+    DECODE_MAX_SIDE       - Downscale decoded frames so the longer side is at
+                            most this many pixels (default: 0, full resolution)
+    DECODE_KEYFRAMES_ONLY - Sample only keyframes (ffmpeg backend; default: 0)
+    FFMPEG_HWACCEL        - Value for ffmpeg -hwaccel, e.g. auto, vaapi, cuda (default: unset)
+    FFMPEG_THREADS        - ffmpeg decoder threads, 0 = ffmpeg's choice (default: 0)
 """
 
 import cv2
 import numpy as np
-from typing import List, Tuple, Dict
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import List, Tuple, Dict, Optional, Iterator, Sequence
+import json
+import logging
 import os
+import shutil
+import subprocess
+
+logger = logging.getLogger(__name__)
+
+VIDEO_DECODER = os.getenv("VIDEO_DECODER", "opencv").lower()
+DECODE_MAX_SIDE = int(os.getenv("DECODE_MAX_SIDE", "0"))
+DECODE_KEYFRAMES_ONLY = os.getenv("DECODE_KEYFRAMES_ONLY", "0").lower() in ("1", "true", "yes")
+FFMPEG_HWACCEL = os.getenv("FFMPEG_HWACCEL")
+FFMPEG_THREADS = int(os.getenv("FFMPEG_THREADS", "0"))
+
+# Multiple face detectors for robustness; loaded on first use so importing
+# this module does not parse the cascade XMLs
+CASCADE_FILES = {
+    'face': 'haarcascade_frontalface_default.xml',
+    'eye': 'haarcascade_eye.xml',
+    'profile': 'haarcascade_profileface.xml'
+}
+
+@lru_cache(maxsize=None)
+def get_cascade(name: str) -> cv2.CascadeClassifier:
+    """Haar cascade by name ('face', 'eye', 'profile'), loaded once"""
+    return cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILES[name])
 
-# Initialize multiple face detectors for robustness
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
-profile_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_profileface.xml')
+def load_cascades():
+    """Load all cascades now (e.g. during model warm-up) instead of on the first request"""
+    for name in CASCADE_FILES:
+        get_cascade(name)
 
 def assess_frame_quality(frame: np.ndarray) -> float:
     """
@@ -46,7 +86,8 @@ def assess_frame_quality(frame: np.ndarray) -> float:
 
 def detect_faces_multi_scale(
     frame: np.ndarray,
-    min_face_size: int = 50
+    min_face_size: int = 50,
+    stats: Dict = None
 ) -> List[Tuple[int, int, int, int]]:
     """
     Detect faces using multiple scales and methods
@@ -54,6 +95,7 @@ def detect_faces_multi_scale(
     Args:
         frame: Input frame (RGB)
         min_face_size: Minimum face size
+        stats: Optional dict; 'cascade_calls' is incremented per cascade run
     
     Returns:
         List of face bounding boxes (x, y, w, h)
@@ -65,31 +107,37 @@ def detect_faces_multi_scale(
     gray = clahe.apply(gray)
     
     all_faces = []
+    cascade_calls = 0
     
     # Try multiple scale factors
     for scale_factor in [1.05, 1.1, 1.2]:
         for min_neighbors in [3, 4, 5]:
-            faces = face_cascade.detectMultiScale(
+            faces = get_cascade('face').detectMultiScale(
                 gray,
                 scaleFactor=scale_factor,
                 minNeighbors=min_neighbors,
                 minSize=(min_face_size, min_face_size),
                 flags=cv2.CASCADE_SCALE_IMAGE
             )
+            cascade_calls += 1
             
             if len(faces) > 0:
                 all_faces.extend(faces)
     
     # Try profile detection if no frontal faces found
     if len(all_faces) == 0:
-        profiles = profile_cascade.detectMultiScale(
+        profiles = get_cascade('profile').detectMultiScale(
             gray,
             scaleFactor=1.1,
             minNeighbors=5,
             minSize=(min_face_size, min_face_size)
         )
+        cascade_calls += 1
         all_faces.extend(profiles)
     
+    if stats is not None:
+        stats['cascade_calls'] = stats.get('cascade_calls', 0) + cascade_calls
+    
     # Remove duplicate detections using NMS
     if len(all_faces) > 0:
         all_faces = non_max_suppression(np.array(all_faces), 0.3)
@@ -143,31 +191,370 @@ def non_max_suppression(boxes: np.ndarray, overlap_thresh: float = 0.3) -> List:
     
     return boxes[keep].tolist()
 
-def verify_face_with_eyes(face_region: np.ndarray) -> bool:
+def verify_face_with_eyes(face_region: np.ndarray, stats: Dict = None) -> bool:
     """
     Verify if detected region contains a face by checking for eyes
     
     Args:
         face_region: Cropped face region (RGB)
+        stats: Optional dict; 'cascade_calls' is incremented
     
     Returns:
         True if eyes are detected
     """
     gray = cv2.cvtColor(face_region, cv2.COLOR_RGB2GRAY)
     
-    eyes = eye_cascade.detectMultiScale(
+    eyes = get_cascade('eye').detectMultiScale(
         gray,
         scaleFactor=1.1,
         minNeighbors=3,
         minSize=(20, 20)
     )
+    if stats is not None:
+        stats['cascade_calls'] = stats.get('cascade_calls', 0) + 1
     
     return len(eyes) >= 2
 
+def scaled_size(width: int, height: int, max_side: int) -> Tuple[int, int]:
+    """(width, height) shrunk so the longer side is at most max_side (even, never upscaled)"""
+    if max_side <= 0 or max(width, height) <= max_side:
+        return width, height
+    scale = max_side / max(width, height)
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+class VideoDecoder:
+    """
+    Reads selected frames of one video as RGB arrays
+
+    Subclasses implement probe() and read_frames(); use as a context manager
+    (or call close()) to release the underlying decoder.
+    """
+
+    name = 'base'
+
+    def __init__(self, video_path: str, max_side: int = 0, keyframes_only: bool = False):
+        self.video_path = video_path
+        self.max_side = max_side
+        self.keyframes_only = keyframes_only
+
+    def probe(self) -> Dict:
+        """total_frames, fps, width and height of the source (not the scaled output)"""
+        raise NotImplementedError
+
+    def read_frames(self, indices: Sequence[int]) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Yield (frame index, RGB frame) for the requested ascending indices
+
+        Frames that fail to decode are skipped. In keyframes-only mode each
+        requested index is replaced by the nearest keyframe between
+        indices[0] and indices[-1] (duplicates dropped), and the yielded index
+        is that keyframe's frame number; a window without a keyframe is read
+        as requested.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class OpenCVDecoder(VideoDecoder):
+    """cv2.VideoCapture; frames are scaled with cv2.resize after a full-size decode"""
+
+    name = 'opencv'
+
+    # Forward gaps up to this many frames are skipped with grab() rather
+    # than a seek (which restarts decoding from the previous keyframe)
+    MAX_GRAB_GAP = 16
+
+    _warned_keyframes = False
+
+    def __init__(self, video_path: str, max_side: int = 0, keyframes_only: bool = False):
+        if keyframes_only and not OpenCVDecoder._warned_keyframes:
+            logger.warning("⚠ Keyframes-only decoding needs the ffmpeg backend; OpenCV decodes every requested frame")
+            OpenCVDecoder._warned_keyframes = True
+        super().__init__(video_path, max_side, False)
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open video: {video_path}")
+
+    def probe(self) -> Dict:
+        return {
+            'total_frames': int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)),
+            'fps': self.cap.get(cv2.CAP_PROP_FPS),
+            'width': int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        }
+
+    def read_frames(self, indices: Sequence[int]) -> Iterator[Tuple[int, np.ndarray]]:
+        position = None
+        for idx in indices:
+            idx = int(idx)
+            gap = idx - position if position is not None else -1
+            if 0 <= gap <= self.MAX_GRAB_GAP:
+                for _ in range(gap):
+                    self.cap.grab()
+            else:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
+            ret, frame = self.cap.read()
+            position = idx + 1
+            if not ret:
+                continue
+
+            h, w = frame.shape[:2]
+            size = scaled_size(w, h, self.max_side)
+            if size != (w, h):
+                frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+            yield idx, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def close(self):
+        self.cap.release()
+
+def parse_packet_index(ffprobe_output: str) -> Tuple[List[float], List[int]]:
+    """
+    Frame timestamps (seconds) and keyframe numbers of a video stream
+
+    Parses `ffprobe -show_entries packet=pts_time,dts_time,flags -of
+    compact=p=0`. Packets come in decode order, so frame numbers are
+    positions in timestamp order (they differ with B-frames); packets the
+    demuxer marks discarded (D flag, e.g. before an edit list's start) are
+    not frames, matching what the decoder (and OpenCV) return.
+    """
+    packets = []
+    for line in ffprobe_output.splitlines():
+        fields = dict(item.partition('=')[::2] for item in line.strip().split('|'))
+        flags = fields.get('flags', '')
+        time = fields.get('pts_time', 'N/A')
+        if time == 'N/A':
+            time = fields.get('dts_time', 'N/A')
+        if 'D' in flags or time == 'N/A':
+            continue
+        packets.append((float(time), 'K' in flags))
+    packets.sort(key=lambda packet: packet[0])
+    return [time for time, _ in packets], [n for n, (_, key) in enumerate(packets) if key]
+
+def plan_frame_read(
+    times: Sequence[float],
+    keyframes: Sequence[int],
+    indices: Sequence[int],
+    keyframes_only: bool = False
+) -> Tuple[Optional[float], List[int]]:
+    """
+    Seek time and output frame numbers of one FFmpegDecoder.read_frames call
+
+    The seek time is the timestamp of the last keyframe at or before the
+    first output frame (None to decode from the start). See
+    VideoDecoder.read_frames for the keyframes-only substitution.
+    """
+    targets = sorted({int(i) for i in indices if 0 <= i < len(times)})
+    if not targets:
+        return None, []
+    if keyframes_only:
+        window = keyframes[bisect_left(keyframes, targets[0]):bisect_right(keyframes, targets[-1])]
+        if window:
+            targets = sorted({min(window, key=lambda k: abs(k - idx)) for idx in targets})
+    position = bisect_right(keyframes, targets[0]) - 1
+    if position < 0 or keyframes[position] == 0:
+        return None, targets
+    return times[keyframes[position]], targets
+
+def select_expression(times: Sequence[float], targets: Sequence[int]) -> str:
+    """select filter passing the target frames, matched by timestamp (halfway to each neighbour)"""
+    terms = []
+    for n in targets:
+        low = (times[n - 1] + times[n]) / 2 if n > 0 else times[n] - 1.0
+        high = (times[n] + times[n + 1]) / 2 if n + 1 < len(times) else times[n] + 1.0
+        terms.append(f"between(t\\,{low:.6f}\\,{high:.6f})")
+    return "select='" + '+'.join(terms) + "'"
+
+@lru_cache(maxsize=32)
+def _packet_index(video_path: str, mtime_ns: int, size: int) -> Tuple[Tuple[float, ...], Tuple[int, ...]]:
+    """parse_packet_index of a file (a demux-only pass), cached per file version"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'packet=pts_time,dts_time,flags', '-of', 'compact=p=0', video_path],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise ValueError(f"Could not open video: {video_path}")
+    times, keyframes = parse_packet_index(result.stdout)
+    return tuple(times), tuple(keyframes)
+
+class FFmpegDecoder(VideoDecoder):
+    """
+    One ffmpeg subprocess per read_frames call (experimental backend)
+
+    An ffprobe pass over the packets (no decoding, cached per file) gives
+    every frame's timestamp and the keyframes. ffmpeg then seeks to the
+    keyframe before the first requested frame, decodes from there, keeps
+    the requested frames by timestamp (select filter), scales them with its
+    own scaler and streams raw RGB over a pipe, so skipped frames are never
+    converted or copied; the process is killed once the last one arrives.
+    -skip_frame nokey makes the decoder itself skip every non-keyframe.
+
+    Frame numbers are positions in presentation order, the ones OpenCVDecoder
+    counts; matching timestamps instead of index / fps keeps them right in
+    variable-frame-rate files and files whose edit list trims the start.
+    """
+
+    name = 'ffmpeg'
+
+    def __init__(self, video_path: str, max_side: int = 0, keyframes_only: bool = False):
+        super().__init__(video_path, max_side, keyframes_only)
+        if not os.path.exists(video_path):
+            raise ValueError(f"Could not open video: {video_path}")
+        self._info = None
+
+    @staticmethod
+    def available() -> bool:
+        return shutil.which('ffmpeg') is not None and shutil.which('ffprobe') is not None
+
+    def packet_index(self) -> Tuple[Tuple[float, ...], Tuple[int, ...]]:
+        """(frame timestamps, keyframe numbers), see parse_packet_index"""
+        stat = os.stat(self.video_path)
+        return _packet_index(self.video_path, stat.st_mtime_ns, stat.st_size)
+
+    def probe(self) -> Dict:
+        if self._info is None:
+            result = subprocess.run(
+                ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+                 '-show_entries', 'stream=width,height,avg_frame_rate,r_frame_rate',
+                 '-of', 'json', self.video_path],
+                capture_output=True, text=True
+            )
+            streams = json.loads(result.stdout or '{}').get('streams') or []
+            if result.returncode != 0 or not streams:
+                raise ValueError(f"Could not open video: {self.video_path}")
+            stream = streams[0]
+
+            fps = 0.0
+            for key in ('avg_frame_rate', 'r_frame_rate'):
+                num, _, den = stream.get(key, '0/0').partition('/')
+                if float(den or 0) > 0 and float(num) > 0:
+                    fps = float(num) / float(den)
+                    break
+
+            self._info = {
+                # Exact, also for WebM/MKV, which carry no frame count
+                'total_frames': len(self.packet_index()[0]),
+                'fps': fps,
+                'width': int(stream.get('width') or 0),
+                'height': int(stream.get('height') or 0)
+            }
+        return self._info
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def passthrough_option() -> List[str]:
+        """Keep every decoded frame as is: -fps_mode on ffmpeg >= 5.1, where -vsync is deprecated"""
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-h', 'long'], capture_output=True, text=True)
+        return ['-fps_mode', 'passthrough'] if '-fps_mode' in result.stdout else ['-vsync', 'passthrough']
+
+    def _command(self, seek: Optional[float], targets: Sequence[int], size: Tuple[int, int]) -> List[str]:
+        times, _ = self.packet_index()
+        command = ['ffmpeg', '-v', 'error', '-nostdin']
+        if FFMPEG_HWACCEL:
+            command += ['-hwaccel', FFMPEG_HWACCEL]
+        if FFMPEG_THREADS > 0:
+            command += ['-threads', str(FFMPEG_THREADS)]
+        if self.keyframes_only:
+            command += ['-skip_frame', 'nokey']
+        if seek is not None:
+            # Land on the keyframe itself (1 µs past its printed timestamp) and
+            # decode everything from there; the select filter does the rest
+            command += ['-noaccurate_seek', '-ss', f"{seek + 1e-6:.6f}"]
+        # Original timestamps, so the select filter sees the ones ffprobe listed
+        command += ['-copyts', '-i', self.video_path, '-an', '-sn']
+
+        filters = [select_expression(times, targets)]
+        if size != (self.probe()['width'], self.probe()['height']):
+            filters.append(f"scale={size[0]}:{size[1]}:flags=area")
+        command += ['-vf', ','.join(filters)]
+        return command + self.passthrough_option() + ['-pix_fmt', 'rgb24', '-f', 'rawvideo', 'pipe:1']
+
+    def read_frames(self, indices: Sequence[int]) -> Iterator[Tuple[int, np.ndarray]]:
+        times, keyframes = self.packet_index()
+        seek, targets = plan_frame_read(times, keyframes, indices, self.keyframes_only)
+        if not targets:
+            return
+        info = self.probe()
+        width, height = scaled_size(info['width'], info['height'], self.max_side)
+        frame_bytes = width * height * 3
+
+        process = subprocess.Popen(
+            self._command(seek, targets, (width, height)),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        try:
+            for idx in targets:
+                buffer = self._read_frame(process.stdout, frame_bytes)
+                if buffer is None:
+                    break
+                yield idx, np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3)
+        finally:
+            # All requested frames read: stop ffmpeg instead of letting it decode to the end
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            error = process.stderr.read().decode(errors='replace').strip()
+            process.stderr.close()
+            if process.wait() not in (0, -9) and error:
+                logger.warning("⚠ ffmpeg decode of %s: %s", self.video_path, error.splitlines()[-1])
+
+    @staticmethod
+    def _read_frame(stream, frame_bytes: int) -> Optional[bytearray]:
+        """One raw frame from the pipe (a bytearray, so the array is writable), None at EOF"""
+        buffer = bytearray(frame_bytes)
+        return buffer if stream.readinto(buffer) == frame_bytes else None
+
+DECODERS = {'opencv': OpenCVDecoder, 'ffmpeg': FFmpegDecoder}
+
+@lru_cache(maxsize=None)
+def resolve_decoder(name: str) -> str:
+    """Backend name to use for a requested one (ffmpeg falls back to opencv if not installed)"""
+    if name not in DECODERS:
+        raise ValueError(f"Unknown video decoder {name!r}; expected one of {sorted(DECODERS)}")
+    if name == 'ffmpeg' and not FFmpegDecoder.available():
+        logger.warning("⚠ VIDEO_DECODER=ffmpeg but ffmpeg/ffprobe not found on PATH; using opencv")
+        return 'opencv'
+    return name
+
+def open_video(
+    video_path: str,
+    backend: Optional[str] = None,
+    max_side: Optional[int] = None,
+    keyframes_only: Optional[bool] = None
+) -> VideoDecoder:
+    """
+    Open a video with the configured decoder backend
+
+    Args:
+        video_path: Path to video
+        backend: 'opencv' or 'ffmpeg' (default: VIDEO_DECODER)
+        max_side: Longest side of decoded frames, 0 = full size (default: DECODE_MAX_SIDE)
+        keyframes_only: Sample keyframes only (default: DECODE_KEYFRAMES_ONLY)
+
+    Returns:
+        A VideoDecoder; close it (or use it in a with block) when done
+    """
+    cls = DECODERS[resolve_decoder(backend or VIDEO_DECODER)]
+    return cls(
+        video_path,
+        max_side=DECODE_MAX_SIDE if max_side is None else max_side,
+        keyframes_only=DECODE_KEYFRAMES_ONLY if keyframes_only is None else keyframes_only
+    )
+
 def extract_frames_smart(
     video_path: str,
     num_frames: int = 30,
-    quality_threshold: float = 10.0
+    quality_threshold: float = 10.0,
+    start_frame: int = 0,
+    end_frame: Optional[int] = None,
+    decode_options: Optional[Dict] = None
 ) -> Tuple[List[np.ndarray], Dict]:
     """
     Extract high-quality frames from video
@@ -176,40 +563,46 @@ def extract_frames_smart(
         video_path: Path to video
         num_frames: Target number of frames
         quality_threshold: Minimum quality score
+        start_frame: First frame of the window to sample from
+        end_frame: End of the window (exclusive); defaults to the end of the video
+        decode_options: open_video overrides (backend, max_side, keyframes_only);
+            defaults come from VIDEO_DECODER, DECODE_MAX_SIDE, DECODE_KEYFRAMES_ONLY
     
     Returns:
         List of frames and metadata
     """
-    cap = cv2.VideoCapture(video_path)
-    
-    if not cap.isOpened():
-        raise ValueError(f"Could not open video: {video_path}")
-    
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    
-    if total_frames == 0:
-        raise ValueError("Video has no frames")
-    
-    # Sample more frames than needed
-    sample_size = min(total_frames, num_frames * 3)
-    frame_indices = np.linspace(0, total_frames - 1, sample_size, dtype=int)
-    
-    frames_with_quality = []
-    
-    for idx in frame_indices:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = cap.read()
+    with open_video(video_path, **(decode_options or {})) as decoder:
+        info = decoder.probe()
+        total_frames = info['total_frames']
+        fps = info['fps']
+        
+        if total_frames == 0:
+            raise ValueError("Video has no frames")
+        
+        end_frame = total_frames if end_frame is None else min(end_frame, total_frames)
+        if start_frame >= end_frame:
+            raise ValueError(f"Empty frame window [{start_frame}, {end_frame})")
         
-        if ret:
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Downscaled frames have a lower Laplacian variance; scale the blur
+        # threshold with the pixel count so it filters about the same frames
+        width, height = scaled_size(info['width'], info['height'], decoder.max_side)
+        if width < info['width']:
+            quality_threshold *= (width * height) / (info['width'] * info['height'])
+        
+        # Sample more frames than needed
+        sample_size = min(end_frame - start_frame, num_frames * 3)
+        frame_indices = np.linspace(start_frame, end_frame - 1, sample_size, dtype=int)
+        
+        frames_with_quality = []
+        frames_decoded = 0
+        
+        for idx, frame_rgb in decoder.read_frames(frame_indices):
+            frames_decoded += 1
             quality = assess_frame_quality(frame_rgb)
             
             if quality >= quality_threshold:
                 frames_with_quality.append((frame_rgb, quality, idx))
     
-    cap.release()
-    
     # Sort by quality and take top frames
     frames_with_quality.sort(key=lambda x: x[1], reverse=True)
     selected_frames = [f[0] for f in frames_with_quality[:num_frames]]
@@ -218,13 +611,30 @@ def extract_frames_smart(
         'total_frames': total_frames,
         'fps': fps,
         'selected_frames': len(selected_frames),
+        'frames_decoded': frames_decoded,
+        'decoder': decoder.name,
         'avg_quality': np.mean([f[1] for f in frames_with_quality[:num_frames]]) if frames_with_quality else 0
     }
     
-    print(f"✓ Extracted {len(selected_frames)} high-quality frames (avg quality: {metadata['avg_quality']:.2f})")
+    logger.info("✓ Extracted %d high-quality frames (avg quality: %.2f)", len(selected_frames), metadata['avg_quality'])
     
     return selected_frames, metadata
 
+def crop_face(frame: np.ndarray, box) -> Tuple[np.ndarray, Tuple[int, int, int, int]]:
+    """
+    Crop a face box from the frame with 30% padding on each side
+    
+    Returns:
+        The (unresized) crop and the padded box (x, y, w, h)
+    """
+    x, y, w, h = box
+    padding = int(max(w, h) * 0.3)
+    x = max(0, x - padding)
+    y = max(0, y - padding)
+    w = min(frame.shape[1] - x, w + 2 * padding)
+    h = min(frame.shape[0] - y, h + 2 * padding)
+    return frame[y:y+h, x:x+w], (x, y, w, h)
+
 def detect_and_crop_faces(
     frames: List[np.ndarray],
     target_size: int = 224,
@@ -246,39 +656,30 @@ def detect_and_crop_faces(
         'frames_processed': len(frames),
         'faces_detected': 0,
         'faces_verified': 0,
+        'cascade_calls': 0,
         'detection_confidence': []
     }
     
     for i, frame in enumerate(frames):
         # Detect faces
-        faces = detect_faces_multi_scale(frame)
+        faces = detect_faces_multi_scale(frame, stats=stats)
         
         if len(faces) == 0:
-            print(f"  No face in frame {i}")
+            logger.debug("  No face in frame %d", i)
             continue
         
         stats['faces_detected'] += len(faces)
         
         # Get largest face
         largest_face = max(faces, key=lambda rect: rect[2] * rect[3])
-        x, y, w, h = largest_face
-        
-        # Add padding
-        padding = int(max(w, h) * 0.3)
-        x = max(0, x - padding)
-        y = max(0, y - padding)
-        w = min(frame.shape[1] - x, w + 2 * padding)
-        h = min(frame.shape[0] - y, h + 2 * padding)
-        
-        # Crop face
-        face_crop = frame[y:y+h, x:x+w]
+        face_crop, (x, y, w, h) = crop_face(frame, largest_face)
         
         # Verify face quality
         if verify_with_eyes:
-            if verify_face_with_eyes(face_crop):
+            if verify_face_with_eyes(face_crop, stats=stats):
                 stats['faces_verified'] += 1
             else:
-                print(f"  Face in frame {i} failed eye verification")
+                logger.debug("  Face in frame %d failed eye verification", i)
                 # Still use it but note the issue
         
         # Resize to target size
@@ -293,7 +694,7 @@ def detect_and_crop_faces(
     
     # Fallback: use center crops if no faces detected
     if len(face_crops) == 0:
-        print("⚠ No faces detected, using center crops as fallback")
+        logger.warning("⚠ No faces detected, using center crops as fallback")
         for frame in frames[:20]:
             center_crop = crop_center(frame, target_size)
             face_crops.append(center_crop)
@@ -303,7 +704,8 @@ def detect_and_crop_faces(
     
     stats['avg_confidence'] = np.mean(stats['detection_confidence']) if stats['detection_confidence'] else 0
     
-    print(f"✓ Detected {len(face_crops)} faces (verified: {stats['faces_verified']}, avg confidence: {stats['avg_confidence']:.2f})")
+    logger.info("✓ Detected %d faces (verified: %d, avg confidence: %.2f)",
+                len(face_crops), stats['faces_verified'], stats['avg_confidence'])
     
     return face_crops, stats
 
@@ -0,0 +1,129 @@
+"""
+Evaluate the Pre-Screening Cascade
+
+For every video of a validation split, computes the cheap signals, the
+pre-screener's fake probability and the ViT's prediction (timed). Then, for
+a sweep of PRESCREEN_THRESHOLD values, it simulates the cascade (the
+pre-screener answers when confident or when no face was found, otherwise
+the ViT answers) and reports:
+
+    skipped       - share of videos that never reach the ViT
+    vit_saved     - share of ViT seconds saved
+    total_saved   - share of end-to-end (signals + ViT) seconds saved
+    accuracy      - cascade accuracy vs ViT-only accuracy (and the loss)
+    agreement     - share of videos where the cascade matches the ViT-only verdict
+
+The recommended threshold is the lowest (most skipping) one that loses at
+most --max_accuracy_loss accuracy.
+
+Usage:
+    python evaluate_prescreen.py --val_dir data/val --model_path models/model_best.safetensors
+    python evaluate_prescreen.py --val_dir data/val --thresholds 0.8 0.9 0.95 --output prescreen_eval.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from prescreen import Prescreener, FEATURE_NAMES
+from runtime_config import available_cores
+from train_prescreen import load_or_collect
+
+def simulate(data: Dict, p_fake: np.ndarray, threshold: float, skip_faceless: bool) -> Dict:
+    """Cascade outcome for one threshold"""
+    labels = data['labels']
+    vit_pred = data['vit_fake'] >= 0.5
+    pre_pred = p_fake >= 0.5
+    faceless = data['features'][:, FEATURE_NAMES.index('fallback_used')] > 0.5
+
+    skip = np.maximum(p_fake, 1 - p_fake) >= threshold
+    if skip_faceless:
+        skip |= faceless
+    cascade_pred = np.where(skip, pre_pred, vit_pred)
+
+    vit_total = data['vit_seconds'].sum()
+    total = data['signal_seconds'].sum() + vit_total
+    vit_saved = data['vit_seconds'][skip].sum()
+    vit_accuracy = float((vit_pred == labels).mean())
+    accuracy = float((cascade_pred == labels).mean())
+
+    return {
+        'threshold': threshold,
+        'skipped': round(float(skip.mean()), 4),
+        'vit_saved': round(float(vit_saved / vit_total), 4) if vit_total > 0 else 0.0,
+        'total_saved': round(float(vit_saved / total), 4) if total > 0 else 0.0,
+        'accuracy': round(accuracy, 4),
+        'vit_accuracy': round(vit_accuracy, 4),
+        'accuracy_lost': round(vit_accuracy - accuracy, 4),
+        'agreement': round(float((cascade_pred == vit_pred).mean()), 4)
+    }
+
+def main(args):
+    from vit_model import load_vit_model
+
+    prescreener = Prescreener.load(args.prescreen)
+    model = load_vit_model(args.model_path)
+    model.eval()
+
+    cache_path = Path(args.prescreen).with_name(Path(args.prescreen).stem + '_val_features.npz')
+    data = load_or_collect(cache_path, args.val_dir, args, model=model, model_path=args.model_path)
+
+    p_fake = prescreener.predict_proba(data['features'])
+    results = [simulate(data, p_fake, threshold, not args.keep_faceless) for threshold in args.thresholds]
+
+    labels = data['labels']
+    faceless = data['features'][:, FEATURE_NAMES.index('fallback_used')] > 0.5
+    print(f"\n{len(labels)} video(s) ({int(labels.sum())} fake), "
+          f"{int(faceless.sum())} without faces; "
+          f"mean ViT {data['vit_seconds'].mean():.3f}s, signals {data['signal_seconds'].mean():.3f}s per video")
+    print(f"Pre-screener alone: {float(((p_fake >= 0.5) == labels).mean()):.2%} accuracy\n")
+    print(f"{'threshold':>9s} {'skipped':>8s} {'ViT saved':>10s} {'total saved':>12s} "
+          f"{'accuracy':>9s} {'lost':>7s} {'agree':>7s}")
+    for r in results:
+        print(f"{r['threshold']:9.2f} {r['skipped']:8.1%} {r['vit_saved']:10.1%} {r['total_saved']:12.1%} "
+              f"{r['accuracy']:9.2%} {r['accuracy_lost']:+7.2%} {r['agreement']:7.1%}")
+
+    acceptable = [r for r in results if r['accuracy_lost'] <= args.max_accuracy_loss]
+    best = max(acceptable, key=lambda r: r['total_saved']) if acceptable else None
+
+    print(f"\n{'='*60}")
+    if best:
+        print(f"PRESCREEN_THRESHOLD={best['threshold']}: {best['total_saved']:.1%} of compute saved, "
+              f"{best['accuracy_lost']:+.2%} accuracy vs ViT only")
+    else:
+        print(f"No threshold keeps the accuracy loss within {args.max_accuracy_loss:.2%}")
+    print(f"{'='*60}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'videos': int(len(labels)), 'results': results, 'recommended': best}, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report ViT compute saved vs accuracy lost by the pre-screener')
+    parser.add_argument('--val_dir', type=str, default='data/val',
+                        help='Validation data directory (real/ and fake/ subdirectories)')
+    parser.add_argument('--prescreen', type=str, default='models/prescreen.json',
+                        help='Pre-screener from train_prescreen.py')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='ViT weights (random init if omitted)')
+    parser.add_argument('--num_frames', type=int, default=30,
+                        help='Frames extracted per video (match the API setting)')
+    parser.add_argument('--workers', type=int, default=max(1, len(available_cores()) - 1),
+                        help='extract_signals processes')
+    parser.add_argument('--thresholds', type=float, nargs='+',
+                        default=[0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.99, 1.0],
+                        help='PRESCREEN_THRESHOLD values to simulate')
+    parser.add_argument('--keep_faceless', action='store_true',
+                        help='Simulate PRESCREEN_SKIP_FACELESS=0')
+    parser.add_argument('--max_accuracy_loss', type=float, default=0.01,
+                        help='Accuracy loss allowed for the recommended threshold')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Ignore cached features')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write JSON report to this path')
+
+    main(parser.parse_args())
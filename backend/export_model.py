@@ -0,0 +1,52 @@
+"""
+Export Inference Weights
+
+Converts a training checkpoint (model_state_dict + optimizer state, pickled
+by torch.save) into a memory-mapped .safetensors file holding only the model
+weights. load_vit_model maps such files lazily and never unpickles them.
+
+Only run this on checkpoints you trust: reading the .pt file still goes
+through torch.load.
+
+Usage:
+    python export_model.py models/model_best.pt
+    python export_model.py models/model_best.pt --output models/vit.safetensors
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import torch
+
+from weights_io import save_weights
+
+def main(args):
+    checkpoint = torch.load(args.checkpoint, map_location='cpu')
+    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+        state_dict = checkpoint['model_state_dict']
+        metadata = {k: checkpoint[k] for k in ('epoch', 'val_acc', 'val_loss') if k in checkpoint}
+        if 'model_config' in checkpoint:
+            # Architecture of e.g. a distilled student, read back by load_vit_model
+            metadata['model_config'] = json.dumps(checkpoint['model_config'])
+    else:
+        state_dict, metadata = checkpoint, {}
+    metadata['source'] = Path(args.checkpoint).name
+
+    output = args.output or str(Path(args.checkpoint).with_suffix('.safetensors'))
+    save_weights(state_dict, output, metadata=metadata)
+
+    before = os.path.getsize(args.checkpoint) / 1e6
+    after = os.path.getsize(output) / 1e6
+    print(f"✓ Wrote {len(state_dict)} tensors to {output}")
+    print(f"  {before:.1f} MB checkpoint -> {after:.1f} MB weights")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export model weights from a checkpoint to .safetensors')
+    parser.add_argument('checkpoint', type=str,
+                        help='Checkpoint written by train_vit.py (or a raw state dict)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Output path (default: checkpoint path with .safetensors)')
+
+    main(parser.parse_args())
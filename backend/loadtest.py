@@ -0,0 +1,380 @@
+"""
+Load Test for the FastAPI Service
+
+Starts main:app under uvicorn (as a subprocess, in-process on a background
+thread, or uses an already running --url), uploads fixture videos to
+/api/predict/ and sweeps either concurrency (closed loop: N clients each
+send back-to-back requests) or arrival rate (open loop: Poisson arrivals
+at R requests/sec). For every level it records the latency distribution
+(p50/p95/p99), error rate, throughput and server RSS over time, and
+reports the highest level that stays within the latency SLO.
+
+Usage:
+    python loadtest.py --mode mock --concurrency 1 2 4 8 16
+    python loadtest.py --mode vit --concurrency 1 2 --duration 60
+    python loadtest.py --mode mock --rates 5 10 20 40 --output load.json
+    python loadtest.py --url http://localhost:8000 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+
+def free_port() -> int:
+    """An unused local TCP port"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def rss_mb(pid: int) -> float:
+    """Resident set size of a process in MB (Linux /proc)"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+def process_tree(pid: int) -> List[int]:
+    """pid and all of its descendants (Linux /proc)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces; ppid is the second field after it
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        tree.append(stack.pop())
+        stack.extend(children.get(tree[-1], []))
+    return tree
+
+def tree_rss_mb(pid: int) -> float:
+    """RSS of a process and its descendants in MB, e.g. the uvicorn supervisor and its --workers"""
+    return sum(rss_mb(p) for p in process_tree(pid))
+
+class RssSampler:
+    """Samples the RSS of a process tree on a background thread (no-op without a pid)"""
+
+    def __init__(self, pid: Optional[int], interval: float = 0.5):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._start = 0.0
+
+    def _run(self):
+        while self.pid and not self._stop.is_set():
+            self.samples.append((round(time.perf_counter() - self._start, 2), round(tree_rss_mb(self.pid), 1)))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+class ServerProcess:
+    """main:app under uvicorn in a child process"""
+
+    def __init__(self, mode: str, port: int, workers: int = 1):
+        env = dict(os.environ, LOG_LEVEL='WARNING', FORCE_MOCK='1' if mode == 'mock' else '0')
+        self.url = f'http://127.0.0.1:{port}'
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1',
+             '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+            env=env, cwd=Path(__file__).parent
+        )
+        self.pid = self.process.pid
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+class InProcessServer:
+    """main:app under uvicorn on a background thread of this process"""
+
+    def __init__(self, mode: str, port: int):
+        import uvicorn
+        os.environ['LOG_LEVEL'] = 'WARNING'
+        os.environ['FORCE_MOCK'] = '1' if mode == 'mock' else '0'
+        import main
+
+        config = uvicorn.Config(main.app, host='127.0.0.1', port=port, log_level='warning')
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        self.url = f'http://127.0.0.1:{port}'
+        self.pid = os.getpid()
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+def wait_until_ready(url: str, timeout: float = 120.0):
+    """Poll /ready until the model has loaded"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f'{url}/ready', timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout:.0f}s")
+
+def load_fixtures(paths: List[str]) -> List[tuple]:
+    """(filename, bytes) for each fixture video; generates one if none given"""
+    if not paths:
+        from synthetic_videos import make_video_set
+        videos = make_video_set('benchmark_videos', resolutions=((320, 240),), lengths=(2.0,), codecs=('mp4v',))
+        paths = [v['path'] for v in videos]
+    fixtures = [(Path(p).name, Path(p).read_bytes()) for p in paths]
+    print(f"Using {len(fixtures)} fixture video(s): {', '.join(name for name, _ in fixtures)}")
+    return fixtures
+
+async def send_request(client: httpx.AsyncClient, url: str, fixture: tuple, num_frames: int, results: List,
+                       start: Optional[float] = None):
+    """
+    Upload one video and append (latency_seconds, status_code or error name)
+
+    Latency runs from `start` (default: now); open-loop arrivals pass their
+    arrival time so time spent waiting for a client slot is counted.
+    """
+    name, data = fixture
+    start = time.perf_counter() if start is None else start
+    try:
+        response = await client.post(
+            f'{url}/api/predict/',
+            files={'upload_video_file': (name, data, 'video/mp4')},
+            data={'num_frames': str(num_frames)}
+        )
+        outcome = response.status_code
+    except httpx.HTTPError as e:
+        outcome = type(e).__name__
+    results.append((time.perf_counter() - start, outcome))
+
+async def warm_up(url: str, fixture: tuple, num_frames: int, timeout: float):
+    """Send a single untimed request"""
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        await send_request(client, url, fixture, num_frames, [])
+
+async def run_closed_loop(url: str, fixtures: List[tuple], concurrency: int,
+                          duration: float, num_frames: int, timeout: float) -> List:
+    """`concurrency` clients each sending requests back to back for `duration` seconds"""
+    results = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def worker(worker_id: int):
+            i = worker_id
+            while time.perf_counter() < deadline:
+                await send_request(client, url, fixtures[i % len(fixtures)], num_frames, results)
+                i += concurrency
+
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return results
+
+async def run_open_loop(url: str, fixtures: List[tuple], rate: float,
+                        duration: float, num_frames: int, timeout: float, max_in_flight: int) -> List:
+    """Poisson arrivals at `rate` req/s for `duration` seconds, regardless of response times"""
+    results = []
+    rng = random.Random(0)
+    tasks = []
+    in_flight = asyncio.Semaphore(max_in_flight)
+    limits = httpx.Limits(max_connections=max_in_flight)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def one(i: int, arrival: float):
+            # Timed from arrival, not from acquiring the slot: once the server
+            # falls behind, the queueing is part of the latency (no coordinated omission)
+            async with in_flight:
+                await send_request(client, url, fixtures[i % len(fixtures)], num_frames, results, start=arrival)
+
+        start = time.perf_counter()
+        i = 0
+        while time.perf_counter() - start < duration:
+            tasks.append(asyncio.create_task(one(i, time.perf_counter())))
+            i += 1
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+    return results
+
+def summarize(results: List, elapsed: float, rss_samples: List, cores: int) -> Dict:
+    """Latency percentiles, error rate, throughput and RSS for one level"""
+    latencies = np.array([latency for latency, outcome in results if outcome == 200])
+    errors = sum(1 for _, outcome in results if outcome != 200)
+    throughput = len(latencies) / elapsed if elapsed > 0 else 0.0
+    summary = {
+        'requests': len(results),
+        'errors': errors,
+        'error_rate': round(errors / len(results), 4) if results else 0.0,
+        'throughput_rps': round(throughput, 3),
+        'throughput_rps_per_core': round(throughput / cores, 3),
+        'rss_peak_mb': max((mb for _, mb in rss_samples), default=0.0),
+        'rss_timeline': rss_samples
+    }
+    if len(latencies):
+        for name, q in (('p50', 50), ('p95', 95), ('p99', 99)):
+            summary[f'latency_{name}'] = round(float(np.percentile(latencies, q)), 4)
+        summary['latency_mean'] = round(float(latencies.mean()), 4)
+    error_kinds = {}
+    for _, outcome in results:
+        if outcome != 200:
+            error_kinds[str(outcome)] = error_kinds.get(str(outcome), 0) + 1
+    if error_kinds:
+        summary['error_kinds'] = error_kinds
+    return summary
+
+def max_sustainable(levels: List[Dict], slo_p95: float, max_error_rate: float) -> Optional[Dict]:
+    """Highest-throughput level within the p95 SLO and error budget"""
+    ok = [
+        level for level in levels
+        if level.get('latency_p95') is not None
+        and level['latency_p95'] <= slo_p95 and level['error_rate'] <= max_error_rate
+    ]
+    return max(ok, key=lambda level: level['throughput_rps'], default=None)
+
+def main(args):
+    fixtures = load_fixtures(args.videos)
+    cores = args.cores or os.cpu_count() or 1
+
+    server = None
+    if args.url:
+        url, pid = args.url.rstrip('/'), None
+    elif args.server == 'inprocess':
+        server = InProcessServer(args.mode, free_port())
+        url, pid = server.url, server.pid
+    else:
+        server = ServerProcess(args.mode, free_port(), workers=args.workers)
+        url, pid = server.url, server.pid
+
+    report = {
+        'url': url,
+        'mode': args.mode,
+        'server': 'external' if args.url else args.server,
+        'workers': args.workers,
+        'cores': cores,
+        'duration': args.duration,
+        'num_frames': args.num_frames,
+        'levels': []
+    }
+
+    try:
+        print(f"Waiting for {url}...")
+        wait_until_ready(url)
+        idle_rss = tree_rss_mb(pid) if pid else 0.0
+        report['rss_idle_mb'] = round(idle_rss, 1)
+
+        # Warm-up request so model/lazy init is not billed to the first level
+        asyncio.run(warm_up(url, fixtures[0], args.num_frames, args.timeout))
+
+        sweep = [('rate', r) for r in args.rates] if args.rates else [('concurrency', c) for c in args.concurrency]
+        for kind, value in sweep:
+            print(f"\n▶ {kind}={value} for {args.duration:.0f}s")
+            start = time.perf_counter()
+            with RssSampler(pid) as sampler:
+                if kind == 'rate':
+                    results = asyncio.run(run_open_loop(
+                        url, fixtures, value, args.duration, args.num_frames, args.timeout, args.max_in_flight
+                    ))
+                else:
+                    results = asyncio.run(run_closed_loop(
+                        url, fixtures, int(value), args.duration, args.num_frames, args.timeout
+                    ))
+            elapsed = time.perf_counter() - start
+
+            level = {kind: value, **summarize(results, elapsed, sampler.samples, cores)}
+            report['levels'].append(level)
+            print(f"   {level['requests']} requests, {level['throughput_rps']:.2f} req/s "
+                  f"({level['throughput_rps_per_core']:.2f}/core), errors {level['error_rate']:.1%}")
+            if 'latency_p50' in level:
+                print(f"   p50 {level['latency_p50'] * 1000:.0f} ms   p95 {level['latency_p95'] * 1000:.0f} ms   "
+                      f"p99 {level['latency_p99'] * 1000:.0f} ms   peak RSS {level['rss_peak_mb']:.0f} MB")
+    finally:
+        if server is not None:
+            server.stop()
+
+    best = max_sustainable(report['levels'], args.slo_p95, args.max_error_rate)
+    report['max_sustainable'] = {
+        'slo_p95': args.slo_p95,
+        'max_error_rate': args.max_error_rate,
+        'level': {k: v for k, v in best.items() if k != 'rss_timeline'} if best else None
+    }
+
+    print(f"\n{'='*60}")
+    if best:
+        kind = 'rate' if 'rate' in best else 'concurrency'
+        print(f"Max sustainable: {best['throughput_rps']:.2f} req/s ({best['throughput_rps_per_core']:.2f}/core) "
+              f"at {kind}={best[kind]}, p95 {best['latency_p95'] * 1000:.0f} ms")
+    else:
+        print(f"No level met p95 <= {args.slo_p95}s with error rate <= {args.max_error_rate:.0%}")
+    print(f"{'='*60}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test /api/predict/ with concurrency or arrival-rate sweeps')
+    parser.add_argument('--mode', choices=['mock', 'vit'], default='mock',
+                        help='Serve mock predictions (FORCE_MOCK=1) or the full ViT pipeline')
+    parser.add_argument('--server', choices=['subprocess', 'inprocess'], default='subprocess',
+                        help='Run uvicorn as a child process or on a thread of this process')
+    parser.add_argument('--url', type=str, default=None,
+                        help='Test an already running server instead of starting one')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='uvicorn worker processes (subprocess server only)')
+    parser.add_argument('--videos', type=str, nargs='*', default=[],
+                        help='Fixture videos to upload (a synthetic clip is generated if omitted)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8],
+                        help='Closed-loop client counts to sweep')
+    parser.add_argument('--rates', type=float, nargs='+', default=None,
+                        help='Open-loop arrival rates (req/s) to sweep instead of concurrency')
+    parser.add_argument('--max_in_flight', type=int, default=64,
+                        help='Cap on outstanding requests in open-loop mode (waiting for a slot counts toward latency)')
+    parser.add_argument('--duration', type=float, default=20.0,
+                        help='Seconds per level')
+    parser.add_argument('--num_frames', type=int, default=20,
+                        help='num_frames form field sent with each upload')
+    parser.add_argument('--timeout', type=float, default=300.0,
+                        help='Per-request timeout in seconds')
+    parser.add_argument('--cores', type=int, default=None,
+                        help='Cores available to the server, for per-core throughput (default: all)')
+    parser.add_argument('--slo_p95', type=float, default=2.0,
+                        help='p95 latency budget (seconds) for the max sustainable rate')
+    parser.add_argument('--max_error_rate', type=float, default=0.01,
+                        help='Error budget for the max sustainable rate')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write JSON report to this path')
+
+    main(parser.parse_args())
@@ -3,41 +3,153 @@ FastAPI Backend for Deepfake Detection with Vision Transformer
 Advanced Multi-Modal Architecture for Real Deepfake Detection
 """
 
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import time
+_IMPORT_START = time.perf_counter()
+
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, FileResponse, StreamingResponse
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
 import os
-import tempfile
-import shutil
 from pathlib import Path
 import uvicorn
-import time
 import numpy as np
-from typing import Optional, Dict
-import base64
-import io
-from PIL import Image
+from typing import Optional, Dict, List
+
+from metrics import (
+    timed_stage,
+    timed_startup_phase,
+    render_prometheus,
+    REQUEST_SECONDS,
+    REQUESTS_TOTAL,
+    VIT_FRAMES,
+    FEATURE_CACHE_HITS,
+    PRESCREEN_DECISIONS,
+    STARTUP_SECONDS
+)
+from profiling import maybe_profile, find_profile, check_profile_token
+import previews
+from storage import StorageManager, StorageFull
+from video_metadata import read_video_metadata, validate_video, InvalidVideo
 
-# Import Vision Transformer modules
+# Leveled logging; LOG_LEVEL=WARNING silences the per-request pipeline logs
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s")
+logger = logging.getLogger(__name__)
+
+# Vision Transformer modules are imported in the background by load_ml_stack():
+# torch, cv2 and the model take seconds to load, and /health and /ready must
+# answer while that happens
 ML_AVAILABLE = False
 model = None
+prescreener = None  # prescreen.Prescreener when PRESCREEN_MODEL is configured
+MODEL_STATUS = "loading"  # loading -> ready | mock | failed
+MODEL_ERROR: Optional[str] = None  # why the load failed (MODEL_STATUS "failed")
+# Explicit MODEL_PATH, else the newest trained weights if present
+# (.safetensors is memory-mapped, .pt goes through torch.load)
+MODEL_PATH = os.getenv("MODEL_PATH") or next(
+    (str(p) for p in (Path("models/model_best.safetensors"), Path("models/model_best.pt")) if p.exists()),
+    None
+)
+STARTUP_TIMINGS: Dict[str, float] = {}
+_model_loader = None
 
-try:
-    from vit_model import load_vit_model, predict_with_vit
-    from enhanced_processor import (
-        extract_frames_smart,
-        detect_and_crop_faces,
-        analyze_temporal_consistency,
-        detect_compression_artifacts
-    )
-    ML_AVAILABLE = True
-    print("✓ Vision Transformer modules loaded successfully")
-except ImportError as e:
-    print(f"⚠ ML modules not available: {e}")
-    print("  Install required packages: pip install scipy")
-except Exception as e:
-    print(f"⚠ Error loading ML modules: {e}")
+def load_ml_stack(torch_threads: Optional[int] = None):
+    """
+    Import the ML modules and load the model (runs in a worker thread)
+    
+    Sets model, ML_AVAILABLE and MODEL_STATUS. Import failures leave the
+    API in mock mode, as before; a model load failure marks it "failed".
+    
+    Args:
+        torch_threads: torch intra-op threads while loading (default: TORCH_NUM_THREADS)
+    """
+    global model, prescreener, ML_AVAILABLE, MODEL_STATUS, MODEL_ERROR
+    
+    try:
+        with timed_startup_phase('import_vit_model', STARTUP_TIMINGS):
+            from vit_model import load_vit_model, get_vit_transform
+        with timed_startup_phase('import_enhanced_processor', STARTUP_TIMINGS):
+            from enhanced_processor import load_cascades
+        from runtime_config import apply_runtime_config
+        logger.info("✓ Vision Transformer modules loaded successfully")
+    except ImportError as e:
+        logger.warning("⚠ ML modules not available: %s", e)
+        logger.warning("  Install required packages: pip install scipy")
+        MODEL_STATUS = "mock"
+        return
+    except Exception as e:
+        logger.warning("⚠ Error loading ML modules: %s", e)
+        MODEL_STATUS = "mock"
+        return
+    
+    try:
+        # Thread pools / affinity from TORCH_NUM_THREADS, OPENCV_NUM_THREADS, ...
+        apply_runtime_config(torch_threads=torch_threads)
+        logger.info("🚀 Loading Vision Transformer model...")
+        with timed_startup_phase('model_load', STARTUP_TIMINGS):
+            model = load_vit_model(MODEL_PATH)
+        with timed_startup_phase('cascades', STARTUP_TIMINGS):
+            load_cascades()
+        # Imports torchvision, which every prediction's preprocessing needs
+        with timed_startup_phase('vit_transform', STARTUP_TIMINGS):
+            get_vit_transform()
+        from prescreen import load_prescreener, PRESCREEN_MODEL, PRESCREEN_THRESHOLD
+        try:
+            prescreener = load_prescreener()
+            if prescreener is not None:
+                logger.info("✓ Pre-screener loaded from %s (threshold %.2f)", PRESCREEN_MODEL, PRESCREEN_THRESHOLD)
+        except Exception as e:
+            # Optional stage: serve without it rather than fail startup
+            logger.warning("⚠ Pre-screener not loaded (%s); every video goes to the ViT", e)
+        ML_AVAILABLE = True
+        MODEL_STATUS = "ready"
+        logger.info("✓ Vision Transformer model loaded successfully")
+    except Exception as e:
+        logger.error("✗ Failed to load model: %s", e)
+        logger.error("  Serving mock predictions until the model is fixed")
+        MODEL_STATUS = "failed"
+        MODEL_ERROR = str(e)
+    finally:
+        STARTUP_TIMINGS['time_to_ready'] = round(time.perf_counter() - _IMPORT_START, 3)
+        STARTUP_SECONDS.set(STARTUP_TIMINGS['time_to_ready'], phase='time_to_ready')
+        logger.info("⏱️  Startup timings: %s", STARTUP_TIMINGS)
+
+# FORCE_MOCK=1 serves smart_mock_prediction even when the model is available
+# (load tests of the request path without inference cost)
+FORCE_MOCK = os.getenv("FORCE_MOCK", "0") == "1"
+
+# Batch endpoint: decode/face-detection pool size, ViT batch size, and the
+# trusted-caller settings for manifests of local paths (both required)
+BATCH_DECODE_WORKERS = int(os.getenv("BATCH_DECODE_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+BATCH_MAX_VIDEOS = int(os.getenv("BATCH_MAX_VIDEOS", "500"))
+VIT_BATCH_SIZE = int(os.getenv("VIT_BATCH_SIZE", "8"))
+BATCH_TOKEN = os.getenv("BATCH_TOKEN")
+BATCH_MANIFEST_ROOT = os.getenv("BATCH_MANIFEST_ROOT")
+_decode_pool = None
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    """Process pool for extract_signals, created on first batch request (and again if a worker died)"""
+    global _decode_pool
+    if _decode_pool is not None and getattr(_decode_pool, "_broken", False):
+        # A worker killed mid-task (e.g. OOM) breaks the executor for good
+        logger.warning("⚠ Decode pool is broken, starting a new one")
+        _decode_pool.shutdown(wait=False, cancel_futures=True)
+        _decode_pool = None
+    if _decode_pool is None:
+        from pipeline import init_decode_worker
+        # spawn: forking a process that has torch's thread pools running is unsafe
+        _decode_pool = ProcessPoolExecutor(
+            max_workers=BATCH_DECODE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_decode_worker
+        )
+    return _decode_pool
 
 # Create necessary directories
 UPLOAD_DIR = Path("temp_uploads")
@@ -45,35 +157,56 @@ PROCESSED_DIR = Path("processed_media")
 UPLOAD_DIR.mkdir(exist_ok=True)
 PROCESSED_DIR.mkdir(exist_ok=True)
 
+# Upload temp files: tmpfs with spill to UPLOAD_DIR, quotas, periodic janitor
+storage = StorageManager(UPLOAD_DIR, sweep_dirs=[PROCESSED_DIR])
+
+def save_upload(upload: UploadFile) -> str:
+    """Copy an upload into tracked temp storage (503 when storage is full)"""
+    try:
+        return storage.save_upload(upload.file, Path(upload.filename).suffix)
+    except StorageFull as e:
+        raise HTTPException(status_code=503, detail=f"Temporary storage is full: {e}", headers={"Retry-After": "30"})
+
+def check_upload(video_path: str) -> Dict:
+    """Container metadata of a saved upload (400 if unreadable, 413 if over the UPLOAD_MAX_* limits)"""
+    try:
+        return validate_video(video_path)
+    except InvalidVideo as e:
+        raise HTTPException(status_code=413 if e.reason == 'too_large' else 400, detail=str(e))
+
 # Lifespan event handler
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize model and clean up old files"""
-    global model, ML_AVAILABLE
+    """Start loading the model in the background and clean up old files"""
+    global MODEL_STATUS, _model_loader
     
-    # Startup
-    if ML_AVAILABLE:
-        try:
-            print("🚀 Loading Vision Transformer model...")
-            model = load_vit_model()
-            print("✓ Vision Transformer model loaded successfully")
-        except Exception as e:
-            print(f"✗ Failed to load model: {e}")
-            ML_AVAILABLE = False
+    # Startup: the port is bound as soon as this yields; the model loads
+    # in a worker thread and /ready reports when it is done. Workers forked
+    # by serve.py inherit an already loaded model and skip this.
+    if FORCE_MOCK:
+        logger.warning("⚠ FORCE_MOCK set - serving mock predictions")
+        MODEL_STATUS = "mock"
+    elif MODEL_STATUS == "loading":
+        _model_loader = asyncio.create_task(asyncio.to_thread(load_ml_stack))
     
-    # Cleanup old files
+    # Cleanup old files, then keep sweeping while the server runs
     try:
-        for directory in [UPLOAD_DIR, PROCESSED_DIR]:
-            for file in directory.glob("*"):
-                if file.is_file() and time.time() - file.stat().st_mtime > 3600:
-                    file.unlink()
+        storage.sweep()
+        previews.sweep_previews()
     except Exception as e:
-        print(f"Cleanup error: {e}")
+        logger.warning("Cleanup error: %s", e)
+    storage.start_janitor()
     
     yield
     
-    # Shutdown (cleanup if needed)
-    pass
+    await storage.stop_janitor()
+    
+    # Shutdown: the loader thread cannot be interrupted; let it finish
+    if _model_loader is not None and not _model_loader.done():
+        await asyncio.wait([_model_loader])
+    if _decode_pool is not None:
+        _decode_pool.shutdown(wait=False, cancel_futures=True)
+    previews.shutdown()
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -111,7 +244,12 @@ async def root():
         ],
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
             "predict": "/api/predict/",
+            "predict_batch": "/api/predict/batch/",
+            "predict_segmented": "/api/predict/segmented/",
+            "stream": "/ws/stream",
             "docs": "/docs"
         }
     }
@@ -121,6 +259,9 @@ async def health_check():
     return {
         "status": "healthy",
         "model": "Vision Transformer" if ML_AVAILABLE and model else "mock_mode",
+        "model_status": MODEL_STATUS,
+        "model_error": MODEL_ERROR,
+        "model_config": model.config if ML_AVAILABLE and model else None,
         "ml_available": ML_AVAILABLE,
         "face_detection": "multi_scale_opencv",
         "features": {
@@ -131,10 +272,72 @@ async def health_check():
         }
     }
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    200 once predictions can be served, 503 while the model is loading
+    
+    A failed model load is ready too: the endpoints serve mock predictions
+    then, so a bad weights file degrades the service instead of failing the
+    deploy. "degraded" and "model_error" say so.
+    """
+    ready = MODEL_STATUS != "loading"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "model_status": MODEL_STATUS,
+            "degraded": MODEL_STATUS == "failed",
+            "model_error": MODEL_ERROR,
+            "startup_timings": STARTUP_TIMINGS
+        }
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Pipeline counters and latency histograms in Prometheus text format"""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_profile: Optional[str] = Header(None)):
+    """Download a saved request profile (.prof for cProfile, .json chrome trace for torch)"""
+    # Disabled unless PROFILE_TOKEN is set
+    if not check_profile_token(x_profile):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+    path = find_profile(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=path.name)
+
+@app.get("/api/previews/{preview_id}")
+async def get_preview_set(preview_id: str):
+    """URLs of a request's face previews, once they are written"""
+    await previews.wait_for_previews(preview_id)
+    paths = previews.find_preview_set(preview_id)
+    if paths is None:
+        raise HTTPException(status_code=404, detail="Previews not found or expired")
+    return {
+        "preview_id": preview_id,
+        "images": previews.preview_urls(preview_id, len(paths))
+    }
+
+@app.get("/api/previews/{preview_id}/{index}.jpg")
+async def get_preview_image(preview_id: str, index: int):
+    """One face preview (JPEG); waits for the encode if it is still queued"""
+    await previews.wait_for_previews(preview_id)
+    paths = previews.find_preview_set(preview_id)
+    if paths is None or not 0 <= index < len(paths):
+        raise HTTPException(status_code=404, detail="Preview not found or expired")
+    return FileResponse(paths[index], media_type="image/jpeg",
+                        headers={"Cache-Control": f"private, max-age={int(previews.PREVIEW_TTL)}"})
+
 @app.post("/api/predict/")
 async def predict_deepfake(
     upload_video_file: UploadFile = File(...),
-    num_frames: int = Form(30)
+    num_frames: int = Form(30),
+    include_timings: bool = Form(False),
+    include_previews: bool = Form(True),
+    x_profile: Optional[str] = Header(None)
 ):
     """
     Analyze video for deepfake detection using Vision Transformer
@@ -142,6 +345,10 @@ async def predict_deepfake(
     Args:
         upload_video_file: Video file to analyze
         num_frames: Number of frames to extract (10-50)
+        include_timings: Add a per-stage "timings" block (seconds) to the response
+        include_previews: Link face previews (encoded in the background, served
+            by /api/previews/); false leaves the image lists empty
+        x_profile: X-Profile header; profiles this request and returns a profile_id
     
     Returns:
         Comprehensive analysis results including:
@@ -153,8 +360,14 @@ async def predict_deepfake(
     """
     start_time = time.time()
     temp_file_path = None
+    timings = {}
+    mode = "vit" if ML_AVAILABLE and model else "mock"
+    status = "error"
     
     try:
+        if MODEL_STATUS == "loading":
+            raise HTTPException(status_code=503, detail="Model is still loading", headers={"Retry-After": "5"})
+        
         # Validate file
         if not upload_video_file.content_type or not upload_video_file.content_type.startswith('video/'):
             raise HTTPException(status_code=400, detail="File must be a video")
@@ -163,195 +376,539 @@ async def predict_deepfake(
             raise HTTPException(status_code=400, detail="Number of frames must be between 10 and 50")
         
         # Save uploaded file
-        file_extension = Path(upload_video_file.filename).suffix
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension, dir=UPLOAD_DIR) as temp_file:
-            shutil.copyfileobj(upload_video_file.file, temp_file)
-            temp_file_path = temp_file.name
-        
-        # Process video
-        if ML_AVAILABLE and model:
-            result = await process_with_vit(temp_file_path, num_frames, model)
-        else:
-            result = await smart_mock_prediction(temp_file_path, num_frames)
+        with timed_stage('upload', timings):
+            temp_file_path = save_upload(upload_video_file)
+        
+        # Reject unreadable or oversized videos from the container header, before decoding
+        with timed_stage('validate', timings):
+            video_metadata = check_upload(temp_file_path)
+        
+        # Process video (optionally under the profiler)
+        with maybe_profile(x_profile) as profile:
+            if mode == "vit":
+                result = await process_with_vit(temp_file_path, num_frames, model, timings=timings,
+                                                include_previews=include_previews)
+            else:
+                result = await smart_mock_prediction(temp_file_path, num_frames, metadata=video_metadata)
+        if not include_previews:
+            result['preprocessed_images'] = []
+            result['faces_cropped_images'] = []
+        if profile is not None:
+            result['profile_id'] = profile.profile_id
         
         # Add metadata
         result['processing_time'] = round(time.time() - start_time, 2)
         result['model_version'] = "4.0.0"
         result['model_type'] = "Vision Transformer + Temporal Attention"
+        if include_timings:
+            result['timings'] = {**timings, 'total': round(time.time() - start_time, 3)}
+        status = "ok"
         
         return JSONResponse(content=result)
         
-    except HTTPException:
+    except HTTPException as e:
+        status = "rejected" if e.status_code < 500 else "error"
         raise
     except Exception as e:
-        print(f"Error: {e}")
+        logger.error("Error: %s", e)
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
     finally:
+        REQUEST_SECONDS.observe(time.time() - start_time, mode=mode)
+        REQUESTS_TOTAL.inc(mode=mode, status=status)
+        
         # Cleanup
-        if temp_file_path and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+        storage.release(temp_file_path)
 
-async def process_with_vit(video_path: str, num_frames: int, model) -> Dict:
+def resolve_manifest(manifest: str, token: Optional[str]) -> List[Path]:
     """
-    Process video using Vision Transformer with comprehensive analysis
+    Validate a manifest of local video paths from a trusted caller
+    
+    The manifest is a JSON list or one path per line. Paths are resolved
+    against BATCH_MANIFEST_ROOT and must stay inside it.
     """
+    if not BATCH_TOKEN or not BATCH_MANIFEST_ROOT:
+        raise HTTPException(status_code=403, detail="Manifest paths are not enabled on this server")
+    if not token or not hmac.compare_digest(token.encode(), BATCH_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid batch token")
+    
     try:
-        print(f"\n{'='*60}")
-        print(f"🎬 Processing video: {Path(video_path).name}")
-        print(f"{'='*60}")
+        entries = json.loads(manifest) if manifest.lstrip().startswith('[') else manifest.splitlines()
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Manifest must be a JSON list or one path per line")
+    
+    root = Path(BATCH_MANIFEST_ROOT).resolve()
+    paths = []
+    for entry in entries:
+        entry = str(entry).strip()
+        if not entry:
+            continue
+        path = (root / entry).resolve()
+        if not path.is_relative_to(root) or not path.is_file():
+            raise HTTPException(status_code=400, detail=f"Manifest path not allowed: {entry}")
+        paths.append(path)
+    return paths
+
+@app.post("/api/predict/batch/")
+async def predict_batch(
+    files: List[UploadFile] = File(None),
+    manifest: Optional[str] = Form(None),
+    num_frames: int = Form(30),
+    include_previews: bool = Form(False),
+    x_batch_token: Optional[str] = Header(None)
+):
+    """
+    Analyze many videos in one request
+    
+    Args:
+        files: Video files to analyze
+        manifest: Local paths under BATCH_MANIFEST_ROOT (JSON list or one per
+            line); requires the X-Batch-Token header to equal BATCH_TOKEN
+        num_frames: Number of frames to extract per video (10-50)
+        include_previews: Embed base64 face previews in each result
+    
+    Returns:
+        NDJSON stream: one line per video as soon as it is scored
+        ({"index", "filename", ...same fields as /api/predict/}), then a
+        final {"summary": ...} line
+    """
+    if MODEL_STATUS == "loading":
+        raise HTTPException(status_code=503, detail="Model is still loading", headers={"Retry-After": "5"})
+    if not 10 <= num_frames <= 50:
+        raise HTTPException(status_code=400, detail="Number of frames must be between 10 and 50")
+    
+    files = files or []
+    for upload in files:
+        if not upload.content_type or not upload.content_type.startswith('video/'):
+            raise HTTPException(status_code=400, detail=f"File must be a video: {upload.filename}")
+    manifest_paths = resolve_manifest(manifest, x_batch_token) if manifest else []
+    
+    if not files and not manifest_paths:
+        raise HTTPException(status_code=400, detail="No videos provided")
+    if len(files) + len(manifest_paths) > BATCH_MAX_VIDEOS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_VIDEOS} videos per batch")
+    
+    # Uploads are copied to disk before streaming starts: the pool workers
+    # read them by path, and the request body is gone once the response begins
+    videos = []  # (filename, path, is_temporary)
+    try:
+        for upload in files:
+            videos.append((upload.filename, save_upload(upload), True))
+    except Exception:
+        for _, path, _ in videos:
+            storage.release(path)
+        raise
+    videos.extend((path.name, str(path), False) for path in manifest_paths)
+    
+    return StreamingResponse(stream_batch(videos, num_frames, include_previews), media_type="application/x-ndjson")
+
+async def stream_batch(videos: List[tuple], num_frames: int, include_previews: bool):
+    """
+    Score videos and yield NDJSON lines as each one finishes
+    
+    Steps 1-4 run in the decode process pool. Whenever decodes complete,
+    everything that is ready is scored in cross-video ViT batches (in a
+    thread, so the event loop keeps streaming), so batches grow naturally
+    while the ViT is the bottleneck.
+    """
+    start_time = time.time()
+    mode = "vit" if ML_AVAILABLE and model else "mock"
+    counts = {"ok": 0, "fallback": 0}
+    pending = set()
+    
+    def line(index: int, result: Dict) -> str:
+        return json.dumps({"index": index, "filename": videos[index][0], **result}) + "\n"
+    
+    async def fallback(index: int, error: Exception) -> str:
+        # Same behaviour as process_with_vit: fall back to the mock prediction
+        logger.warning("⚠ Batch item %s failed (%s), using mock prediction", videos[index][0], error)
+        counts["fallback"] += 1
+        return line(index, await smart_mock_prediction(videos[index][1], num_frames))
+    
+    try:
+        if mode == "mock":
+            for index, (_, path, _) in enumerate(videos):
+                counts["ok"] += 1
+                yield line(index, await smart_mock_prediction(path, num_frames))
+        else:
+            from pipeline import extract_signals, record_signal_metrics, build_result
+            from vit_model import predict_with_vit_batch
+            
+            pool = get_decode_pool()
+            futures = {}
+            for index, (_, path, _) in enumerate(videos):
+                future = asyncio.wrap_future(pool.submit(extract_signals, path, num_frames))
+                futures[future] = index
+            pending = set(futures)
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                ready = []
+                for future in done:
+                    index = futures[future]
+                    try:
+                        signals = future.result()
+                    except Exception as e:
+                        yield await fallback(index, e)
+                        continue
+                    record_signal_metrics(signals)
+                    prescreened = prescreen_signals(signals)
+                    if prescreened is not None:
+                        counts["ok"] += 1
+                        yield line(index, build_result(signals, prescreened, include_previews=include_previews))
+                        continue
+                    ready.append((index, signals))
+                
+                if not ready:
+                    continue
+                try:
+                    with timed_stage('vit_batch'):
+                        vit_results = await asyncio.to_thread(
+                            predict_with_vit_batch, model, [signals['face_crops'] for _, signals in ready],
+                            batch_size=VIT_BATCH_SIZE
+                        )
+                except Exception as e:
+                    for index, _ in ready:
+                        yield await fallback(index, e)
+                    continue
+                
+                for (index, signals), vit_result in zip(ready, vit_results):
+                    VIT_FRAMES.inc(vit_result['frames_used'])
+                    counts["ok"] += 1
+                    yield line(index, build_result(signals, vit_result, include_previews=include_previews))
+        
+        yield json.dumps({"summary": {
+            "videos": len(videos),
+            "scored": counts["ok"],
+            "fallbacks": counts["fallback"],
+            "mode": mode,
+            "processing_time": round(time.time() - start_time, 2)
+        }}) + "\n"
+    finally:
+        # Client disconnects end the generator early: drop queued work
+        for future in pending:
+            future.cancel()
+        REQUEST_SECONDS.observe(time.time() - start_time, mode=f"{mode}_batch")
+        REQUESTS_TOTAL.inc(mode=f"{mode}_batch", status="ok" if not pending else "error")
+        for _, path, is_temporary in videos:
+            if is_temporary:
+                storage.release(path)
+
+@app.post("/api/predict/segmented/")
+async def predict_segmented(
+    upload_video_file: UploadFile = File(...),
+    window_seconds: float = Form(10.0),
+    stride_seconds: Optional[float] = Form(None),
+    frames_per_segment: int = Form(10)
+):
+    """
+    Analyze a long video window by window
+    
+    Args:
+        upload_video_file: Video file to analyze
+        window_seconds: Window length in seconds (1-300)
+        stride_seconds: Seconds between window starts (default: window_seconds)
+        frames_per_segment: Frames extracted per window (5-50)
+    
+    Returns:
+        Verdict max-pooled over windows (FAKE if any window is flagged),
+        flagged_ranges in seconds and a per-window timeline
+    """
+    start_time = time.time()
+    temp_file_path = None
+    mode = "vit" if ML_AVAILABLE and model else "mock"
+    status = "error"
+    
+    try:
+        if MODEL_STATUS == "loading":
+            raise HTTPException(status_code=503, detail="Model is still loading", headers={"Retry-After": "5"})
+        if not upload_video_file.content_type or not upload_video_file.content_type.startswith('video/'):
+            raise HTTPException(status_code=400, detail="File must be a video")
+        if not 1 <= window_seconds <= 300:
+            raise HTTPException(status_code=400, detail="Window must be between 1 and 300 seconds")
+        if stride_seconds is not None and not 0.5 <= stride_seconds <= window_seconds:
+            raise HTTPException(status_code=400, detail="Stride must be between 0.5 seconds and the window length")
+        if not 5 <= frames_per_segment <= 50:
+            raise HTTPException(status_code=400, detail="Frames per segment must be between 5 and 50")
         
-        # Step 1: Extract high-quality frames
-        print("\n📹 Step 1: Extracting frames...")
-        frames, frame_metadata = extract_frames_smart(video_path, num_frames=num_frames)
-        print(f"   ✓ Extracted {len(frames)} frames")
-        print(f"   ✓ Average quality: {frame_metadata['avg_quality']:.2f}")
+        temp_file_path = save_upload(upload_video_file)
         
-        # Step 2: Detect and crop faces
-        print("\n👤 Step 2: Detecting faces...")
-        face_crops, detection_stats = detect_and_crop_faces(frames, verify_with_eyes=True)
-        print(f"   ✓ Detected {len(face_crops)} faces")
-        print(f"   ✓ Verification rate: {detection_stats['faces_verified']}/{detection_stats['faces_detected']}")
-        print(f"   ✓ Average confidence: {detection_stats['avg_confidence']:.2f}")
+        if mode == "vit":
+            from segment_analysis import run_segmented
+            try:
+                # Blocks on the decode pool and runs the ViT, so keep it off the event loop
+                result = await asyncio.to_thread(
+                    run_segmented, temp_file_path, model, get_decode_pool(),
+                    window_seconds=window_seconds, stride_seconds=stride_seconds,
+                    frames_per_segment=frames_per_segment, batch_size=VIT_BATCH_SIZE,
+                    max_in_flight=2 * BATCH_DECODE_WORKERS
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            result['detection_method'] = "Vision Transformer per time window (max-pooled)"
+        else:
+            result = await smart_mock_prediction(temp_file_path, frames_per_segment)
+            result['timeline'] = []
+            result['flagged_ranges'] = []
         
-        if len(face_crops) == 0:
-            raise ValueError("No faces detected in video")
+        result['processing_time'] = round(time.time() - start_time, 2)
+        result['model_version'] = "4.0.0"
+        status = "ok"
+        return JSONResponse(content=result)
+    
+    except HTTPException as e:
+        status = "rejected" if e.status_code < 500 else "error"
+        raise
+    except Exception as e:
+        logger.error("Error: %s", e)
+        raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
+    finally:
+        REQUEST_SECONDS.observe(time.time() - start_time, mode=f"{mode}_segmented")
+        REQUESTS_TOTAL.inc(mode=f"{mode}_segmented", status=status)
+        storage.release(temp_file_path)
+
+@app.websocket("/ws/stream")
+async def stream_websocket(websocket: WebSocket):
+    """
+    Incremental analysis of a video while it is uploaded or streamed
+    
+    Protocol (JSON text messages, binary payloads):
+        -> {"type": "start", "mode": "chunks" | "frames", "format": ".webm",
+            "frame_stride": 5}                        optional, defaults shown below
+        -> binary: container bytes (chunks mode, default) or one encoded
+           JPEG/PNG image per message (frames mode)
+        <- {"type": "update", "fake_probability", "max_fake_probability", ...}
+           each time STREAM_UPDATE_EVERY new faces were added
+        -> {"type": "end"}
+        <- {"type": "final", "output", "confidence", "probabilities", ...}
+    Errors are sent as {"type": "error", "detail"}; fatal ones close the socket.
+    """
+    await websocket.accept()
+    start_time = time.time()
+    status = "error"
+    
+    if MODEL_STATUS == "loading":
+        await websocket.send_json({"type": "error", "detail": "Model is still loading"})
+        await websocket.close(code=1013)
+        return
+    if not (ML_AVAILABLE and model):
+        await websocket.send_json({"type": "error", "detail": "Streaming analysis needs the ViT model (server is in mock mode)"})
+        await websocket.close(code=1011)
+        return
+    
+    from stream_analysis import StreamingAnalyzer, ChunkDecoder, decode_image
+    
+    mode = "chunks"
+    analyzer = None
+    decoder = None
+    
+    def open_decoder(suffix: str = '.mp4') -> ChunkDecoder:
+        """
+        ChunkDecoder whose temp file is tracked by the storage manager
+        
+        Every chunk is reserved against the disk quota and free-space floor
+        before it is written (StorageFull closes the socket with 1013); the
+        reservation is released with the file.
+        """
+        storage.check_space()
+        chunk_decoder = ChunkDecoder(suffix=suffix, directory=storage.dirs['disk'], reserve=storage.grow)
+        storage.track(chunk_decoder.path)
+        return chunk_decoder
+    
+    async def drain(frames):
+        """Step through decoded frames in a worker thread, pushing updates as they appear"""
+        while True:
+            more, update = await asyncio.to_thread(analyzer.feed_next, frames)
+            if update is not None:
+                await websocket.send_json(update)
+            if not more:
+                return
+    
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                status = "disconnected"
+                return
+            
+            if message.get("text") is not None:
+                try:
+                    control = json.loads(message["text"])
+                except json.JSONDecodeError:
+                    await websocket.send_json({"type": "error", "detail": "Text messages must be JSON"})
+                    continue
+                
+                if control.get("type") == "start" and analyzer is None:
+                    mode = control.get("mode", "chunks")
+                    if mode not in ("chunks", "frames"):
+                        await websocket.send_json({"type": "error", "detail": f"Unknown mode: {mode}"})
+                        await websocket.close(code=1003)
+                        return
+                    suffix = control.get("format", ".mp4")
+                    suffix = suffix if suffix.startswith(".") else f".{suffix}"
+                    # Every frame of a 25-30 fps stream is more evidence than the ViT window needs
+                    frame_stride = int(control.get("frame_stride", 5 if mode == "chunks" else 1))
+                    analyzer = StreamingAnalyzer(model, frame_stride=frame_stride)
+                    if mode == "chunks":
+                        decoder = open_decoder(suffix[:10])
+                elif control.get("type") == "end":
+                    if analyzer is None:
+                        analyzer = StreamingAnalyzer(model)
+                    if decoder is not None:
+                        await drain(decoder.finish())
+                    final = await asyncio.to_thread(analyzer.finish)
+                    final["processing_time"] = round(time.time() - start_time, 2)
+                    await websocket.send_json(final)
+                    await websocket.close()
+                    status = "ok"
+                    return
+                else:
+                    await websocket.send_json({"type": "error", "detail": "Expected a start or end message"})
+                continue
+            
+            data = message.get("bytes")
+            if data is None:
+                continue
+            if analyzer is None:
+                # No start message: defaults (MP4 chunks)
+                analyzer = StreamingAnalyzer(model, frame_stride=5)
+                decoder = open_decoder()
+            
+            if mode == "frames":
+                try:
+                    frame = decode_image(data)
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    continue
+                update = await asyncio.to_thread(analyzer.add_frame, frame)
+                if update is not None:
+                    await websocket.send_json(update)
+            else:
+                try:
+                    frames = decoder.write(data)
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    await websocket.close(code=1009)
+                    return
+                await drain(frames)
+    
+    except WebSocketDisconnect:
+        status = "disconnected"
+    except StorageFull as e:
+        await websocket.send_json({"type": "error", "detail": f"Temporary storage is full: {e}"})
+        await websocket.close(code=1013)
+    except Exception as e:
+        logger.exception("❌ Stream analysis failed: %s", e)
+        try:
+            await websocket.send_json({"type": "error", "detail": f"Processing failed: {str(e)}"})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
+    finally:
+        REQUEST_SECONDS.observe(time.time() - start_time, mode="vit_stream")
+        REQUESTS_TOTAL.inc(mode="vit_stream", status=status)
+        if decoder is not None:
+            decoder.close()
+            storage.release(decoder.path)
+
+def prescreen_signals(signals: Dict, timings: Dict = None) -> Optional[Dict]:
+    """Pre-screener verdict in place of the ViT's, or None to run the ViT (also None when disabled)"""
+    if prescreener is None:
+        return None
+    with timed_stage('prescreen', timings):
+        result = prescreener.decide(signals)
+    PRESCREEN_DECISIONS.inc(outcome=result['prescreen_reason'] if result else "escalated")
+    if result:
+        logger.info("⚡ Pre-screened (%s): ViT skipped", result['prescreen_reason'])
+    return result
+
+async def process_with_vit(video_path: str, num_frames: int, model, timings: Dict = None,
+                           include_previews: bool = True) -> Dict:
+    """
+    Process video using Vision Transformer with comprehensive analysis
+    
+    Args:
+        video_path: Path to the uploaded video
+        num_frames: Number of frames to extract
+        model: Loaded ViT model
+        timings: Optional dict filled with per-stage durations (seconds)
+        include_previews: Queue face previews for background encoding and link them
+    """
+    # Already imported by load_ml_stack at startup, so these are cache lookups
+    from vit_model import predict_with_vit, predict_with_vit_progressive, VIT_EARLY_EXIT
+    from pipeline import extract_signals, record_signal_metrics, build_result
+    
+    if timings is None:
+        timings = {}
+    
+    try:
+        logger.info("=" * 60)
+        logger.info("🎬 Processing video: %s", Path(video_path).name)
+        logger.info("=" * 60)
         
-        # Step 3: Analyze temporal consistency
-        print("\n⏱️  Step 3: Analyzing temporal consistency...")
-        consistency = analyze_temporal_consistency(face_crops)
-        print(f"   ✓ Consistency score: {consistency['consistency_score']:.3f}")
-        if consistency.get('suspicious'):
-            print(f"   ⚠️  High temporal variance detected (potential manipulation)")
+        # Steps 1-4: frames, faces, temporal consistency, compression artifacts
+        signals = extract_signals(video_path, num_frames)
+        record_signal_metrics(signals, timings)
+        face_crops = signals['face_crops']
         
-        # Step 4: Detect compression artifacts
-        print("\n🔍 Step 4: Analyzing compression artifacts...")
-        artifacts = detect_compression_artifacts(face_crops[0])
-        print(f"   ✓ Edge density: {artifacts['edge_density']:.3f}")
-        print(f"   ✓ Block artifacts: {artifacts['block_artifacts']:.2f}")
-        if artifacts.get('suspicious'):
-            print(f"   ⚠️  Suspicious compression patterns detected")
+        # Step 4b: Cheap pre-screen; clear-cut videos skip the ViT
+        vit_result = prescreen_signals(signals, timings)
         
         # Step 5: Run Vision Transformer prediction
-        print("\n🤖 Step 5: Running Vision Transformer inference...")
-        vit_result = predict_with_vit(model, face_crops, return_attention=False)
+        if vit_result is None:
+            logger.info("🤖 Step 5: Running Vision Transformer inference...")
+            with timed_stage('vit', timings):
+                if VIT_EARLY_EXIT:
+                    vit_result = predict_with_vit_progressive(model, face_crops)
+                else:
+                    vit_result = predict_with_vit(model, face_crops, return_attention=False)
+            VIT_FRAMES.inc(vit_result['frames_used'])
+            FEATURE_CACHE_HITS.inc(vit_result.get('cache_hits', 0))
         
-        prediction = vit_result['prediction']
-        confidence = vit_result['confidence']
         probabilities = vit_result['probabilities']
-        
-        print(f"   ✓ Prediction: {'FAKE' if prediction == 1 else 'REAL'}")
-        print(f"   ✓ Confidence: {confidence*100:.2f}%")
-        print(f"   ✓ Real probability: {probabilities['real']*100:.2f}%")
-        print(f"   ✓ Fake probability: {probabilities['fake']*100:.2f}%")
-        
-        # Step 6: Combine all signals for final decision
-        print("\n🎯 Step 6: Multi-modal fusion...")
-        
-        # Adjust confidence based on additional signals
-        final_confidence = confidence
-        warning_flags = []
-        
-        # Temporal consistency check
-        if consistency.get('suspicious'):
-            warning_flags.append("Temporal inconsistency detected")
-            if prediction == 0:  # If predicted REAL but suspicious
-                final_confidence *= 0.8
-        
-        # Compression artifact check
-        if artifacts.get('suspicious'):
-            warning_flags.append("Compression artifacts detected")
-            if prediction == 0:  # If predicted REAL but suspicious
-                final_confidence *= 0.9
-        
-        # Face detection quality check
-        if detection_stats['avg_confidence'] < 0.5:
-            warning_flags.append("Low face detection confidence")
-        
-        # Fallback detection quality check
-        if detection_stats.get('fallback_used'):
-            warning_flags.append("Face detection fallback used")
-            final_confidence *= 0.7
-        
-        print(f"   ✓ Final confidence: {final_confidence*100:.2f}%")
-        if warning_flags:
-            print(f"   ⚠️  Warnings: {', '.join(warning_flags)}")
-        
-        print(f"\n{'='*60}")
-        print(f"✅ Analysis complete!")
-        print(f"{'='*60}\n")
-        
-        # Generate preview images (convert first few faces to base64)
-        preview_images = []
-        for i, face in enumerate(face_crops[:10]):
-            try:
-                # Convert numpy array to PIL Image
-                pil_img = Image.fromarray(face.astype('uint8'))
-                buffer = io.BytesIO()
-                pil_img.save(buffer, format='JPEG', quality=85)
-                img_str = base64.b64encode(buffer.getvalue()).decode()
-                preview_images.append(f"data:image/jpeg;base64,{img_str}")
-            except:
-                preview_images.append(f"https://via.placeholder.com/224x224/ec4899/ffffff?text=Face+{i+1}")
-        
-        # Build comprehensive result
-        result = {
-            "output": "FAKE" if prediction == 1 else "REAL",
-            "confidence": round(final_confidence * 100, 2),
-            "raw_confidence": round(confidence * 100, 2),
-            "probabilities": {
-                "real": round(probabilities['real'] * 100, 2),
-                "fake": round(probabilities['fake'] * 100, 2)
-            },
-            "analysis": {
-                "frames_extracted": len(frames),
-                "faces_detected": len(face_crops),
-                "frame_quality": round(frame_metadata['avg_quality'], 2),
-                "face_detection_confidence": round(detection_stats['avg_confidence'] * 100, 2),
-                "temporal_consistency": round(consistency['consistency_score'] * 100, 2),
-                "compression_artifacts": round(artifacts['block_artifacts'], 2),
-                "warning_flags": warning_flags
-            },
-            "preprocessed_images": preview_images[:10],
-            "faces_cropped_images": preview_images[:10],
-            "original_video": "https://via.placeholder.com/640x480/6b21a8/ffffff?text=Video",
-            "frames_analyzed": len(face_crops),
-            "detection_method": "Vision Transformer + Temporal Attention + Frequency Analysis"
-        }
-        
+        logger.info("   ✓ Prediction: %s", 'FAKE' if vit_result['prediction'] == 1 else 'REAL')
+        logger.info("   ✓ Confidence: %.2f%%", vit_result['confidence'] * 100)
+        logger.info("   ✓ Real probability: %.2f%%", probabilities['real'] * 100)
+        logger.info("   ✓ Fake probability: %.2f%%", probabilities['fake'] * 100)
+        logger.info("   ✓ Frames scored: %d/%d%s", vit_result['frames_used'],
+                    vit_result.get('frames_available', vit_result['frames_used']),
+                    ' (early exit)' if vit_result.get('early_exit') else '')
+        
+        # Previews are encoded in the background; the response only links them
+        preview_id = None
+        if include_previews:
+            with timed_stage('previews', timings):
+                preview_id = previews.schedule_previews(face_crops)
+        
+        # Step 6: Combine all signals and build the response
+        result = build_result(signals, vit_result, timings,
+                              preview_urls=previews.preview_urls(preview_id, len(face_crops)))
+        if preview_id is not None:
+            result['preview_id'] = preview_id
         return result
         
     except Exception as e:
-        print(f"❌ Error in ViT processing: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error in ViT processing: %s", e)
         # Fallback to smart mock
         return await smart_mock_prediction(video_path, num_frames)
 
-async def smart_mock_prediction(video_path: str, num_frames: int) -> Dict:
+async def smart_mock_prediction(video_path: str, num_frames: int, metadata: Optional[Dict] = None) -> Dict:
     """
     Intelligent mock prediction that simulates realistic behavior
     Uses file characteristics to generate consistent results
-    """
-    import hashlib
-    import cv2
     
-    print("\n⚠️  Using mock prediction mode (model not trained)")
+    metadata: read_video_metadata result if the caller already has it
+    (check_upload); otherwise the container header is read here
+    """
+    logger.info("⚠️  Using mock prediction mode (model not trained)")
     
     try:
-        # Analyze video characteristics
-        cap = cv2.VideoCapture(video_path)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        cap.release()
-        
-        # Generate deterministic hash
-        with open(video_path, 'rb') as f:
-            file_hash = hashlib.sha256(f.read(4096)).hexdigest()
+        # Analyze video characteristics (header parse, one file open) and
+        # the deterministic hash of the file head
+        if metadata is None:
+            metadata = read_video_metadata(video_path)
+        total_frames, fps = metadata['total_frames'], metadata['fps']
+        width, height = metadata['width'], metadata['height']
+        file_hash = metadata['head_sha256']
         
         # Use hash to determine prediction (50/50 split)
         hash_value = int(file_hash[:8], 16)
@@ -414,12 +971,12 @@ async def smart_mock_prediction(video_path: str, num_frames: int) -> Dict:
             "note": "⚠️  This is a mock prediction. Train the model on deepfake datasets for real detection!"
         }
         
-        print(f"   Mock prediction: {result['output']} ({result['confidence']}%)")
+        logger.info("   Mock prediction: %s (%s%%)", result['output'], result['confidence'])
         
         return result
         
     except Exception as e:
-        print(f"Error in mock prediction: {e}")
+        logger.error("Error in mock prediction: %s", e)
         # Ultimate fallback
         return {
             "output": "REAL",
@@ -442,6 +999,9 @@ async def smart_mock_prediction(video_path: str, num_frames: int) -> Dict:
             "detection_method": "Fallback mode"
         }
 
+STARTUP_TIMINGS['app_import'] = round(time.perf_counter() - _IMPORT_START, 3)
+STARTUP_SECONDS.set(STARTUP_TIMINGS['app_import'], phase='app_import')
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
     print(f"\n{'='*60}")
@@ -450,6 +1010,7 @@ if __name__ == "__main__":
     print(f"📡 Server: http://0.0.0.0:{port}")
     print(f"📚 Docs: http://0.0.0.0:{port}/docs")
     print(f"🏥 Health: http://0.0.0.0:{port}/health")
+    print(f"✅ Ready: http://0.0.0.0:{port}/ready")
     print(f"{'='*60}\n")
     
     uvicorn.run(
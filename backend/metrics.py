@@ -0,0 +1,214 @@
+"""
+Lightweight Metrics for the Inference Pipeline
+Counters, gauges and histograms rendered in Prometheus text format
+(no prometheus_client dependency), plus per-stage timing spans.
+
+Usage:
+    timings = {}
+    with timed_stage('decode', timings):
+        frames, meta = extract_frames_smart(path)
+    FRAMES_DECODED.inc(meta['frames_decoded'])
+
+    render_prometheus()  # -> text for GET /metrics
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Seconds; covers sub-millisecond stages up to slow full requests
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_REGISTRY: List['_Metric'] = []
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class _Metric:
+    """Base class: a named metric family with optional labels"""
+    metric_type = ''
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.metric_type}']
+        with self._lock:
+            values = self._values or ({(): 0} if not self.label_names else {})
+            for key, value in sorted(values.items()):
+                lines.append(f'{self.name}{_format_labels(self.label_names, key)} {value}')
+        return lines
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    metric_type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    metric_type = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations (cumulative buckets, sum, count)"""
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} {self.metric_type}']
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    le = _format_labels(self.label_names, key, f'le="{bound}"')
+                    lines.append(f'{self.name}_bucket{le} {bucket_count}')
+                inf = _format_labels(self.label_names, key, 'le="+Inf"')
+                lines.append(f'{self.name}_bucket{inf} {count}')
+                labels = _format_labels(self.label_names, key)
+                lines.append(f'{self.name}_sum{labels} {total}')
+                lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+def render_prometheus() -> str:
+    """All registered metrics in Prometheus text exposition format"""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# Pipeline metrics
+STAGE_SECONDS = Histogram(
+    'deepfake_stage_seconds', 'Time spent in each pipeline stage', labels=('stage',)
+)
+REQUEST_SECONDS = Histogram(
+    'deepfake_request_seconds', 'End-to-end predict request latency', labels=('mode',)
+)
+REQUESTS_TOTAL = Counter(
+    'deepfake_requests_total', 'Predict requests by processing mode and outcome', labels=('mode', 'status')
+)
+FRAMES_DECODED = Counter(
+    'deepfake_frames_decoded_total', 'Video frames decoded for analysis'
+)
+CASCADE_CALLS = Counter(
+    'deepfake_cascade_calls_total', 'Haar cascade detectMultiScale calls'
+)
+FACES_FOUND = Counter(
+    'deepfake_faces_found_total', 'Face crops passed to the model'
+)
+VIDEOS_ANALYZED = Counter(
+    'deepfake_videos_analyzed_total', 'Videos that went through face detection'
+)
+FACE_FALLBACKS = Counter(
+    'deepfake_face_fallback_total', 'Videos where no face was found and center crops were used'
+)
+FALLBACK_RATE = Gauge(
+    'deepfake_face_fallback_ratio', 'Fraction of analyzed videos that used the center-crop fallback'
+)
+VIT_FRAMES = Counter(
+    'deepfake_vit_frames_total', 'Frames scored by the ViT'
+)
+FEATURE_CACHE_HITS = Counter(
+    'deepfake_feature_cache_hits_total', 'Per-frame ViT features reused instead of recomputed'
+)
+PRESCREEN_DECISIONS = Counter(
+    'deepfake_prescreen_decisions_total', 'Pre-screener outcomes (confident/faceless skip the ViT)', labels=('outcome',)
+)
+STARTUP_SECONDS = Gauge(
+    'deepfake_startup_seconds', 'Duration of each startup phase (imports, model load)', labels=('phase',)
+)
+
+# Temp storage (storage.StorageManager); location is "tmpfs" or "disk"
+STORAGE_BYTES = Gauge(
+    'deepfake_storage_bytes', 'Bytes in temp files tracked by this process', labels=('location',)
+)
+STORAGE_FILES = Gauge(
+    'deepfake_storage_files', 'Temp files tracked by this process', labels=('location',)
+)
+STORAGE_FREE_BYTES = Gauge(
+    'deepfake_storage_free_bytes', 'Free space on the filesystem of each temp location', labels=('location',)
+)
+STORAGE_SPILLS = Counter(
+    'deepfake_storage_spills_total', 'Uploads moved from tmpfs to disk after crossing the size threshold'
+)
+STORAGE_SWEPT = Counter(
+    'deepfake_storage_swept_files_total', 'Leaked or expired temp files removed by the janitor', labels=('location',)
+)
+STORAGE_REJECTIONS = Counter(
+    'deepfake_storage_rejections_total', 'Uploads refused by a quota or the free-space floor', labels=('reason',)
+)
+
+def record_face_detection(faces: int, fallback_used: bool):
+    """Update face counters and the fallback ratio gauge"""
+    VIDEOS_ANALYZED.inc()
+    FACES_FOUND.inc(faces)
+    if fallback_used:
+        FACE_FALLBACKS.inc()
+    FALLBACK_RATE.set(round(FACE_FALLBACKS.value() / VIDEOS_ANALYZED.value(), 4))
+
+@contextmanager
+def timed_stage(stage: str, timings: Optional[Dict[str, float]] = None, observe: bool = True):
+    """
+    Time a pipeline stage
+
+    Records the duration in STAGE_SECONDS and, if a dict is given, under
+    timings[stage] (seconds, rounded to ms) for the per-request response.
+    observe=False only fills timings, for code that may run in a pool
+    worker whose metrics are never scraped.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if observe:
+            STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = round(elapsed, 3)
+
+@contextmanager
+def timed_startup_phase(phase: str, timings: Optional[Dict[str, float]] = None):
+    """Time a one-off startup phase into STARTUP_SECONDS (and timings[phase])"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = round(time.perf_counter() - start, 3)
+        STARTUP_SECONDS.set(elapsed, phase=phase)
+        if timings is not None:
+            timings[phase] = elapsed
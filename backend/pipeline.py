@@ -0,0 +1,237 @@
+"""
+Detection Pipeline Stages
+The steps of process_with_vit, split so they can run in different places:
+
+    signals = extract_signals(path, num_frames)          # steps 1-4, OpenCV/numpy only
+    record_signal_metrics(signals)                       # in the serving process
+    vit_result = predict_with_vit(model, signals['face_crops'])
+    result = build_result(signals, vit_result)           # step 6
+
+extract_signals does not touch torch or the metrics registry, so it can run
+in a process pool (batch endpoint, bulk scoring) and its output pickles
+cheaply: face crops and small stats dicts, not the decoded frames.
+"""
+
+import base64
+import io
+import logging
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+from enhanced_processor import (
+    extract_frames_smart,
+    detect_and_crop_faces,
+    analyze_temporal_consistency,
+    detect_compression_artifacts
+)
+from metrics import (
+    timed_stage,
+    record_face_detection,
+    STAGE_SECONDS,
+    FRAMES_DECODED,
+    CASCADE_CALLS
+)
+
+logger = logging.getLogger(__name__)
+
+def init_decode_worker():
+    """Process-pool initializer: one OpenCV thread per worker process"""
+    import cv2
+    cv2.setNumThreads(1)
+
+def extract_signals(video_path: str, num_frames: int, start_frame: int = 0, end_frame: Optional[int] = None) -> Dict:
+    """
+    Steps 1-4: decode, detect faces, temporal consistency, compression artifacts
+
+    Args:
+        video_path: Video file
+        num_frames: Number of frames to extract
+        start_frame: First frame of the window to sample from (segmented analysis)
+        end_frame: End of the window (exclusive); defaults to the end of the video
+
+    Returns:
+        Dict with face_crops, frames_extracted, frame_metadata, detection_stats,
+        consistency, artifacts and per-stage timings (seconds)
+
+    Raises:
+        ValueError: If no faces were found
+    """
+    timings = {}
+
+    # Step 1: Extract high-quality frames
+    logger.info("📹 Step 1: Extracting frames...")
+    with timed_stage('decode', timings, observe=False):
+        frames, frame_metadata = extract_frames_smart(video_path, num_frames=num_frames,
+                                                       start_frame=start_frame, end_frame=end_frame)
+    logger.info("   ✓ Extracted %d frames", len(frames))
+    logger.info("   ✓ Average quality: %.2f", frame_metadata['avg_quality'])
+
+    # Step 2: Detect and crop faces
+    logger.info("👤 Step 2: Detecting faces...")
+    with timed_stage('face_detection', timings, observe=False):
+        face_crops, detection_stats = detect_and_crop_faces(frames, verify_with_eyes=True)
+    logger.info("   ✓ Detected %d faces", len(face_crops))
+    logger.info("   ✓ Verification rate: %d/%d", detection_stats['faces_verified'], detection_stats['faces_detected'])
+    logger.info("   ✓ Average confidence: %.2f", detection_stats['avg_confidence'])
+
+    if len(face_crops) == 0:
+        raise ValueError("No faces detected in video")
+
+    # Step 3: Analyze temporal consistency
+    logger.info("⏱️  Step 3: Analyzing temporal consistency...")
+    with timed_stage('temporal_consistency', timings, observe=False):
+        consistency = analyze_temporal_consistency(face_crops)
+    logger.info("   ✓ Consistency score: %.3f", consistency['consistency_score'])
+    if consistency.get('suspicious'):
+        logger.info("   ⚠️  High temporal variance detected (potential manipulation)")
+
+    # Step 4: Detect compression artifacts
+    logger.info("🔍 Step 4: Analyzing compression artifacts...")
+    with timed_stage('compression_artifacts', timings, observe=False):
+        artifacts = detect_compression_artifacts(face_crops[0])
+    logger.info("   ✓ Edge density: %.3f", artifacts['edge_density'])
+    logger.info("   ✓ Block artifacts: %.2f", artifacts['block_artifacts'])
+    if artifacts.get('suspicious'):
+        logger.info("   ⚠️  Suspicious compression patterns detected")
+
+    return {
+        'face_crops': face_crops,
+        'frames_extracted': len(frames),
+        'frame_metadata': frame_metadata,
+        'detection_stats': detection_stats,
+        'consistency': consistency,
+        'artifacts': artifacts,
+        'timings': timings
+    }
+
+def record_signal_metrics(signals: Dict, timings: Dict = None):
+    """
+    Update the pipeline metrics for one extract_signals result
+
+    Called in the serving process, since counters updated inside a pool
+    worker would never be scraped. Stage timings are also copied into
+    `timings` when given.
+    """
+    for stage, seconds in signals['timings'].items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    if timings is not None:
+        timings.update(signals['timings'])
+
+    FRAMES_DECODED.inc(signals['frame_metadata'].get('frames_decoded', signals['frames_extracted']))
+    CASCADE_CALLS.inc(signals['detection_stats'].get('cascade_calls', 0))
+    record_face_detection(len(signals['face_crops']), signals['detection_stats'].get('fallback_used', False))
+
+def encode_previews(face_crops, limit: int = 10):
+    """First `limit` face crops as base64 JPEG data URLs"""
+    preview_images = []
+    for i, face in enumerate(face_crops[:limit]):
+        try:
+            # Convert numpy array to PIL Image
+            pil_img = Image.fromarray(face.astype('uint8'))
+            buffer = io.BytesIO()
+            pil_img.save(buffer, format='JPEG', quality=85)
+            img_str = base64.b64encode(buffer.getvalue()).decode()
+            preview_images.append(f"data:image/jpeg;base64,{img_str}")
+        except:
+            preview_images.append(f"https://via.placeholder.com/224x224/ec4899/ffffff?text=Face+{i+1}")
+    return preview_images
+
+def build_result(signals: Dict, vit_result: Dict, timings: Dict = None, include_previews: bool = False,
+                 preview_urls: Optional[List[str]] = None) -> Dict:
+    """
+    Step 6: combine the ViT prediction with the cheap signals into the API response
+
+    Args:
+        signals: Output of extract_signals
+        vit_result: Output of predict_with_vit / predict_with_vit_progressive / predict_with_vit_batch,
+            or a Prescreener.decide result
+        timings: Optional dict; inline preview encoding time is added under "previews"
+        include_previews: Embed base64 face previews (batch responses)
+        preview_urls: Links to previews encoded off the request path (see previews.py);
+            used instead of inline previews when given
+    """
+    detection_stats = signals['detection_stats']
+    consistency = signals['consistency']
+    artifacts = signals['artifacts']
+    face_crops = signals['face_crops']
+
+    prediction = vit_result['prediction']
+    confidence = vit_result['confidence']
+    probabilities = vit_result['probabilities']
+    vit_frames_used = vit_result['frames_used']
+    vit_frames_available = vit_result.get('frames_available', vit_frames_used)
+
+    # Step 6: Combine all signals for final decision
+    logger.info("🎯 Step 6: Multi-modal fusion...")
+
+    # Adjust confidence based on additional signals
+    final_confidence = confidence
+    warning_flags = []
+
+    # Temporal consistency check
+    if consistency.get('suspicious'):
+        warning_flags.append("Temporal inconsistency detected")
+        if prediction == 0:  # If predicted REAL but suspicious
+            final_confidence *= 0.8
+
+    # Compression artifact check
+    if artifacts.get('suspicious'):
+        warning_flags.append("Compression artifacts detected")
+        if prediction == 0:  # If predicted REAL but suspicious
+            final_confidence *= 0.9
+
+    # Face detection quality check
+    if detection_stats['avg_confidence'] < 0.5:
+        warning_flags.append("Low face detection confidence")
+
+    # Fallback detection quality check
+    if detection_stats.get('fallback_used'):
+        warning_flags.append("Face detection fallback used")
+        final_confidence *= 0.7
+
+    logger.info("   ✓ Final confidence: %.2f%%", final_confidence * 100)
+    if warning_flags:
+        logger.info("   ⚠️  Warnings: %s", ', '.join(warning_flags))
+
+    logger.info("✅ Analysis complete!")
+
+    # Preview images: links from previews.py, or the first few faces inlined as base64
+    preview_images = []
+    if preview_urls is not None:
+        preview_images = preview_urls
+    elif include_previews:
+        with timed_stage('previews', timings):
+            preview_images = encode_previews(face_crops)
+
+    # Build comprehensive result
+    return {
+        "output": "FAKE" if prediction == 1 else "REAL",
+        "confidence": round(final_confidence * 100, 2),
+        "raw_confidence": round(confidence * 100, 2),
+        "probabilities": {
+            "real": round(probabilities['real'] * 100, 2),
+            "fake": round(probabilities['fake'] * 100, 2)
+        },
+        "analysis": {
+            "frames_extracted": signals['frames_extracted'],
+            "faces_detected": len(face_crops),
+            "frame_quality": round(signals['frame_metadata']['avg_quality'], 2),
+            "face_detection_confidence": round(detection_stats['avg_confidence'] * 100, 2),
+            "temporal_consistency": round(consistency['consistency_score'] * 100, 2),
+            "compression_artifacts": round(artifacts['block_artifacts'], 2),
+            "vit_frames_used": vit_frames_used,
+            "vit_frames_available": vit_frames_available,
+            "early_exit": vit_result.get('early_exit', False),
+            "prescreened": vit_result.get('prescreened', False),
+            "warning_flags": warning_flags
+        },
+        # Same list under both keys (the frontend shows both); URLs make the repeat cheap
+        "preprocessed_images": preview_images[:10],
+        "faces_cropped_images": preview_images[:10],
+        "original_video": "https://via.placeholder.com/640x480/6b21a8/ffffff?text=Video",
+        "frames_analyzed": len(face_crops),
+        "detection_method": ("Pre-screen on frame, face, temporal and artifact signals"
+                             if vit_result.get('prescreened') else
+                             "Vision Transformer + Temporal Attention + Frequency Analysis")
+    }
@@ -0,0 +1,175 @@
+"""
+Cheap Pre-Screening Before the ViT
+
+extract_signals already computes frame quality, face-detection stats,
+temporal consistency and compression artifacts for every video. A logistic
+regression over those features decides whether a video is clear-cut enough
+to skip the ViT forward pass:
+
+    p_fake = prescreener.predict_proba(signal_features(signals))
+    max(p_fake, 1 - p_fake) >= PRESCREEN_THRESHOLD  -> answer from p_fake
+    otherwise                                       -> escalate to the ViT
+
+Videos where face detection fell back to center crops (no faces) are
+answered by the pre-screener regardless of the threshold when
+PRESCREEN_SKIP_FACELESS is on, since the ViT only sees background there.
+
+The model is a JSON file (feature names, standardization, weights) written
+by train_prescreen.py; evaluate_prescreen.py reports ViT compute saved vs
+accuracy lost per threshold.
+
+Environment:
+    PRESCREEN_MODEL         - Model file (default: models/prescreen.json if present; unset disables)
+    PRESCREEN_THRESHOLD     - Confidence needed to skip the ViT (default: 0.9; 1.0 never skips)
+    PRESCREEN_SKIP_FACELESS - Skip the ViT when no face was found (default: 1)
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+PRESCREEN_MODEL = os.getenv("PRESCREEN_MODEL") or (
+    "models/prescreen.json" if Path("models/prescreen.json").exists() else None
+)
+PRESCREEN_THRESHOLD = float(os.getenv("PRESCREEN_THRESHOLD", "0.9"))
+PRESCREEN_SKIP_FACELESS = os.getenv("PRESCREEN_SKIP_FACELESS", "1") == "1"
+
+FEATURE_NAMES = (
+    'log_frame_quality',
+    'face_ratio',
+    'face_detection_confidence',
+    'eye_verification_rate',
+    'fallback_used',
+    'consistency_score',
+    'log_mean_difference',
+    'log_std_difference',
+    'edge_density',
+    'block_artifacts'
+)
+
+def signal_features(signals: Dict) -> np.ndarray:
+    """Feature vector (FEATURE_NAMES order) from a pipeline.extract_signals result"""
+    stats = signals['detection_stats']
+    consistency = signals['consistency']
+    artifacts = signals['artifacts']
+    frames = max(1, signals['frames_extracted'])
+
+    return np.array([
+        np.log1p(signals['frame_metadata']['avg_quality']),
+        len(signals['face_crops']) / frames,
+        stats['avg_confidence'],
+        stats.get('faces_verified', 0) / max(1, stats.get('faces_detected', 0)),
+        float(bool(stats.get('fallback_used'))),
+        consistency['consistency_score'],
+        np.log1p(consistency.get('mean_difference', 0.0)),
+        np.log1p(consistency.get('std_difference', 0.0)),
+        artifacts['edge_density'],
+        artifacts['block_artifacts']
+    ], dtype=np.float64)
+
+def sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+class Prescreener:
+    """
+    Logistic regression over signal_features
+
+    Args:
+        weights: (n_features,) coefficients on standardized features
+        bias: Intercept
+        mean, std: Standardization fitted on the training set
+        threshold: Confidence max(p, 1 - p) needed to skip the ViT
+        skip_faceless: Answer fallback (no-face) videos without the ViT
+    """
+
+    def __init__(self, weights, bias: float, mean, std,
+                 threshold: float = PRESCREEN_THRESHOLD, skip_faceless: bool = PRESCREEN_SKIP_FACELESS):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.std = np.asarray(std, dtype=np.float64)
+        self.threshold = threshold
+        self.skip_faceless = skip_faceless
+
+    @classmethod
+    def fit(cls, features: np.ndarray, labels: np.ndarray, l2: float = 1e-2,
+            lr: float = 0.5, epochs: int = 2000) -> 'Prescreener':
+        """Full-batch gradient descent on the L2-regularized log loss"""
+        mean = features.mean(axis=0)
+        std = features.std(axis=0)
+        std[std < 1e-8] = 1.0
+        x = (features - mean) / std
+        y = labels.astype(np.float64)
+
+        weights = np.zeros(x.shape[1])
+        bias = 0.0
+        for _ in range(epochs):
+            error = sigmoid(x @ weights + bias) - y
+            weights -= lr * (x.T @ error / len(y) + l2 * weights)
+            bias -= lr * error.mean()
+        return cls(weights, bias, mean, std)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """Fake probability for one feature vector or a (N, n_features) matrix"""
+        return sigmoid(((features - self.mean) / self.std) @ self.weights + self.bias)
+
+    def decide(self, signals: Dict) -> Optional[Dict]:
+        """
+        Pre-screen one video
+
+        Returns:
+            A result dict shaped like predict_with_vit's (prediction, confidence,
+            probabilities, frames_used=0, plus prescreened/prescreen_reason) when
+            the ViT can be skipped, or None to escalate
+        """
+        p_fake = float(self.predict_proba(signal_features(signals)))
+        confidence = max(p_fake, 1.0 - p_fake)
+
+        if self.skip_faceless and signals['detection_stats'].get('fallback_used'):
+            reason = 'faceless'
+        elif confidence >= self.threshold:
+            reason = 'confident'
+        else:
+            return None
+
+        return {
+            'prediction': int(p_fake >= 0.5),
+            'confidence': confidence,
+            'probabilities': {'real': 1.0 - p_fake, 'fake': p_fake},
+            'frames_used': 0,
+            'prescreened': True,
+            'prescreen_reason': reason
+        }
+
+    def save(self, path: str, metadata: Dict = None):
+        """Write the model as JSON"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({
+                'features': list(FEATURE_NAMES),
+                'weights': self.weights.tolist(),
+                'bias': self.bias,
+                'mean': self.mean.tolist(),
+                'std': self.std.tolist(),
+                'metadata': metadata or {}
+            }, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str, threshold: float = PRESCREEN_THRESHOLD,
+             skip_faceless: bool = PRESCREEN_SKIP_FACELESS) -> 'Prescreener':
+        """Read a model written by save()"""
+        with open(path) as f:
+            data = json.load(f)
+        if tuple(data['features']) != FEATURE_NAMES:
+            raise ValueError(f"{path} was trained on different features: {data['features']}")
+        return cls(data['weights'], data['bias'], data['mean'], data['std'],
+                   threshold=threshold, skip_faceless=skip_faceless)
+
+def load_prescreener(path: Optional[str] = PRESCREEN_MODEL) -> Optional[Prescreener]:
+    """The configured pre-screener, or None when disabled"""
+    if not path:
+        return None
+    return Prescreener.load(path)
@@ -0,0 +1,144 @@
+"""
+Face Preview Thumbnails Off the Request Path
+
+/api/predict/ used to JPEG-encode and base64-inline the face crops in every
+response. Now the response only carries URLs: schedule_previews hands the
+crops to a small thread pool that writes them under
+processed_media/previews/<preview_id>/<index>.jpg, and the GET
+/api/previews/ endpoints serve them (waiting for the encode if a client
+asks this worker before it has finished; other workers answer 404 until
+the set is complete).
+
+Preview directories older than PREVIEW_TTL seconds are swept at most once
+a minute, from the same pool.
+
+Environment:
+    PREVIEW_WORKERS  - JPEG encoding threads (default: 2)
+    PREVIEW_TTL      - Seconds a preview set is kept (default: 3600)
+    PREVIEW_LIMIT    - Face crops stored per request (default: 10)
+    PREVIEW_BASE_URL - Public base URL of this API for preview links (default: unset,
+                       links are relative /api/previews/... paths, which the Next.js
+                       app proxies to the backend; railway.json sets it)
+"""
+
+import asyncio
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from metrics import timed_stage
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_DIR = Path("processed_media") / "previews"
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "2"))
+PREVIEW_TTL = float(os.getenv("PREVIEW_TTL", "3600"))
+PREVIEW_LIMIT = int(os.getenv("PREVIEW_LIMIT", "10"))
+PREVIEW_BASE_URL = os.getenv("PREVIEW_BASE_URL")
+
+_PREVIEW_ID = re.compile(r"^[0-9a-f]{32}$")
+_SWEEP_INTERVAL = 60.0
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pending: Dict[str, Future] = {}
+_last_sweep = 0.0
+
+def get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=PREVIEW_WORKERS, thread_name_prefix="preview")
+    return _pool
+
+def shutdown():
+    """Finish queued encodes and stop the pool (server shutdown)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+def write_previews(preview_id: str, face_crops: List[np.ndarray]):
+    """JPEG-encode face crops into PREVIEW_DIR/<preview_id>/ (runs in the pool)"""
+    # Written to a temp directory and renamed once complete, so other server
+    # workers (which can't wait on this one's future) never see a partial set
+    tmp_dir = PREVIEW_DIR / f"{preview_id}.tmp"
+    tmp_dir.mkdir(parents=True, exist_ok=True)
+    with timed_stage('preview_encode'):
+        for i, face in enumerate(face_crops):
+            Image.fromarray(face.astype('uint8')).save(tmp_dir / f"{i}.jpg", format='JPEG', quality=85)
+    tmp_dir.replace(PREVIEW_DIR / preview_id)
+
+def sweep_previews(max_age: float = PREVIEW_TTL):
+    """Delete preview sets older than max_age seconds"""
+    if not PREVIEW_DIR.exists():
+        return
+    cutoff = time.time() - max_age
+    for directory in PREVIEW_DIR.iterdir():
+        try:
+            if directory.is_dir() and directory.stat().st_mtime < cutoff:
+                shutil.rmtree(directory, ignore_errors=True)
+        except OSError as e:
+            logger.warning("Preview cleanup error: %s", e)
+
+def _done(preview_id: str, future: Future):
+    _pending.pop(preview_id, None)
+    if future.exception() is not None:
+        logger.warning("⚠ Preview encoding failed for %s: %s", preview_id, future.exception())
+
+def schedule_previews(face_crops: List[np.ndarray], limit: int = PREVIEW_LIMIT) -> Optional[str]:
+    """
+    Queue the first `limit` face crops for encoding
+
+    Returns:
+        The preview_id to build URLs from, or None if there are no crops
+    """
+    global _last_sweep
+    if not face_crops or limit <= 0:
+        return None
+
+    pool = get_pool()
+    now = time.time()
+    if now - _last_sweep > _SWEEP_INTERVAL:
+        _last_sweep = now
+        pool.submit(sweep_previews)
+
+    preview_id = uuid.uuid4().hex
+    future = pool.submit(write_previews, preview_id, list(face_crops[:limit]))
+    _pending[preview_id] = future
+    future.add_done_callback(lambda f: _done(preview_id, f))
+    return preview_id
+
+def preview_urls(preview_id: Optional[str], count: int) -> List[str]:
+    """URLs of a preview set, relative unless PREVIEW_BASE_URL is set"""
+    if preview_id is None:
+        return []
+    # Relative without PREVIEW_BASE_URL: the browser resolves them against the Next.js
+    # origin, whose /api/previews rewrite (next.config.js) forwards to this API
+    base = (PREVIEW_BASE_URL or "").rstrip('/')
+    return [f"{base}/api/previews/{preview_id}/{i}.jpg" for i in range(min(count, PREVIEW_LIMIT))]
+
+async def wait_for_previews(preview_id: str):
+    """Wait until a scheduled preview set is written (no-op if already done)"""
+    future = _pending.get(preview_id)
+    if future is not None:
+        try:
+            await asyncio.wrap_future(future)
+        except Exception:
+            pass
+
+def find_preview_set(preview_id: str) -> Optional[List[Path]]:
+    """Image files of a preview set in index order, or None if unknown/expired"""
+    if not _PREVIEW_ID.match(preview_id):
+        return None
+    directory = PREVIEW_DIR / preview_id
+    if not directory.is_dir():
+        return None
+    return sorted(directory.glob("*.jpg"), key=lambda path: int(path.stem))
@@ -0,0 +1,126 @@
+"""
+Opt-in Request Profiling
+Profiles individual predict requests with cProfile or the torch profiler
+and saves the trace under processed_media/ for later download.
+
+A request is profiled when it sends an `X-Profile` header equal to
+PROFILE_TOKEN, or at random with probability PROFILE_SAMPLE_RATE. When
+neither applies, maybe_profile() returns a shared no-op context, so
+disabled profiling costs one comparison. Without PROFILE_TOKEN the header
+is ignored and saved profiles can't be downloaded (fails closed, like
+BATCH_TOKEN).
+
+Environment:
+    PROFILE_SAMPLE_RATE - Fraction of requests to profile (default: 0)
+    PROFILE_MODE        - "cprofile" (default) or "torch"
+    PROFILE_TOKEN       - X-Profile value that triggers profiling and allows downloads (default: unset, disabled)
+"""
+
+import cProfile
+import hmac
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile").lower()
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN") or None
+PROFILE_DIR = Path("processed_media")
+
+_PROFILE_ID = re.compile(r'^[0-9a-f]{32}$')
+_DISABLED = nullcontext()
+
+class RequestProfiler:
+    """Context manager that profiles its body and writes the artifact"""
+
+    def __init__(self, mode: str = PROFILE_MODE, output_dir: Path = PROFILE_DIR):
+        self.mode = mode
+        self.output_dir = output_dir
+        self.profile_id = uuid.uuid4().hex
+        self.path = None
+        self._profiler = None
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        if self.mode == 'torch':
+            import torch.profiler
+            self._profiler = torch.profiler.profile(
+                activities=[torch.profiler.ProfilerActivity.CPU],
+                record_shapes=True
+            )
+            self._profiler.__enter__()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.output_dir.mkdir(exist_ok=True)
+            if self.mode == 'torch':
+                self._profiler.__exit__(exc_type, exc, tb)
+                self.path = self.output_dir / f"profile_{self.profile_id}.json"
+                self._profiler.export_chrome_trace(str(self.path))
+            else:
+                self._profiler.disable()
+                self.path = self.output_dir / f"profile_{self.profile_id}.prof"
+                self._profiler.dump_stats(str(self.path))
+                self._write_summary()
+            logger.info("📊 Profile %s saved (%.2fs): %s",
+                        self.profile_id, time.perf_counter() - self._start, self.path)
+        except Exception as e:
+            logger.warning("Could not save profile: %s", e)
+        return False
+
+    def _write_summary(self):
+        """Human-readable top functions next to the .prof file"""
+        buffer = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=buffer)
+        stats.sort_stats('cumulative').print_stats(40)
+        (self.output_dir / f"profile_{self.profile_id}.txt").write_text(buffer.getvalue())
+
+def check_profile_token(value: Optional[str]) -> bool:
+    """True if value is PROFILE_TOKEN (always False when no token is configured)"""
+    if PROFILE_TOKEN is None or not value:
+        return False
+    return hmac.compare_digest(value.encode(), PROFILE_TOKEN.encode())
+
+def should_profile(header_value: Optional[str]) -> bool:
+    """Decide whether this request is profiled"""
+    if header_value:
+        return check_profile_token(header_value)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def maybe_profile(header_value: Optional[str] = None):
+    """
+    Profiling context for one request
+
+    Yields a RequestProfiler (with .profile_id) when the request is
+    selected, otherwise a shared no-op context that yields None.
+    """
+    if not header_value and PROFILE_SAMPLE_RATE <= 0:
+        return _DISABLED
+    if not should_profile(header_value):
+        return _DISABLED
+    return RequestProfiler()
+
+def find_profile(profile_id: str) -> Optional[Path]:
+    """Path of a saved profile artifact, or None (ids are validated)"""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    for suffix in ('.prof', '.json'):
+        path = PROFILE_DIR / f"profile_{profile_id}{suffix}"
+        if path.exists():
+            return path
+    return None
@@ -0,0 +1,110 @@
+"""
+Runtime Thread and CPU Affinity Configuration
+
+torch (intra-op and inter-op pools) and OpenCV each start one thread per
+core by default. With several requests or workers in flight they oversubscribe
+the CPU and throughput collapses. apply_runtime_config() sets all three pools
+and, optionally, the process's CPU affinity from the environment or explicit
+arguments. autotune_threads.py finds good values for a machine.
+
+Environment:
+    TORCH_NUM_THREADS     - torch intra-op threads (default: library default)
+    TORCH_INTEROP_THREADS - torch inter-op threads (only settable before first use)
+    OPENCV_NUM_THREADS    - cv2.setNumThreads value (0 disables OpenCV threading)
+    CPU_AFFINITY          - Cores to pin the process to, e.g. "0-3" or "0,2,4-5"
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def _int_env(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else None
+
+TORCH_NUM_THREADS = _int_env("TORCH_NUM_THREADS")
+TORCH_INTEROP_THREADS = _int_env("TORCH_INTEROP_THREADS")
+OPENCV_NUM_THREADS = _int_env("OPENCV_NUM_THREADS")
+CPU_AFFINITY = os.getenv("CPU_AFFINITY") or None
+
+def parse_cpu_list(spec: str) -> List[int]:
+    """Parse a CPU list like "0-3,6" into [0, 1, 2, 3, 6]"""
+    cores = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-')
+            cores.update(range(int(start), int(end) + 1))
+        else:
+            cores.add(int(part))
+    return sorted(cores)
+
+def available_cores() -> List[int]:
+    """Cores this process may run on (respects taskset/cgroup affinity)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def apply_runtime_config(
+    torch_threads: Optional[int] = None,
+    interop_threads: Optional[int] = None,
+    opencv_threads: Optional[int] = None,
+    cpu_affinity: Optional[str] = None
+) -> Dict:
+    """
+    Apply thread-pool sizes and CPU affinity to the current process
+
+    Arguments left as None fall back to the environment variables above;
+    settings that are unset in both are left at the library defaults.
+
+    Returns:
+        The resulting configuration (see describe_runtime)
+    """
+    import cv2
+    import torch
+
+    torch_threads = torch_threads if torch_threads is not None else TORCH_NUM_THREADS
+    interop_threads = interop_threads if interop_threads is not None else TORCH_INTEROP_THREADS
+    opencv_threads = opencv_threads if opencv_threads is not None else OPENCV_NUM_THREADS
+    cpu_affinity = cpu_affinity if cpu_affinity is not None else CPU_AFFINITY
+
+    if cpu_affinity:
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, parse_cpu_list(cpu_affinity))
+        else:
+            logger.warning("⚠ CPU affinity is not supported on this platform")
+
+    if torch_threads is not None:
+        torch.set_num_threads(torch_threads)
+
+    if interop_threads is not None and interop_threads != torch.get_num_interop_threads():
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            # Only allowed before any inter-op parallel work has run
+            logger.warning("⚠ Could not set inter-op threads: %s", e)
+
+    if opencv_threads is not None:
+        cv2.setNumThreads(opencv_threads)
+
+    runtime = describe_runtime()
+    logger.info("🧵 Runtime: torch %d intra / %d inter-op threads, OpenCV %d threads, cores %s",
+                runtime['torch_threads'], runtime['interop_threads'],
+                runtime['opencv_threads'], runtime['cpu_affinity'])
+    return runtime
+
+def describe_runtime() -> Dict:
+    """Current thread-pool sizes and CPU affinity"""
+    import cv2
+    import torch
+
+    return {
+        'torch_threads': torch.get_num_threads(),
+        'interop_threads': torch.get_num_interop_threads(),
+        'opencv_threads': cv2.getNumThreads(),
+        'cpu_affinity': available_cores()
+    }
@@ -0,0 +1,349 @@
+"""
+Segmented (Sliding-Window) Analysis for Long Videos
+
+/api/predict/ samples at most 50 frames across the whole clip, so a short
+manipulated section of a long video is rarely sampled. Segmented analysis
+cuts the video into fixed time windows and runs the pipeline on each one:
+
+    plan_segments   -> [0s-10s), [10s-20s), ...   (stride < window overlaps them)
+    extract_signals -> per window, in a process pool (bounded in flight)
+    predict_with_vit_batch -> windows that finish together share a forward pass
+    aggregate_timeline     -> max-pooled verdict + flagged time ranges
+
+Each window decodes only frames_per_segment * 3 frames, so memory depends on
+the number of windows in flight, not on the video length.
+
+Usage:
+    python segment_analysis.py long_video.mp4
+    python segment_analysis.py long_video.mp4 --window 5 --stride 2.5 --workers 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import Executor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# A window is flagged when its ViT fake probability reaches this value
+SEGMENT_FAKE_THRESHOLD = float(os.getenv("SEGMENT_FAKE_THRESHOLD", "0.5"))
+# Upper bound on windows per request (720 x 10s windows = 2 hours)
+SEGMENT_MAX_SEGMENTS = int(os.getenv("SEGMENT_MAX_SEGMENTS", "720"))
+
+def probe_video(video_path: str) -> Dict:
+    """Frame count, fps and duration (seconds) from the container header"""
+    from enhanced_processor import open_video
+
+    with open_video(video_path) as decoder:
+        info = decoder.probe()
+    total_frames = info['total_frames']
+    fps = info['fps'] or 0.0
+
+    if total_frames <= 0:
+        raise ValueError("Video has no frames")
+    # Some containers report no frame rate; treat frames as 1/30s apart
+    fps = fps if fps > 0 else 30.0
+    return {'total_frames': total_frames, 'fps': fps, 'duration': total_frames / fps}
+
+def plan_segments(
+    total_frames: int,
+    fps: float,
+    window_seconds: float,
+    stride_seconds: Optional[float] = None
+) -> List[Dict]:
+    """
+    Split a video into time windows
+
+    Args:
+        total_frames: Frames in the video
+        fps: Frame rate
+        window_seconds: Window length
+        stride_seconds: Distance between window starts (default: window_seconds, no overlap)
+
+    Returns:
+        List of {index, start_frame, end_frame, start, end} (end_frame exclusive,
+        start/end in seconds); the last window is clipped to the video end
+    """
+    stride_seconds = stride_seconds or window_seconds
+    window = max(1, int(round(window_seconds * fps)))
+    stride = max(1, int(round(stride_seconds * fps)))
+
+    segments = []
+    start = 0
+    while start < total_frames:
+        end = min(start + window, total_frames)
+        segments.append({
+            'index': len(segments),
+            'start_frame': start,
+            'end_frame': end,
+            'start': round(start / fps, 2),
+            'end': round(end / fps, 2)
+        })
+        if end == total_frames:
+            break
+        start += stride
+    return segments
+
+def segment_entry(segment: Dict, status: str, **fields) -> Dict:
+    """One timeline row"""
+    return {
+        'index': segment['index'],
+        'start': segment['start'],
+        'end': segment['end'],
+        'status': status,
+        **fields
+    }
+
+def merge_ranges(timeline: List[Dict]) -> List[Dict]:
+    """Overlapping or touching flagged windows merged into {start, end, max_fake_probability}"""
+    ranges = []
+    for entry in timeline:
+        if not entry.get('flagged'):
+            continue
+        if ranges and entry['start'] <= ranges[-1]['end']:
+            ranges[-1]['end'] = max(ranges[-1]['end'], entry['end'])
+            ranges[-1]['max_fake_probability'] = max(ranges[-1]['max_fake_probability'], entry['fake_probability'])
+        else:
+            ranges.append({'start': entry['start'], 'end': entry['end'],
+                           'max_fake_probability': entry['fake_probability']})
+    return ranges
+
+def aggregate_timeline(timeline: List[Dict], threshold: float = SEGMENT_FAKE_THRESHOLD) -> Dict:
+    """
+    Video-level verdict from per-window scores
+
+    A manipulated section only needs to show up in one window, so the verdict
+    is max-pooled: FAKE if any scored window reaches `threshold`. The mean is
+    reported alongside for context.
+    """
+    scored = [entry for entry in timeline if entry['status'] == 'scored']
+    if not scored:
+        return {
+            'output': 'UNKNOWN',
+            'confidence': 0.0,
+            'probabilities': {'real': 0.0, 'fake': 0.0},
+            'mean_fake_probability': None,
+            'flagged_ranges': []
+        }
+
+    max_fake = max(entry['fake_probability'] for entry in scored)
+    mean_fake = sum(entry['fake_probability'] for entry in scored) / len(scored)
+    is_fake = max_fake >= threshold * 100
+    return {
+        'output': 'FAKE' if is_fake else 'REAL',
+        'confidence': round(max_fake if is_fake else 100 - max_fake, 2),
+        'probabilities': {'real': round(100 - max_fake, 2), 'fake': round(max_fake, 2)},
+        'mean_fake_probability': round(mean_fake, 2),
+        'flagged_ranges': merge_ranges(timeline)
+    }
+
+def run_segmented(
+    video_path: str,
+    model,
+    executor: Optional[Executor] = None,
+    window_seconds: float = 10.0,
+    stride_seconds: Optional[float] = None,
+    frames_per_segment: int = 10,
+    batch_size: int = 8,
+    max_in_flight: int = 8,
+    max_segments: int = SEGMENT_MAX_SEGMENTS,
+    threshold: float = SEGMENT_FAKE_THRESHOLD,
+    on_segment: Optional[Callable[[Dict], None]] = None
+) -> Dict:
+    """
+    Analyze a video window by window
+
+    Args:
+        video_path: Video file
+        model: Loaded ViT model
+        executor: Pool for extract_signals (e.g. the API's decode pool);
+            None runs the windows one at a time in this thread
+        window_seconds / stride_seconds: Window length and spacing
+        frames_per_segment: Frames extracted per window
+        batch_size: Windows per ViT forward pass
+        max_in_flight: Windows submitted to the executor at once
+        max_segments: Refuse videos that need more windows than this
+        threshold: Fake probability (0-1) at which a window is flagged
+        on_segment: Called with each timeline row as it is produced
+
+    Returns:
+        Aggregated verdict (see aggregate_timeline) plus the timeline sorted by
+        start time and an analysis block with window counts
+
+    Raises:
+        ValueError: If the video can't be read or needs more than max_segments windows
+    """
+    from pipeline import extract_signals, record_signal_metrics
+    from vit_model import predict_with_vit_batch
+    from metrics import timed_stage, VIT_FRAMES
+
+    probe = probe_video(video_path)
+    segments = plan_segments(probe['total_frames'], probe['fps'], window_seconds, stride_seconds)
+    if len(segments) > max_segments:
+        raise ValueError(f"Video needs {len(segments)} windows (limit {max_segments}); "
+                         f"use a longer window or stride")
+
+    timeline = []
+
+    def emit(entry: Dict):
+        timeline.append(entry)
+        if on_segment is not None:
+            on_segment(entry)
+
+    def score(ready: List):
+        """Batched ViT over windows whose signals are ready"""
+        with timed_stage('vit_batch'):
+            vit_results = predict_with_vit_batch(model, [signals['face_crops'] for _, signals in ready],
+                                                 batch_size=batch_size)
+        for (segment, signals), vit_result in zip(ready, vit_results):
+            VIT_FRAMES.inc(vit_result['frames_used'])
+            fake_probability = round(vit_result['probabilities']['fake'] * 100, 2)
+            emit(segment_entry(
+                segment, 'scored',
+                output='FAKE' if vit_result['prediction'] == 1 else 'REAL',
+                fake_probability=fake_probability,
+                flagged=fake_probability >= threshold * 100,
+                faces_detected=len(signals['face_crops']),
+                temporal_consistency=round(signals['consistency']['consistency_score'] * 100, 2),
+                fallback_used=bool(signals['detection_stats'].get('fallback_used'))
+            ))
+
+    def collect(segment: Dict, get_signals: Callable[[], Dict], ready: List):
+        try:
+            signals = get_signals()
+        except ValueError as e:
+            # No usable frames or faces in this window: a gap in the timeline, not a failure
+            emit(segment_entry(segment, 'no_faces', detail=str(e)))
+            return
+        except Exception as e:
+            logger.warning("⚠ Window %d failed: %s", segment['index'], e)
+            emit(segment_entry(segment, 'error', detail=str(e)))
+            return
+        record_signal_metrics(signals)
+        ready.append((segment, signals))
+
+    def extract(segment: Dict):
+        return extract_signals(video_path, frames_per_segment,
+                               start_frame=segment['start_frame'], end_frame=segment['end_frame'])
+
+    if executor is None:
+        for segment in segments:
+            ready = []
+            collect(segment, lambda: extract(segment), ready)
+            if ready:
+                score(ready)
+    else:
+        queue = iter(segments)
+        in_flight = {}
+        ready = []
+        try:
+            while True:
+                while len(in_flight) < max_in_flight:
+                    segment = next(queue, None)
+                    if segment is None:
+                        break
+                    future = executor.submit(extract_signals, video_path, frames_per_segment,
+                                             segment['start_frame'], segment['end_frame'])
+                    in_flight[future] = segment
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(in_flight.pop(future), future.result, ready)
+                # Score what is ready once a batch fills or the pool runs dry
+                if len(ready) >= batch_size or (ready and not in_flight):
+                    score(ready)
+                    ready = []
+            if ready:
+                score(ready)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    timeline.sort(key=lambda entry: entry['index'])
+    result = aggregate_timeline(timeline, threshold)
+    result['timeline'] = timeline
+    result['analysis'] = {
+        'duration': round(probe['duration'], 2),
+        'fps': round(probe['fps'], 2),
+        'window_seconds': window_seconds,
+        'stride_seconds': stride_seconds or window_seconds,
+        'frames_per_segment': frames_per_segment,
+        'segments': len(segments),
+        'segments_scored': sum(1 for entry in timeline if entry['status'] == 'scored'),
+        'segments_without_faces': sum(1 for entry in timeline if entry['status'] == 'no_faces'),
+        'segments_failed': sum(1 for entry in timeline if entry['status'] == 'error'),
+        'segments_flagged': sum(1 for entry in timeline if entry.get('flagged'))
+    }
+    return result
+
+def main(args):
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor
+    from pipeline import init_decode_worker
+    from vit_model import load_vit_model
+
+    model = load_vit_model(args.model_path)
+    model.eval()
+
+    def show(entry: Dict):
+        if entry['status'] == 'scored':
+            marker = '⚠️ ' if entry['flagged'] else '  '
+            print(f"{marker} {entry['start']:8.1f}s - {entry['end']:8.1f}s  "
+                  f"{entry['output']:4s} fake {entry['fake_probability']:6.2f}%")
+        else:
+            print(f"   {entry['start']:8.1f}s - {entry['end']:8.1f}s  {entry['status']}")
+
+    start_time = time.time()
+    kwargs = dict(window_seconds=args.window, stride_seconds=args.stride,
+                  frames_per_segment=args.frames_per_segment, batch_size=args.batch_size,
+                  max_segments=args.max_segments, on_segment=show)
+    if args.workers > 0:
+        # spawn: forking a process that has torch's thread pools running is unsafe
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=mp.get_context('spawn'),
+                                 initializer=init_decode_worker) as pool:
+            result = run_segmented(args.video, model, pool, max_in_flight=2 * args.workers, **kwargs)
+    else:
+        result = run_segmented(args.video, model, **kwargs)
+
+    print(f"\n{'='*60}")
+    print(f"Verdict: {result['output']} ({result['confidence']}%), "
+          f"{result['analysis']['segments_flagged']}/{result['analysis']['segments']} window(s) flagged "
+          f"in {time.time() - start_time:.1f}s")
+    for flagged in result['flagged_ranges']:
+        print(f"   {flagged['start']:.1f}s - {flagged['end']:.1f}s (max fake {flagged['max_fake_probability']}%)")
+    print(f"{'='*60}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"✓ Timeline written to {args.output}")
+
+if __name__ == '__main__':
+    from runtime_config import available_cores
+
+    parser = argparse.ArgumentParser(description='Score a long video window by window')
+    parser.add_argument('video', type=str,
+                        help='Video file')
+    parser.add_argument('--window', type=float, default=10.0,
+                        help='Window length in seconds')
+    parser.add_argument('--stride', type=float, default=None,
+                        help='Seconds between window starts (default: window, no overlap)')
+    parser.add_argument('--frames_per_segment', type=int, default=10,
+                        help='Frames extracted per window')
+    parser.add_argument('--batch_size', type=int, default=8,
+                        help='Windows per ViT forward pass')
+    parser.add_argument('--workers', type=int, default=max(1, len(available_cores()) - 1),
+                        help='Decode processes (0 runs windows sequentially in-process)')
+    parser.add_argument('--max_segments', type=int, default=SEGMENT_MAX_SEGMENTS,
+                        help='Refuse videos needing more windows than this')
+    parser.add_argument('--model_path', type=str, default=None,
+                        help='Weights to load (random init if omitted)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write the JSON result to this path')
+
+    main(parser.parse_args())
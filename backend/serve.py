@@ -0,0 +1,196 @@
+"""
+Pre-fork Multi-Worker Server
+
+`uvicorn --workers N` starts N independent interpreters, and each one loads
+its own copy of the ViT weights. This launcher loads the model once in the
+parent, binds the listening socket, then forks N workers that serve
+main:app on that socket. The workers share the weight pages with the
+parent copy-on-write, and inference never writes to them, so the weights
+stay in RAM once however many workers run.
+
+Each worker's torch intra-op thread count is pinned after the fork
+(default: cores / workers; the parent loads with one thread), so N workers don't oversubscribe the CPU; with --pin_cores each
+worker is also bound to its own slice of cores. Dead workers are
+restarted; SIGTERM/SIGINT shut all of them down gracefully.
+
+Usage:
+    python serve.py --workers 4
+    python serve.py --workers 2 --threads_per_worker 2 --port 8000
+    python serve.py --workers 4 --pin_cores
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+from runtime_config import apply_runtime_config, available_cores, TORCH_NUM_THREADS
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s")
+logger = logging.getLogger("serve")
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """RSS, PSS (shared pages split between sharers) and private memory of a process"""
+    usage = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                if key in ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty'):
+                    usage[key] = int(rest.split()[0]) / 1024
+    except OSError:
+        return {}
+    return {
+        'rss': round(usage.get('Rss', 0), 1),
+        'pss': round(usage.get('Pss', 0), 1),
+        'private': round(usage.get('Private_Clean', 0) + usage.get('Private_Dirty', 0), 1)
+    }
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    """Listening socket shared by all workers"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+def worker_cores(index: int, args) -> Optional[str]:
+    """CPU list for worker `index` with --pin_cores (a contiguous slice), else None"""
+    if not args.pin_cores:
+        return None
+    cores = available_cores()
+    start = (index * args.threads_per_worker) % len(cores)
+    chosen = [cores[(start + i) % len(cores)] for i in range(args.threads_per_worker)]
+    return ','.join(str(c) for c in chosen)
+
+def run_worker(sock: socket.socket, index: int, args):
+    """Worker body: pin threads (and cores), then serve main:app on the inherited socket"""
+    import uvicorn
+    import main as api
+
+    apply_runtime_config(torch_threads=args.threads_per_worker, cpu_affinity=worker_cores(index, args))
+    config = uvicorn.Config(api.app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+def spawn_worker(sock: socket.socket, index: int, args) -> int:
+    """Fork one worker and return its pid"""
+    pid = os.fork()
+    if pid == 0:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        exit_code = 0
+        try:
+            run_worker(sock, index, args)
+        except Exception:
+            logger.exception("Worker %d crashed", os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code)
+    return pid
+
+def preload(args):
+    """Load the ML stack once in the parent, before any fork"""
+    import main as api
+
+    # The parent stays single-threaded: an OpenMP pool started before fork()
+    # is unusable in the children, and a worker running with 2+ intra-op
+    # threads then deadlocks on its first forward. run_worker applies
+    # threads_per_worker after the fork.
+    apply_runtime_config(torch_threads=1)
+
+    if api.FORCE_MOCK:
+        logger.info("FORCE_MOCK set - not loading the model")
+        return api
+
+    api.load_ml_stack(torch_threads=1)
+    if api.MODEL_STATUS != "ready":
+        logger.warning("⚠ Model not loaded (status: %s); workers will load or mock on their own", api.MODEL_STATUS)
+        api.MODEL_STATUS = "loading"
+    return api
+
+def main(args):
+    if args.threads_per_worker is None:
+        args.threads_per_worker = TORCH_NUM_THREADS or max(1, len(available_cores()) // args.workers)
+
+    logger.info("🚀 Preloading model in parent %d...", os.getpid())
+    preload(args)
+    parent_memory = memory_mb(os.getpid())
+    logger.info("✓ Parent ready (RSS %.0f MB)", parent_memory.get('rss', 0))
+
+    # Objects allocated so far are never collected; moving them out of the
+    # GC's reach stops collections in the workers from touching (and so
+    # copying) the pages they live on
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    workers = {spawn_worker(sock, i, args): i for i in range(args.workers)}
+    logger.info("✓ %d workers on http://%s:%d, %d torch thread(s) each",
+                args.workers, args.host, args.port, args.threads_per_worker)
+
+    stopping = False
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    reported = False
+    started = time.time()
+    while workers:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if not reported and time.time() - started > args.memory_report_after:
+                for worker_pid in workers:
+                    usage = memory_mb(worker_pid)
+                    logger.info("   worker %d: RSS %.0f MB, PSS %.0f MB, private %.0f MB",
+                                worker_pid, usage.get('rss', 0), usage.get('pss', 0), usage.get('private', 0))
+                reported = True
+            time.sleep(0.5)
+            continue
+
+        index = workers.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning("⚠ Worker %d exited (status %d), restarting", pid, os.waitstatus_to_exitcode(status))
+        time.sleep(1)
+        workers[spawn_worker(sock, index, args)] = index
+
+    sock.close()
+    logger.info("✓ All workers stopped")
+
+if __name__ == "__main__":
+    if not hasattr(os, 'fork'):
+        sys.exit("serve.py needs os.fork (Linux/macOS); use uvicorn --workers instead")
+
+    parser = argparse.ArgumentParser(description='Serve main:app from pre-forked workers sharing one model copy')
+    parser.add_argument('--host', type=str, default='0.0.0.0',
+                        help='Bind address')
+    parser.add_argument('--port', type=int, default=int(os.getenv("PORT", 8000)),
+                        help='Bind port (default: $PORT or 8000)')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='Number of worker processes')
+    parser.add_argument('--threads_per_worker', type=int, default=None,
+                        help='torch intra-op threads per worker (default: cores / workers)')
+    parser.add_argument('--pin_cores', action='store_true',
+                        help='Bind each worker to its own threads_per_worker cores')
+    parser.add_argument('--keep_alive', type=int, default=5,
+                        help='HTTP keep-alive timeout in seconds')
+    parser.add_argument('--log_level', type=str, default='warning',
+                        help='uvicorn log level in the workers')
+    parser.add_argument('--memory_report_after', type=float, default=10.0,
+                        help='Seconds after startup to log per-worker RSS/PSS')
+
+    main(parser.parse_args())
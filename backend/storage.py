@@ -0,0 +1,340 @@
+"""
+Bounded Temp Storage for Uploads
+
+Every endpoint copies the uploaded video to a temp file because OpenCV and
+the decode pool read by path. StorageManager owns those files:
+
+    path = storage.save_upload(upload.file, '.mp4')   # tmpfs or disk, quota-checked
+    ...
+    storage.release(path)                             # in the finally block
+
+Uploads start in tmpfs (RAM, no disk I/O) and spill to the disk directory
+once they grow past STORAGE_TMPFS_MAX_FILE. Each location has a byte quota,
+and uploads are refused (StorageFull) when a quota is reached or the disk
+would drop below STORAGE_MIN_FREE_BYTES, so a node never fills up under
+sustained load.
+
+A janitor task sweeps every STORAGE_SWEEP_INTERVAL seconds. It retries
+releases that failed, removes untracked files older than STORAGE_MAX_AGE
+(left by crashed requests, or by other serve.py workers that died), and
+refreshes the deepfake_storage_* gauges. Quotas are per process; the
+free-space floor protects the whole filesystem.
+
+Environment:
+    STORAGE_TMPFS_DIR      - tmpfs directory (default: /dev/shm/deepfake_uploads if /dev/shm exists; empty disables)
+    STORAGE_TMPFS_MAX_FILE - Uploads larger than this spill to disk (default: 64 MB)
+    STORAGE_TMPFS_QUOTA    - Bytes allowed in tmpfs (default: 256 MB, at most half the tmpfs size)
+    STORAGE_DISK_QUOTA     - Bytes allowed in the disk directory (default: 8 GB)
+    STORAGE_MIN_FREE_BYTES - Free disk space to keep (default: 1 GB)
+    STORAGE_MAX_AGE        - Age after which untracked temp files are swept (default: 3600 s)
+    STORAGE_SWEEP_INTERVAL - Seconds between janitor sweeps (default: 60)
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from metrics import (
+    STORAGE_BYTES,
+    STORAGE_FILES,
+    STORAGE_FREE_BYTES,
+    STORAGE_SPILLS,
+    STORAGE_SWEPT,
+    STORAGE_REJECTIONS
+)
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+STORAGE_TMPFS_DIR = os.getenv(
+    "STORAGE_TMPFS_DIR", "/dev/shm/deepfake_uploads" if os.path.isdir("/dev/shm") else ""
+)
+STORAGE_TMPFS_MAX_FILE = int(os.getenv("STORAGE_TMPFS_MAX_FILE", str(64 * MB)))
+STORAGE_TMPFS_QUOTA = int(os.getenv("STORAGE_TMPFS_QUOTA", str(256 * MB)))
+STORAGE_DISK_QUOTA = int(os.getenv("STORAGE_DISK_QUOTA", str(8 * 1024 * MB)))
+STORAGE_MIN_FREE_BYTES = int(os.getenv("STORAGE_MIN_FREE_BYTES", str(1024 * MB)))
+STORAGE_MAX_AGE = float(os.getenv("STORAGE_MAX_AGE", "3600"))
+STORAGE_SWEEP_INTERVAL = float(os.getenv("STORAGE_SWEEP_INTERVAL", "60"))
+
+_CHUNK = MB
+
+class StorageFull(Exception):
+    """A quota or the free-space floor does not leave room for the upload"""
+
+class StorageManager:
+    """
+    Tracks temp files in a disk directory and an optional tmpfs directory
+
+    Args:
+        disk_dir: Directory on disk for uploads (and tmpfs spill-over)
+        tmpfs_dir: RAM-backed directory; None or unusable disables it
+        sweep_dirs: Extra directories whose files older than max_age are
+            swept (e.g. processed_media/ for saved profiles)
+        tmpfs_max_file, tmpfs_quota, disk_quota, min_free_bytes, max_age:
+            See the module docstring
+    """
+
+    def __init__(
+        self,
+        disk_dir: Path,
+        tmpfs_dir: Optional[str] = STORAGE_TMPFS_DIR,
+        sweep_dirs: List[Path] = (),
+        tmpfs_max_file: int = STORAGE_TMPFS_MAX_FILE,
+        tmpfs_quota: int = STORAGE_TMPFS_QUOTA,
+        disk_quota: int = STORAGE_DISK_QUOTA,
+        min_free_bytes: int = STORAGE_MIN_FREE_BYTES,
+        max_age: float = STORAGE_MAX_AGE
+    ):
+        self.dirs = {'disk': Path(disk_dir)}
+        self.dirs['disk'].mkdir(parents=True, exist_ok=True)
+        self.quotas = {'disk': disk_quota, 'tmpfs': 0}
+        if tmpfs_dir:
+            try:
+                Path(tmpfs_dir).mkdir(parents=True, exist_ok=True)
+                # Docker's default /dev/shm is 64 MB; never take more than half
+                self.quotas['tmpfs'] = min(tmpfs_quota, shutil.disk_usage(tmpfs_dir).total // 2)
+                self.dirs['tmpfs'] = Path(tmpfs_dir)
+            except OSError as e:
+                logger.warning("⚠ tmpfs directory %s unusable (%s); uploads go to disk", tmpfs_dir, e)
+        self.sweep_dirs = [Path(d) for d in sweep_dirs]
+        self.tmpfs_max_file = tmpfs_max_file
+        self.min_free_bytes = min_free_bytes
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._files: Dict[str, tuple] = {}  # path -> (location, bytes)
+        self._reserved = {'disk': 0, 'tmpfs': 0}  # bytes of uploads still being written
+        self._orphans: List[str] = []  # released paths whose unlink failed
+        self._janitor: Optional[asyncio.Task] = None
+        self.refresh_metrics()
+
+    def usage(self, location: str) -> int:
+        """Tracked plus in-flight bytes in a location"""
+        with self._lock:
+            tracked = sum(size for loc, size in self._files.values() if loc == location)
+            return tracked + self._reserved[location]
+
+    def _reserve(self, location: str, nbytes: int, record: bool = True):
+        """Claim nbytes in a location or raise StorageFull (counted in STORAGE_REJECTIONS if record)"""
+        with self._lock:
+            used = sum(size for loc, size in self._files.values() if loc == location) + self._reserved[location]
+            if used + nbytes > self.quotas[location]:
+                if record:
+                    STORAGE_REJECTIONS.inc(reason=f"{location}_quota")
+                raise StorageFull(f"{location} temp storage quota reached")
+            if location == 'disk' and shutil.disk_usage(self.dirs['disk']).free - nbytes < self.min_free_bytes:
+                STORAGE_REJECTIONS.inc(reason="disk_free")
+                raise StorageFull("Disk free space below the floor")
+            self._reserved[location] += nbytes
+
+    def _unreserve(self, location: str, nbytes: int):
+        with self._lock:
+            self._reserved[location] -= nbytes
+
+    def _use_tmpfs(self) -> bool:
+        """tmpfs has room to start a file (it spills to disk if it runs out)"""
+        return 'tmpfs' in self.dirs and self.usage('tmpfs') + _CHUNK <= self.quotas['tmpfs']
+
+    def save_upload(self, source: BinaryIO, suffix: str = '') -> str:
+        """
+        Copy an upload to a tracked temp file
+
+        Written to tmpfs while it stays under tmpfs_max_file (and the tmpfs
+        quota has room), moved to disk and continued there otherwise. Space
+        is reserved chunk by chunk, so an upload fails as soon as it crosses
+        the disk quota or the free-space floor.
+
+        Returns:
+            Path of the temp file; pass it to release() when done
+
+        Raises:
+            StorageFull: A quota or the free-space floor was hit (nothing is left behind)
+        """
+        location = 'tmpfs' if self._use_tmpfs() else 'disk'
+        reserved = 0
+        handle, path = tempfile.mkstemp(suffix=suffix, dir=self.dirs[location])
+        target = os.fdopen(handle, 'wb')
+        try:
+            while True:
+                chunk = source.read(_CHUNK)
+                if not chunk:
+                    break
+                if location == 'tmpfs':
+                    try:
+                        if reserved + len(chunk) > self.tmpfs_max_file:
+                            raise StorageFull("Upload too large for tmpfs")
+                        self._reserve('tmpfs', len(chunk), record=False)
+                    except StorageFull:
+                        # Move what was written so far to disk and continue there
+                        self._reserve('disk', reserved)
+                        self._unreserve('tmpfs', reserved)
+                        location = 'disk'
+                        target, path = self._spill(target, path, reserved)
+                if location == 'disk':
+                    self._reserve('disk', len(chunk))
+                reserved += len(chunk)
+                target.write(chunk)
+            target.close()
+        except BaseException:
+            target.close()
+            self._unreserve(location, reserved)
+            Path(path).unlink(missing_ok=True)
+            raise
+
+        with self._lock:
+            self._reserved[location] -= reserved
+            self._files[path] = (location, reserved)
+        self.refresh_metrics()
+        return path
+
+    def _spill(self, target: BinaryIO, path: str, size: int):
+        """Move a partly written tmpfs file to disk; returns (open handle, new path)"""
+        target.close()
+        handle, disk_path = tempfile.mkstemp(suffix=Path(path).suffix, dir=self.dirs['disk'])
+        disk_target = os.fdopen(handle, 'wb')
+        try:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, disk_target, _CHUNK)
+        except BaseException:
+            disk_target.close()
+            Path(disk_path).unlink(missing_ok=True)
+            raise
+        finally:
+            Path(path).unlink(missing_ok=True)
+        STORAGE_SPILLS.inc()
+        logger.info("💾 Upload over %d MB spilled from tmpfs to disk", size // MB)
+        return disk_target, disk_path
+
+    def track(self, path: str, location: str = 'disk'):
+        """Track a temp file created elsewhere (e.g. a ChunkDecoder's file in dirs['disk'])"""
+        with self._lock:
+            self._files[path] = (location, 0)
+        self.refresh_metrics()
+
+    def grow(self, path: str, nbytes: int):
+        """
+        Account for nbytes about to be appended to a tracked file
+
+        For files written incrementally (a ChunkDecoder's stream upload):
+        the bytes are checked against the quota and free-space floor like an
+        upload chunk and then count towards the file until release().
+
+        Raises:
+            StorageFull: The bytes don't fit (nothing is accounted)
+        """
+        with self._lock:
+            location = self._files.get(path, ('disk', 0))[0]
+        self._reserve(location, nbytes)
+        with self._lock:
+            self._reserved[location] -= nbytes
+            if path in self._files:
+                self._files[path] = (location, self._files[path][1] + nbytes)
+
+    def check_space(self, location: str = 'disk', nbytes: int = 0):
+        """Raise StorageFull unless nbytes would fit (quota and free-space floor)"""
+        self._reserve(location, nbytes)
+        self._unreserve(location, nbytes)
+
+    def release(self, path: Optional[str]):
+        """Delete a tracked temp file; if that fails the janitor retries"""
+        if not path:
+            return
+        with self._lock:
+            self._files.pop(path, None)
+        try:
+            Path(path).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning("⚠ Could not delete %s (%s); the janitor will retry", path, e)
+            with self._lock:
+                self._orphans.append(path)
+        self.refresh_metrics()
+
+    def sweep(self) -> int:
+        """
+        Retry failed releases, delete untracked files older than max_age,
+        and refresh sizes and gauges
+
+        Returns:
+            Number of files removed
+        """
+        removed = 0
+        with self._lock:
+            orphans, self._orphans = self._orphans, []
+        for path in orphans:
+            try:
+                Path(path).unlink(missing_ok=True)
+                removed += 1
+            except OSError:
+                with self._lock:
+                    self._orphans.append(path)
+
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            tracked = set(self._files)
+        directories = [(location, directory) for location, directory in self.dirs.items()]
+        directories += [('disk', directory) for directory in self.sweep_dirs]
+        for location, directory in directories:
+            if not directory.is_dir():
+                continue
+            for entry in directory.iterdir():
+                try:
+                    if entry.is_file() and str(entry) not in tracked and entry.stat().st_mtime < cutoff:
+                        entry.unlink()
+                        STORAGE_SWEPT.inc(location=location)
+                        removed += 1
+                except OSError as e:
+                    logger.warning("Cleanup error: %s", e)
+
+        # Re-measure tracked files; never below what grow() has accounted,
+        # since a stream's last chunks may still sit in its write buffer
+        with self._lock:
+            for path, (location, size) in list(self._files.items()):
+                try:
+                    self._files[path] = (location, max(size, os.path.getsize(path)))
+                except OSError:
+                    pass
+        self.refresh_metrics()
+        if removed:
+            logger.info("🧹 Storage janitor removed %d file(s)", removed)
+        return removed
+
+    def refresh_metrics(self):
+        with self._lock:
+            for location in ('disk', 'tmpfs'):
+                files = [size for loc, size in self._files.values() if loc == location]
+                STORAGE_BYTES.set(sum(files) + self._reserved[location], location=location)
+                STORAGE_FILES.set(len(files), location=location)
+        for location, directory in self.dirs.items():
+            try:
+                STORAGE_FREE_BYTES.set(shutil.disk_usage(directory).free, location=location)
+            except OSError:
+                pass
+
+    async def _run_janitor(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.warning("Storage janitor error: %s", e)
+
+    def start_janitor(self, interval: float = STORAGE_SWEEP_INTERVAL):
+        """Start the periodic sweep on the running event loop"""
+        if self._janitor is None:
+            self._janitor = asyncio.create_task(self._run_janitor(interval))
+
+    async def stop_janitor(self):
+        if self._janitor is not None:
+            self._janitor.cancel()
+            try:
+                await self._janitor
+            except asyncio.CancelledError:
+                pass
+            self._janitor = None
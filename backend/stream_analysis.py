@@ -0,0 +1,327 @@
+"""
+Incremental Analysis for Live Streams and Chunked Uploads
+
+The /api/predict/ pipeline needs the whole file before it starts. The
+classes here process a video as it arrives (used by the /ws/stream
+WebSocket endpoint):
+
+    ChunkDecoder      - appends container bytes to a temp file and yields the
+                        frames that have become decodable since the last poll
+    StreamingAnalyzer - per frame: quality gate -> face tracking -> face crop
+                        into a sliding window; every update_every new faces
+                        the window is re-scored and an update is returned.
+                        Scoring keeps the window's ViT features in a
+                        StreamState, so only the new faces are encoded
+
+Face tracking searches around the previous face box first and only falls
+back to a full-frame multi-scale detection when the face is lost, so most
+frames run the cascades on a small region.
+
+Fragmented MP4, WebM/MKV and MPEG-TS decode while they arrive. A regular
+MP4 with its index (moov atom) at the end can only be decoded once the
+upload completes; it is analyzed then, with the same bounded memory.
+"""
+
+import logging
+import os
+import tempfile
+from collections import deque
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from enhanced_processor import (
+    assess_frame_quality,
+    detect_faces_multi_scale,
+    crop_face,
+    analyze_temporal_consistency,
+    detect_compression_artifacts
+)
+from metrics import timed_stage, FRAMES_DECODED, CASCADE_CALLS, VIT_FRAMES
+
+logger = logging.getLogger(__name__)
+
+# Face crops kept in the scoring window (matches predict_with_vit's 20-frame cap)
+STREAM_WINDOW = int(os.getenv("STREAM_WINDOW", "20"))
+# New faces between two pushed updates
+STREAM_UPDATE_EVERY = int(os.getenv("STREAM_UPDATE_EVERY", "4"))
+# Upload size limit for chunked streams
+STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(512 * 1024 * 1024)))
+# The final verdict is FAKE if any scored window reaches this fake probability
+STREAM_FAKE_THRESHOLD = float(os.getenv("STREAM_FAKE_THRESHOLD", "0.5"))
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode one JPEG/PNG/WebP frame to RGB"""
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if frame is None:
+        raise ValueError("Could not decode image frame")
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+class ChunkDecoder:
+    """
+    Decodes a container file that is still being written
+
+    Chunks are appended to a temp file. Once poll_bytes of new data have
+    arrived, the file is reopened, the decoder seeks past the frames
+    already returned, and the newly decodable frames are yielded. The
+    last frame of a non-final poll is held back, because its packet may
+    be cut off at the end of the data received so far.
+
+    reserve(path, nbytes), if given, is called before each chunk is written
+    (e.g. StorageManager.grow) and may raise to refuse it.
+    """
+
+    def __init__(self, suffix: str = '.mp4', directory: Optional[str] = None,
+                 poll_bytes: int = 256 * 1024, max_bytes: int = STREAM_MAX_BYTES,
+                 reserve: Optional[Callable[[str, int], None]] = None):
+        handle, self.path = tempfile.mkstemp(suffix=suffix, dir=directory)
+        self.file = os.fdopen(handle, 'wb')
+        self.poll_bytes = poll_bytes
+        self.max_bytes = max_bytes
+        self.reserve = reserve
+        self.bytes_received = 0
+        self.bytes_at_last_poll = 0
+        self.frames_read = 0
+
+    def write(self, data: bytes) -> Iterator[np.ndarray]:
+        """Append a chunk; yields frames if enough new data arrived to poll"""
+        self.bytes_received += len(data)
+        if self.bytes_received > self.max_bytes:
+            raise ValueError(f"Stream exceeds {self.max_bytes} bytes")
+        if self.reserve is not None:
+            self.reserve(self.path, len(data))
+        self.file.write(data)
+        if self.bytes_received - self.bytes_at_last_poll < self.poll_bytes:
+            return iter(())
+        return self.poll(final=False)
+
+    def finish(self) -> Iterator[np.ndarray]:
+        """All remaining frames once the upload is complete"""
+        return self.poll(final=True)
+
+    def poll(self, final: bool) -> Iterator[np.ndarray]:
+        self.file.flush()
+        self.bytes_at_last_poll = self.bytes_received
+
+        cap = cv2.VideoCapture(self.path)
+        if not cap.isOpened():
+            # Not decodable yet (e.g. MP4 index at the end of the file)
+            return
+        try:
+            if self.frames_read:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, self.frames_read)
+            held = None
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                if held is not None:
+                    self.frames_read += 1
+                    yield held
+                held = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if held is not None and final:
+                self.frames_read += 1
+                yield held
+        finally:
+            cap.release()
+
+    def close(self):
+        self.file.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+class StreamingAnalyzer:
+    """
+    Frame-by-frame deepfake analysis with periodic running verdicts
+
+    Args:
+        model: Loaded ViT model
+        window: Face crops kept for scoring (oldest dropped first)
+        update_every: New faces between two updates
+        frame_stride: Analyze every Nth frame received
+        quality_threshold: Minimum assess_frame_quality score
+        precision: "fp32" or "bf16" (defaults to VIT_PRECISION env var)
+    """
+
+    def __init__(
+        self,
+        model,
+        window: int = STREAM_WINDOW,
+        update_every: int = STREAM_UPDATE_EVERY,
+        frame_stride: int = 1,
+        quality_threshold: float = 10.0,
+        precision: Optional[str] = None
+    ):
+        self.model = model
+        self.update_every = update_every
+        self.frame_stride = max(1, frame_stride)
+        self.quality_threshold = quality_threshold
+        self.precision = precision
+
+        self.faces = deque(maxlen=window)
+        self.last_box: Optional[Tuple[int, int, int, int]] = None
+        self.pending_faces = 0
+        # Per-frame ViT features of the window; each update encodes only the new faces
+        self.vit_state = model.init_stream_state(window)
+        self.last_result: Optional[Dict] = None
+        self.max_fake = 0.0
+        self.stats = {
+            'frames_received': 0,
+            'frames_analyzed': 0,
+            'low_quality': 0,
+            'no_face': 0,
+            'faces_total': 0,
+            'tracked': 0,
+            'full_detections': 0,
+            'cascade_calls': 0,
+            'updates': 0
+        }
+
+    def find_face(self, frame: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+        """Largest face box, searched near the previous one first"""
+        stats = {}
+        box = None
+
+        if self.last_box is not None:
+            x, y, w, h = self.last_box
+            # Previous box grown by its own size on every side
+            x0, y0 = max(0, x - w), max(0, y - h)
+            x1, y1 = min(frame.shape[1], x + 2 * w), min(frame.shape[0], y + 2 * h)
+            faces = detect_faces_multi_scale(frame[y0:y1, x0:x1], stats=stats)
+            if len(faces) > 0:
+                fx, fy, fw, fh = max(faces, key=lambda rect: rect[2] * rect[3])
+                box = (fx + x0, fy + y0, fw, fh)
+                self.stats['tracked'] += 1
+
+        if box is None:
+            faces = detect_faces_multi_scale(frame, stats=stats)
+            self.stats['full_detections'] += 1
+            if len(faces) > 0:
+                box = tuple(max(faces, key=lambda rect: rect[2] * rect[3]))
+
+        self.stats['cascade_calls'] += stats.get('cascade_calls', 0)
+        CASCADE_CALLS.inc(stats.get('cascade_calls', 0))
+        self.last_box = box
+        return box
+
+    def add_frame(self, frame: np.ndarray) -> Optional[Dict]:
+        """
+        Feed one RGB frame
+
+        Returns:
+            An update dict when update_every new faces have accumulated, else None
+        """
+        self.stats['frames_received'] += 1
+        FRAMES_DECODED.inc()
+        if (self.stats['frames_received'] - 1) % self.frame_stride:
+            return None
+        self.stats['frames_analyzed'] += 1
+
+        if assess_frame_quality(frame) < self.quality_threshold:
+            self.stats['low_quality'] += 1
+            return None
+
+        with timed_stage('face_detection'):
+            box = self.find_face(frame)
+        if box is None:
+            self.stats['no_face'] += 1
+            return None
+
+        crop, _ = crop_face(frame, box)
+        self.faces.append(cv2.resize(crop, (224, 224)))
+        self.stats['faces_total'] += 1
+        self.pending_faces += 1
+
+        if self.pending_faces >= self.update_every:
+            return self.update()
+        return None
+
+    def feed_next(self, frames: Iterator[np.ndarray]) -> Tuple[bool, Optional[Dict]]:
+        """
+        Pull one frame from `frames` and feed it
+
+        Lets the caller step through a decoder one frame at a time (e.g. one
+        worker-thread hop per frame) and push each update as it appears.
+
+        Returns:
+            (False, None) once `frames` is exhausted, else (True, update or None)
+        """
+        frame = next(frames, None)
+        if frame is None:
+            return False, None
+        return True, self.add_frame(frame)
+
+    def score_window(self) -> Dict:
+        """ViT prediction for the faces currently in the window (encodes only the new ones)"""
+        from vit_model import predict_with_vit_incremental
+        new_faces = list(self.faces)[-self.pending_faces:] if self.pending_faces else []
+        return predict_with_vit_incremental(self.model, self.vit_state, new_faces, precision=self.precision)
+
+    def update(self) -> Dict:
+        """Score the current window and build an update message"""
+        with timed_stage('vit'):
+            result = self.score_window()
+        self.pending_faces = 0
+        VIT_FRAMES.inc(result['frames_encoded'])
+        self.last_result = result
+        self.max_fake = max(self.max_fake, result['probabilities']['fake'])
+        self.stats['updates'] += 1
+
+        return {
+            'type': 'update',
+            'output': 'FAKE' if result['prediction'] == 1 else 'REAL',
+            'confidence': round(result['confidence'] * 100, 2),
+            'fake_probability': round(result['probabilities']['fake'] * 100, 2),
+            'max_fake_probability': round(self.max_fake * 100, 2),
+            'faces_in_window': len(self.faces),
+            'frames_received': self.stats['frames_received'],
+            'faces_total': self.stats['faces_total']
+        }
+
+    def finish(self) -> Dict:
+        """
+        Final verdict once the stream ends
+
+        Max-pooled like segmented analysis: FAKE if any scored window reached
+        STREAM_FAKE_THRESHOLD. Temporal consistency and compression artifacts
+        are computed over the last window.
+        """
+        if self.faces and (self.pending_faces or self.last_result is None):
+            self.update()
+
+        if self.last_result is None:
+            return {
+                'type': 'final',
+                'output': 'UNKNOWN',
+                'detail': 'No faces found in the stream',
+                'stats': dict(self.stats)
+            }
+
+        faces = list(self.faces)
+        consistency = analyze_temporal_consistency(faces)
+        artifacts = detect_compression_artifacts(faces[0])
+        is_fake = self.max_fake >= STREAM_FAKE_THRESHOLD
+
+        warning_flags = []
+        if consistency.get('suspicious'):
+            warning_flags.append("Temporal inconsistency detected")
+        if artifacts.get('suspicious'):
+            warning_flags.append("Compression artifacts detected")
+
+        return {
+            'type': 'final',
+            'output': 'FAKE' if is_fake else 'REAL',
+            'confidence': round((self.max_fake if is_fake else 1 - self.max_fake) * 100, 2),
+            'probabilities': {
+                'real': round((1 - self.max_fake) * 100, 2),
+                'fake': round(self.max_fake * 100, 2)
+            },
+            'last_window_fake_probability': round(self.last_result['probabilities']['fake'] * 100, 2),
+            'analysis': {
+                'temporal_consistency': round(consistency['consistency_score'] * 100, 2),
+                'compression_artifacts': round(artifacts['block_artifacts'], 2),
+                'warning_flags': warning_flags
+            },
+            'stats': dict(self.stats)
+        }
@@ -0,0 +1,181 @@
+"""
+Synthetic Test Videos for Benchmarks
+Generates deterministic face-like clips locally with cv2.VideoWriter, so
+benchmarks and load tests need no dataset or network access.
+
+Each clip has a textured background and a drawn face (skin ellipse, eyes,
+brows, nose, mouth) that drifts and blinks and is found by the Haar
+cascade. "Manipulated" clips add the kind of signals the pipeline looks
+for: a face region with 8x8 block quantization, a blend seam, and
+frame-to-frame flicker.
+"""
+
+import zlib
+from pathlib import Path
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+# Container extension per FourCC
+CODEC_EXTENSIONS = {
+    'mp4v': '.mp4',
+    'avc1': '.mp4',
+    'MJPG': '.avi',
+    'XVID': '.avi',
+    'VP80': '.webm'
+}
+
+def _draw_face(frame: np.ndarray, cx: int, cy: int, size: int, blink: bool):
+    """
+    Draw a simple frontal face centred at (cx, cy)
+
+    Shading follows the Haar frontal-face layout (dark eye band and brows,
+    brighter nose bridge, dark mouth) so the cascade actually fires.
+    """
+    w, h = size, int(size * 1.25)
+    cv2.ellipse(frame, (cx, cy), (w // 2, h // 2), 0, 0, 360, (140, 170, 215), -1)
+
+    eye_y = cy - h // 10
+    eye_dx = int(w * 0.2)
+    eye_r = max(3, size // 10)
+    for ex in (cx - eye_dx, cx + eye_dx):
+        cv2.ellipse(frame, (ex, eye_y), (int(eye_r * 1.6), eye_r if not blink else max(1, eye_r // 3)),
+                    0, 0, 360, (60, 70, 90), -1)
+        if not blink:
+            cv2.circle(frame, (ex, eye_y), max(2, eye_r // 2), (20, 20, 20), -1)
+        cv2.line(frame, (ex - int(eye_r * 1.8), eye_y - int(eye_r * 1.8)),
+                 (ex + int(eye_r * 1.8), eye_y - eye_r * 2), (30, 40, 50), max(2, eye_r // 2))
+
+    cv2.ellipse(frame, (cx, cy + h // 12), (max(2, w // 14), h // 10), 0, 0, 360, (165, 195, 235), -1)
+    cv2.ellipse(frame, (cx, cy + int(h * 0.26)), (w // 5, max(2, h // 22)), 0, 0, 360, (50, 50, 120), -1)
+
+    # Soften edges so the face has gradients rather than flat fills
+    y1, y2 = max(0, cy - h // 2 - 5), cy + h // 2 + 5
+    x1, x2 = max(0, cx - w // 2 - 5), cx + w // 2 + 5
+    frame[y1:y2, x1:x2] = cv2.GaussianBlur(frame[y1:y2, x1:x2], (0, 0), max(1, size / 60))
+
+def _manipulate(frame: np.ndarray, cx: int, cy: int, size: int, rng: np.random.Generator):
+    """Add block artifacts, a blend seam and flicker to the face region"""
+    h, w = frame.shape[:2]
+    half = int(size * 0.7)
+    x1, y1 = max(0, cx - half), max(0, cy - half)
+    x2, y2 = min(w, cx + half), min(h, cy + half)
+    region = frame[y1:y2, x1:x2]
+
+    # 8x8 block quantization (simulated re-encode of the swapped face)
+    rh, rw = (region.shape[0] // 8) * 8, (region.shape[1] // 8) * 8
+    if rh and rw:
+        blocks = region[:rh, :rw].reshape(rh // 8, 8, rw // 8, 8, 3).mean(axis=(1, 3), keepdims=True)
+        region[:rh, :rw] = np.broadcast_to(blocks, (rh // 8, 8, rw // 8, 8, 3)).reshape(rh, rw, 3)
+
+    # Per-frame brightness flicker
+    region[:] = np.clip(region.astype(np.int16) + int(rng.integers(-25, 25)), 0, 255).astype(np.uint8)
+
+    # Visible blend seam
+    cv2.rectangle(frame, (x1, y1), (x2 - 1, y2 - 1), (120, 140, 180), 1)
+
+def make_synthetic_video(
+    path: str,
+    width: int = 640,
+    height: int = 480,
+    seconds: float = 3.0,
+    fps: int = 25,
+    codec: str = 'mp4v',
+    manipulated: bool = False,
+    seed: int = 0
+) -> Dict:
+    """
+    Write one synthetic face video
+
+    Args:
+        path: Output path (extension should match the codec's container)
+        width, height: Frame size
+        seconds: Clip length
+        fps: Frame rate
+        codec: FourCC, e.g. "mp4v", "MJPG", "XVID"
+        manipulated: Add deepfake-like artifacts to the face region
+        seed: RNG seed; the same arguments always produce the same clip
+
+    Returns:
+        Dict describing the clip (path, size, frames, codec, bytes)
+    """
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Codec {codec} is not available in this OpenCV build")
+
+    # Static background of high-contrast tiles plus fine grain, sharp enough
+    # to pass the frame quality filter in extract_frames_smart
+    background = np.full((height, width, 3), 110, dtype=np.uint8)
+    for _ in range(60):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        bw, bh = int(rng.integers(width // 20, width // 5)), int(rng.integers(height // 20, height // 5))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(background, (x, y), (x + bw, y + bh), color, -1)
+    grain = rng.integers(-60, 60, background.shape)
+    background = np.clip(background.astype(np.int16) + grain, 0, 255).astype(np.uint8)
+    num_frames = max(1, int(seconds * fps))
+    face_size = max(40, min(width, height) // 3)
+
+    for i in range(num_frames):
+        frame = np.roll(background, i % 16, axis=1).copy()
+        cx = width // 2 + int(width * 0.05 * np.sin(i / fps * 2))
+        cy = height // 2 + int(height * 0.03 * np.cos(i / fps * 3))
+        _draw_face(frame, cx, cy, face_size, blink=(i % (fps * 2)) < 2)
+        if manipulated:
+            _manipulate(frame, cx, cy, face_size, rng)
+        frame = np.clip(frame.astype(np.int16) + rng.integers(-4, 4, frame.shape), 0, 255).astype(np.uint8)
+        writer.write(frame)
+
+    writer.release()
+    return {
+        'path': str(path),
+        'width': width,
+        'height': height,
+        'fps': fps,
+        'frames': num_frames,
+        'codec': codec,
+        'manipulated': manipulated,
+        'bytes': Path(path).stat().st_size
+    }
+
+def make_video_set(
+    output_dir: str,
+    resolutions=((320, 240), (640, 480), (1280, 720)),
+    lengths=(2.0, 10.0),
+    codecs=('mp4v', 'MJPG'),
+    fps: int = 25
+) -> List[Dict]:
+    """
+    Generate a grid of clips (resolution x length x codec x real/manipulated)
+
+    Existing files are reused. Codecs missing from the OpenCV build are skipped.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    videos = []
+
+    for width, height in resolutions:
+        for seconds in lengths:
+            for codec in codecs:
+                for manipulated in (False, True):
+                    name = f"{'fake' if manipulated else 'real'}_{width}x{height}_{seconds:g}s_{codec}"
+                    path = output_dir / f"{name}{CODEC_EXTENSIONS.get(codec, '.avi')}"
+                    try:
+                        if path.exists():
+                            info = {
+                                'path': str(path), 'width': width, 'height': height, 'fps': fps,
+                                'frames': int(seconds * fps), 'codec': codec,
+                                'manipulated': manipulated, 'bytes': path.stat().st_size
+                            }
+                        else:
+                            info = make_synthetic_video(path, width, height, seconds, fps, codec,
+                                                        manipulated, seed=zlib.crc32(name.encode()))
+                    except RuntimeError as e:
+                        print(f"⚠ Skipping {name}: {e}")
+                        continue
+                    info['name'] = name
+                    videos.append(info)
+
+    return videos
@@ -0,0 +1,7 @@
+"""Tests import the backend's flat modules (main, serve, enhanced_processor, ...) directly"""
+
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
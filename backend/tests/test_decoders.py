@@ -0,0 +1,129 @@
+"""
+FFmpegDecoder frame selection
+
+The planning helpers (packet index, seek, select filter) are checked
+without ffmpeg; the end-to-end tests compare FFmpegDecoder with
+OpenCVDecoder frame by frame and are skipped when ffmpeg is missing.
+
+Run with: python -m pytest tests/test_decoders.py (from backend/)
+"""
+
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from enhanced_processor import (
+    FFmpegDecoder,
+    OpenCVDecoder,
+    parse_packet_index,
+    plan_frame_read,
+    select_expression
+)
+from synthetic_videos import make_synthetic_video
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None or shutil.which('ffprobe') is None,
+                                  reason="ffmpeg/ffprobe not installed")
+
+# Mean absolute difference allowed between the two decoders' YUV -> RGB conversions
+TOLERANCE = 4.0
+
+# Decode order of an IBBP stream with one packet before the edit list's start
+PACKETS = """\
+pts_time=-0.040000|dts_time=-0.080000|flags=K_D
+pts_time=0.000000|dts_time=-0.040000|flags=K__
+pts_time=0.120000|dts_time=0.000000|flags=___
+pts_time=0.040000|dts_time=0.040000|flags=___
+pts_time=0.080000|dts_time=0.080000|flags=___
+pts_time=0.160000|dts_time=0.120000|flags=K__
+pts_time=N/A|dts_time=0.200000|flags=___
+"""
+
+def test_packet_index_is_in_presentation_order():
+    times, keyframes = parse_packet_index(PACKETS)
+    assert times == [0.0, 0.04, 0.08, 0.12, 0.16, 0.2]
+    assert keyframes == [0, 4]
+
+def test_plan_seeks_to_keyframe_before_first_frame():
+    times = [i / 25 for i in range(300)]
+    keyframes = list(range(0, 300, 50))
+    assert plan_frame_read(times, keyframes, [120, 130, 140]) == (times[100], [120, 130, 140])
+    # Nothing to skip before the first keyframe
+    assert plan_frame_read(times, keyframes, [10, 60]) == (None, [10, 60])
+    # Out-of-range indices are dropped
+    assert plan_frame_read(times, keyframes, [299, 300, 400]) == (times[250], [299])
+
+def test_plan_keyframes_only_stays_in_window():
+    times = [i / 25 for i in range(1000)]
+    keyframes = list(range(0, 1000, 30))
+    seek, targets = plan_frame_read(times, keyframes, range(400, 520, 10), keyframes_only=True)
+    assert targets == [420, 450, 480, 510]
+    assert seek == times[420]
+
+    # A window without a keyframe is read as requested
+    assert plan_frame_read(times, keyframes, [401, 410], keyframes_only=True)[1] == [401, 410]
+
+def test_select_expression_matches_only_the_target_timestamps():
+    # Variable frame rate: 30 fps, then 10 fps
+    times = [i / 30 for i in range(30)] + [1 + i / 10 for i in range(10)]
+    targets = [0, 29, 30, 35]
+    expression = select_expression(times, targets)
+    windows = [tuple(float(v) for v in term[len('between(t\\,'):-1].split('\\,'))
+               for term in expression[len("select='"):-1].split('+')]
+    for n, t in enumerate(times):
+        matches = [low <= t <= high for low, high in windows]
+        assert matches == [n == target for target in targets]
+
+def read_all(decoder, indices):
+    with decoder:
+        return dict(decoder.read_frames(indices))
+
+def assert_same_frames(path, indices, keyframes_only=False):
+    frames = read_all(FFmpegDecoder(path, keyframes_only=keyframes_only), indices)
+    reference = read_all(OpenCVDecoder(path), sorted(frames))
+    assert sorted(frames) == sorted(reference)
+
+    for idx, frame in frames.items():
+        assert frame.shape == reference[idx].shape
+        diffs = {other: np.abs(frame.astype(np.int16) - ref.astype(np.int16)).mean()
+                 for other, ref in reference.items()}
+        # Closest to OpenCV's frame with the same number, not to a neighbour
+        assert min(diffs, key=diffs.get) == idx, f"frame {idx}: {diffs}"
+        assert diffs[idx] < TOLERANCE, f"frame {idx}: {diffs[idx]:.2f}"
+    return sorted(frames)
+
+def encode(path, video_filter, *options):
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'testsrc2=size=320x240:rate=30:duration=4',
+         '-vf', video_filter, *FFmpegDecoder.passthrough_option(), *options,
+         '-c:v', 'mpeg4', '-q:v', '2', path],
+        check=True
+    )
+    return path
+
+@needs_ffmpeg
+def test_constant_frame_rate(tmp_path):
+    video = make_synthetic_video(str(tmp_path / 'clip.mp4'), 320, 240, seconds=3.0, fps=25)
+    assert assert_same_frames(video['path'], [0, 3, 10, 11, 25, 40, 60]) == [0, 3, 10, 11, 25, 40, 60]
+
+@needs_ffmpeg
+def test_variable_frame_rate(tmp_path):
+    """Frame durations change after frame 30, so index / fps is the wrong timestamp for later frames"""
+    path = encode(str(tmp_path / 'vfr.mp4'), "setpts='if(lt(N,30),N,30+(N-30)*3)/30/TB'")
+    indices = [0, 5, 20, 29, 30, 31, 40, 50, 80, 110]
+    assert assert_same_frames(path, indices) == indices
+
+@needs_ffmpeg
+def test_window_after_seek(tmp_path):
+    """A window late in the file is read after a keyframe seek, with the same frame numbers"""
+    path = encode(str(tmp_path / 'gop.mp4'), 'null', '-g', '12')
+    indices = [75, 80, 81, 90, 100]
+    assert assert_same_frames(path, indices) == indices
+
+@needs_ffmpeg
+def test_keyframes_only_window(tmp_path):
+    """Keyframes-only reads return keyframes inside the window, numbered like OpenCV's frames"""
+    path = encode(str(tmp_path / 'gop.mp4'), 'null', '-g', '12')
+    numbers = assert_same_frames(path, range(40, 80, 4), keyframes_only=True)
+    assert numbers == [48, 60, 72]
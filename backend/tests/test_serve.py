@@ -0,0 +1,70 @@
+"""
+Smoke test for serve.py: forked workers must be able to run the ViT
+
+Run with: python -m pytest tests/test_serve.py (from backend/)
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from conftest import BACKEND_DIR
+from synthetic_videos import make_synthetic_video
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason="serve.py needs os.fork")
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_forked_workers_predict(tmp_path):
+    """Two workers with 2 torch threads each answer /api/predict/ with the ViT (no fork deadlock)"""
+    video = make_synthetic_video(str(tmp_path / 'clip.mp4'), 320, 240, seconds=2.0)
+    port = free_port()
+    env = {**os.environ, 'PYTHONPATH': str(BACKEND_DIR), 'LOG_LEVEL': 'WARNING',
+           'FORCE_MOCK': '0', 'PRESCREEN_MODEL': str(tmp_path / 'none.json')}
+
+    # Run from tmp_path: no models/ there, so the workers serve a randomly initialised ViT
+    server = subprocess.Popen(
+        [sys.executable, str(BACKEND_DIR / 'serve.py'), '--workers', '2', '--threads_per_worker', '2',
+         '--host', '127.0.0.1', '--port', str(port), '--memory_report_after', '3600'],
+        cwd=tmp_path, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 180
+        while True:
+            assert server.poll() is None, "serve.py exited during startup"
+            try:
+                if httpx.get(f"{base_url}/ready", timeout=2).status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            assert time.time() < deadline, "workers not ready after 180s"
+            time.sleep(0.5)
+
+        # More requests than workers, so both workers run a forward pass
+        for _ in range(4):
+            with open(video['path'], 'rb') as f:
+                response = httpx.post(
+                    f"{base_url}/api/predict/",
+                    files={'upload_video_file': ('clip.mp4', f, 'video/mp4')},
+                    data={'num_frames': '10', 'include_previews': 'false'},
+                    headers={'Connection': 'close'},
+                    timeout=120
+                )
+            assert response.status_code == 200, response.text
+            assert response.json()['output'] in ('REAL', 'FAKE')
+            assert 'Mock' not in response.json().get('detection_method', '')
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
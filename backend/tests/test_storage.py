@@ -0,0 +1,141 @@
+"""
+StorageManager quotas, tmpfs spill-over and the free-space floor
+
+A plain directory stands in for tmpfs; sizes are in MB because uploads are
+copied and reserved in 1 MB chunks.
+
+Run with: python -m pytest tests/test_storage.py (from backend/)
+"""
+
+import io
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from storage import MB, StorageFull, StorageManager
+
+def payload(size: int) -> bytes:
+    return bytes(range(256)) * (size // 256) + bytes(size % 256)
+
+def manager(tmp_path, **kwargs) -> StorageManager:
+    options = {'tmpfs_dir': str(tmp_path / 'tmpfs'), 'tmpfs_max_file': 4 * MB, 'tmpfs_quota': 16 * MB,
+               'disk_quota': 16 * MB, 'min_free_bytes': 0}
+    return StorageManager(tmp_path / 'disk', **{**options, **kwargs})
+
+def files_in(directory: Path):
+    return sorted(p.name for p in directory.iterdir()) if directory.is_dir() else []
+
+def test_small_upload_stays_in_tmpfs(tmp_path):
+    storage = manager(tmp_path)
+    data = payload(MB + 123)
+    path = storage.save_upload(io.BytesIO(data), '.mp4')
+
+    assert Path(path).parent == tmp_path / 'tmpfs' and path.endswith('.mp4')
+    assert Path(path).read_bytes() == data
+    assert (storage.usage('tmpfs'), storage.usage('disk')) == (len(data), 0)
+
+    storage.release(path)
+    assert not os.path.exists(path)
+    assert storage.usage('tmpfs') == 0
+
+def test_large_upload_spills_to_disk(tmp_path):
+    storage = manager(tmp_path)
+    data = payload(6 * MB + 5)
+    path = storage.save_upload(io.BytesIO(data), '.mp4')
+
+    assert Path(path).parent == tmp_path / 'disk'
+    assert Path(path).read_bytes() == data
+    assert (storage.usage('tmpfs'), storage.usage('disk')) == (0, len(data))
+    assert files_in(tmp_path / 'tmpfs') == []
+    storage.release(path)
+    assert storage.usage('disk') == 0
+
+def test_full_tmpfs_starts_on_disk(tmp_path):
+    storage = manager(tmp_path, tmpfs_quota=2 * MB)
+    first = storage.save_upload(io.BytesIO(payload(MB + MB // 2)))
+    second = storage.save_upload(io.BytesIO(payload(MB + MB // 2)))
+    assert Path(first).parent == tmp_path / 'tmpfs'
+    assert Path(second).parent == tmp_path / 'disk'
+
+def test_disk_quota_rejects_and_leaves_nothing(tmp_path):
+    storage = manager(tmp_path, tmpfs_dir=None, disk_quota=3 * MB)
+    kept = storage.save_upload(io.BytesIO(payload(2 * MB)))
+
+    with pytest.raises(StorageFull):
+        storage.save_upload(io.BytesIO(payload(2 * MB)))
+    assert files_in(tmp_path / 'disk') == [Path(kept).name]
+    assert storage.usage('disk') == 2 * MB
+
+    # Released space is available again
+    storage.release(kept)
+    storage.release(storage.save_upload(io.BytesIO(payload(3 * MB))))
+    assert storage.usage('disk') == 0
+
+def test_spill_counts_against_disk_quota(tmp_path):
+    storage = manager(tmp_path, disk_quota=5 * MB)
+    with pytest.raises(StorageFull):
+        storage.save_upload(io.BytesIO(payload(6 * MB)))
+    assert files_in(tmp_path / 'disk') == [] and files_in(tmp_path / 'tmpfs') == []
+    assert (storage.usage('tmpfs'), storage.usage('disk')) == (0, 0)
+
+def test_free_space_floor(tmp_path):
+    free = shutil.disk_usage(tmp_path).free
+    storage = manager(tmp_path, tmpfs_dir=None, disk_quota=1 << 60, min_free_bytes=free + MB)
+    with pytest.raises(StorageFull, match='free space'):
+        storage.save_upload(io.BytesIO(payload(MB)))
+    with pytest.raises(StorageFull):
+        storage.check_space('disk', MB)
+    assert files_in(tmp_path / 'disk') == []
+
+def test_concurrent_uploads_never_exceed_quota(tmp_path):
+    storage = manager(tmp_path, tmpfs_dir=None, disk_quota=5 * MB)
+    saved, rejected = [], []
+
+    def upload():
+        try:
+            saved.append(storage.save_upload(io.BytesIO(payload(2 * MB))))
+        except StorageFull:
+            rejected.append(True)
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(saved) == 2 and len(rejected) == 6
+    assert storage.usage('disk') == 4 * MB
+    assert sorted(files_in(tmp_path / 'disk')) == sorted(Path(p).name for p in saved)
+
+def test_grow_reserves_stream_chunks(tmp_path):
+    storage = manager(tmp_path, disk_quota=3 * MB)
+    path = str(tmp_path / 'disk' / 'stream.webm')
+    Path(path).touch()
+    storage.track(path)
+
+    storage.grow(path, 2 * MB)
+    assert storage.usage('disk') == 2 * MB
+    with pytest.raises(StorageFull):
+        storage.grow(path, 2 * MB)
+    assert storage.usage('disk') == 2 * MB
+
+    storage.release(path)
+    assert storage.usage('disk') == 0 and not os.path.exists(path)
+
+def test_sweep_removes_only_old_untracked_files(tmp_path):
+    storage = manager(tmp_path, max_age=60)
+    tracked = storage.save_upload(io.BytesIO(payload(1000)))
+    old = tmp_path / 'tmpfs' / 'crashed.mp4'
+    new = tmp_path / 'tmpfs' / 'in_progress.mp4'
+    for path in (old, new):
+        path.write_bytes(b'x')
+    stale = time.time() - 120
+    os.utime(old, (stale, stale))
+    os.utime(tracked, (stale, stale))
+
+    assert storage.sweep() == 1
+    assert not old.exists() and new.exists() and os.path.exists(tracked)
@@ -0,0 +1,135 @@
+"""
+read_video_metadata / validate_video against OpenCV
+
+Every upload is accepted or rejected (400/413) from these header parsers,
+so their frame count, fps and size must agree with what cv2 reports for the
+same file, and damaged files must be rejected rather than crash.
+
+Run with: python -m pytest tests/test_video_metadata.py (from backend/)
+"""
+
+import struct
+
+import cv2
+import numpy as np
+import pytest
+
+from synthetic_videos import make_synthetic_video
+from video_metadata import InvalidVideo, read_video_metadata, validate_video
+
+# (FourCC, extension, expected source): MP4/MOV and WebM are parsed from the
+# header, AVI goes to the decoder probe
+CLIPS = [
+    ('mp4v', 'mp4', 'header'),
+    ('mp4v', 'mov', 'header'),
+    ('VP80', 'webm', 'header'),
+    ('VP90', 'webm', 'header'),
+    ('MJPG', 'avi', 'opencv'),
+    ('XVID', 'avi', 'opencv')
+]
+
+def cv2_info(path):
+    """(frames, fps, width, height) from cv2's properties, None if it can't open the file"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        return (int(cap.get(cv2.CAP_PROP_FRAME_COUNT)), cap.get(cv2.CAP_PROP_FPS),
+                int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    finally:
+        cap.release()
+
+def assert_matches_cv2(metadata, path):
+    frames, fps, width, height = cv2_info(path)
+    assert metadata['total_frames'] == frames
+    assert metadata['fps'] == pytest.approx(fps, rel=1e-3)
+    assert (metadata['width'], metadata['height']) == (width, height)
+    assert metadata['duration'] == pytest.approx(frames / fps, rel=1e-3)
+
+@pytest.fixture(params=CLIPS, ids=lambda clip: f"{clip[0]}.{clip[1]}")
+def clip(request, tmp_path):
+    codec, ext, source = request.param
+    path = str(tmp_path / f'clip.{ext}')
+    make_synthetic_video(path, 320, 240, seconds=1.2, fps=30, codec=codec)
+    return path, source
+
+@pytest.mark.parametrize('fps,size', [(25, (320, 240)), (30, (640, 360))])
+@pytest.mark.parametrize('codec,ext,source', CLIPS, ids=[f"{c}.{e}" for c, e, _ in CLIPS])
+def test_matches_cv2(tmp_path, codec, ext, source, fps, size):
+    path = str(tmp_path / f'clip.{ext}')
+    make_synthetic_video(path, *size, seconds=1.0, fps=fps, codec=codec)
+    metadata = read_video_metadata(path)
+    assert metadata['source'] == source
+    assert_matches_cv2(metadata, path)
+
+def test_truncated(clip, tmp_path):
+    """Half a file is rejected, or accepted with what cv2 itself reports for it"""
+    path, _ = clip
+    data = open(path, 'rb').read()
+    truncated = str(tmp_path / ('half.' + path.rsplit('.', 1)[1]))
+    with open(truncated, 'wb') as f:
+        f.write(data[:len(data) // 2])
+
+    if cv2_info(truncated) is None:
+        with pytest.raises(InvalidVideo):
+            validate_video(truncated)
+    else:
+        assert_matches_cv2(validate_video(truncated), truncated)
+
+@pytest.mark.parametrize('size', [0, 16, 64])
+def test_header_fragments_rejected(clip, tmp_path, size):
+    path, _ = clip
+    fragment = str(tmp_path / ('fragment.' + path.rsplit('.', 1)[1]))
+    with open(fragment, 'wb') as f:
+        f.write(open(path, 'rb').read()[:size])
+    with pytest.raises(InvalidVideo) as error:
+        validate_video(fragment)
+    assert error.value.reason == 'invalid'
+
+@pytest.mark.parametrize('head', [b'', b'\x00\x00\x00\x18ftypisom', b'\x1a\x45\xdf\xa3'],
+                         ids=['random', 'mp4-magic', 'ebml-magic'])
+def test_garbage_rejected(tmp_path, head):
+    path = str(tmp_path / 'garbage.mp4')
+    with open(path, 'wb') as f:
+        f.write(head + np.random.default_rng(0).bytes(50_000))
+    with pytest.raises(InvalidVideo):
+        validate_video(path)
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+def test_version1_boxes_with_moov_first(tmp_path):
+    """64-bit tkhd/mdhd (version 1) and a moov before mdat, as ffmpeg -movflags faststart writes"""
+    frames, timescale, width, height = 300, 30000, 1280, 720
+    tkhd = b'\x01\x00\x00\x00' + bytes(32) + bytes(8) + bytes(8) + bytes(36) + struct.pack('>II', width << 16, height << 16)
+    mdhd = b'\x01\x00\x00\x00' + bytes(16) + struct.pack('>IQ', timescale, frames * 1001) + bytes(4)
+    hdlr = bytes(8) + b'vide' + bytes(12) + b'\x00'
+    entry = b'avc1' + bytes(6) + struct.pack('>H', 1) + bytes(16) + struct.pack('>HH', width, height) + bytes(50)
+    stsd = bytes(4) + struct.pack('>I', 1) + struct.pack('>I', 4 + len(entry)) + entry
+    stsz = bytes(4) + struct.pack('>II', 0, frames) + struct.pack(f'>{frames}I', *([100] * frames))
+    stbl = box(b'stbl', box(b'stsd', stsd) + box(b'stsz', stsz))
+    trak = box(b'trak', box(b'tkhd', tkhd) + box(b'mdia', box(b'mdhd', mdhd) + box(b'hdlr', hdlr)
+                                                     + box(b'minf', stbl)))
+    path = str(tmp_path / 'faststart.mp4')
+    with open(path, 'wb') as f:
+        f.write(box(b'ftyp', b'isom' + bytes(4)) + box(b'moov', trak) + box(b'mdat', bytes(frames * 100)))
+
+    metadata = read_video_metadata(path)
+    assert metadata['source'] == 'header'
+    assert metadata['codec'] == 'avc1'
+    assert (metadata['width'], metadata['height'], metadata['total_frames']) == (width, height, frames)
+    assert metadata['fps'] == pytest.approx(30000 / 1001)
+    assert metadata['duration'] == pytest.approx(frames * 1001 / timescale)
+
+def test_limits(clip):
+    path, _ = clip
+    with pytest.raises(InvalidVideo) as error:
+        validate_video(path, max_side=200)
+    assert error.value.reason == 'too_large'
+    with pytest.raises(InvalidVideo) as error:
+        validate_video(path, max_duration=0.5)
+    assert error.value.reason == 'too_large'
+    with pytest.raises(InvalidVideo) as error:
+        validate_video(path, max_bytes=1000)
+    assert error.value.reason == 'too_large'
+    assert validate_video(path)['total_frames'] > 0
@@ -0,0 +1,91 @@
+"""
+weights_io round trips and malformed files
+
+Run with: python -m pytest tests/test_weights_io.py (from backend/)
+"""
+
+import json
+import struct
+
+import pytest
+import torch
+
+from weights_io import load_weights, read_header, save_weights
+
+def sample_state_dict():
+    generator = torch.Generator().manual_seed(0)
+    return {
+        'f32': torch.randn(3, 5, generator=generator),
+        'f16': torch.randn(7, generator=generator).half(),
+        'bf16': torch.randn(2, 3, 4, generator=generator).bfloat16(),
+        'f64': torch.randn(2, generator=generator).double(),
+        'i64': torch.arange(5),
+        'i32': torch.arange(3, dtype=torch.int32),
+        'i16': torch.arange(3, dtype=torch.int16),
+        'i8': torch.arange(-2, 3, dtype=torch.int8),
+        'u8': torch.arange(9, dtype=torch.uint8),
+        'bool': torch.tensor([True, False, True]),
+        'scalar': torch.tensor(1.5),
+        'empty': torch.zeros(0, 4),
+        # Non-contiguous views are written as their values
+        'transposed': torch.randn(4, 3, generator=generator).t()
+    }
+
+def test_round_trip(tmp_path):
+    state_dict = sample_state_dict()
+    path = save_weights(state_dict, tmp_path / 'w.safetensors', metadata={'model_config': json.dumps({'depth': 2})})
+
+    loaded, metadata = load_weights(str(path))
+    assert metadata == {'model_config': '{"depth": 2}'}
+    assert list(loaded) == list(state_dict)
+    for name, tensor in state_dict.items():
+        assert loaded[name].dtype == tensor.dtype, name
+        assert loaded[name].shape == tensor.shape, name
+        assert torch.equal(loaded[name], tensor), name
+
+def test_tensor_data_is_aligned(tmp_path):
+    path = save_weights(sample_state_dict(), tmp_path / 'w.safetensors')
+    header, data_start = read_header(str(path))
+    assert data_start % 8 == 0
+    assert path.stat().st_size == data_start + max(info['data_offsets'][1] for name, info in header.items()
+                                                   if name != '__metadata__')
+
+def test_loaded_tensors_are_copy_on_write(tmp_path):
+    path = save_weights({'w': torch.ones(16)}, tmp_path / 'w.safetensors')
+    loaded, _ = load_weights(str(path))
+    loaded['w'].add_(1)
+    assert torch.equal(load_weights(str(path))[0]['w'], torch.ones(16))
+
+def test_load_state_dict_into_model(tmp_path):
+    model = torch.nn.Sequential(torch.nn.Linear(4, 3), torch.nn.LayerNorm(3))
+    path = save_weights(model.state_dict(), tmp_path / 'w.safetensors')
+    other = torch.nn.Sequential(torch.nn.Linear(4, 3), torch.nn.LayerNorm(3))
+    other.load_state_dict(load_weights(str(path))[0])
+    x = torch.randn(2, 4)
+    assert torch.equal(model(x), other(x))
+
+def test_save_rejects_unsupported_dtype(tmp_path):
+    with pytest.raises(ValueError, match='Unsupported dtype'):
+        save_weights({'c': torch.zeros(2, dtype=torch.complex64)}, tmp_path / 'w.safetensors')
+
+def write_raw(path, header, data: bytes):
+    header_bytes = json.dumps(header).encode()
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)) + header_bytes + data)
+    return str(path)
+
+@pytest.mark.parametrize('header,message', [
+    ({'w': {'dtype': 'F8_E4M3', 'shape': [4], 'data_offsets': [0, 4]}}, 'unsupported dtype'),
+    ({'w': {'dtype': 'F32', 'shape': [4], 'data_offsets': [0, 64]}}, 'outside the file'),
+    ({'w': {'dtype': 'F32', 'shape': [3], 'data_offsets': [0, 16]}}, 'bytes for shape')
+], ids=['unknown-dtype', 'out-of-bounds', 'shape-mismatch'])
+def test_malformed_header(tmp_path, header, message):
+    path = write_raw(tmp_path / 'bad.safetensors', header, bytes(16))
+    with pytest.raises(ValueError, match=message):
+        load_weights(path)
+
+def test_implausible_header_length(tmp_path):
+    path = tmp_path / 'bad.safetensors'
+    path.write_bytes(struct.pack('<Q', 1 << 40) + b'{}')
+    with pytest.raises(ValueError, match='implausible header length'):
+        load_weights(str(path))
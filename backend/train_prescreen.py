@@ -0,0 +1,165 @@
+"""
+Train the Pre-Screening Classifier
+
+Runs pipeline.extract_signals on every video of a train_vit.py-style
+dataset (<dir>/real/*.mp4, <dir>/fake/*.mp4) in a process pool, fits
+prescreen.Prescreener (logistic regression on the cheap signals) and saves
+it as JSON. Features are cached in an .npz next to the model so reruns
+with other settings skip the decoding.
+
+Usage:
+    python train_prescreen.py --train_dir data/train
+    python train_prescreen.py --train_dir data/train --output models/prescreen.json --l2 0.1
+    python evaluate_prescreen.py --val_dir data/val --model_path models/model_best.safetensors
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from prescreen import Prescreener, signal_features, FEATURE_NAMES
+from runtime_config import available_cores
+
+def list_videos(data_dir: str) -> List[Tuple[Path, int]]:
+    """(path, label) pairs; label 0 = real, 1 = fake (same layout as train_vit.py)"""
+    root = Path(data_dir)
+    videos = [(path, 0) for path in sorted((root / 'real').glob('*.mp4'))]
+    videos += [(path, 1) for path in sorted((root / 'fake').glob('*.mp4'))]
+    return videos
+
+def collect_features(data_dir: str, num_frames: int, workers: int, model=None) -> Dict:
+    """
+    Signal features (and optionally ViT scores) for every video in data_dir
+
+    Args:
+        data_dir: Dataset split directory
+        num_frames: Frames extracted per video, as in the API
+        workers: extract_signals processes
+        model: If given, each video is also scored by the ViT and timed
+
+    Returns:
+        Dict of arrays: paths, features (N, n_features), labels,
+        signal_seconds (extract_signals time), and with a model vit_fake
+        (ViT fake probability) and vit_seconds per video
+    """
+    from pipeline import extract_signals, init_decode_worker
+    from vit_model import predict_with_vit
+
+    videos = list_videos(data_dir)
+    print(f"Extracting signals from {len(videos)} video(s) in {data_dir}...")
+
+    rows = []
+    # spawn: forking a process that has torch's thread pools running is unsafe
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn'),
+                             initializer=init_decode_worker) as pool:
+        futures = {pool.submit(extract_signals, str(path), num_frames): (path, label) for path, label in videos}
+        for done, future in enumerate(as_completed(futures), 1):
+            path, label = futures[future]
+            try:
+                signals = future.result()
+            except Exception as e:
+                print(f"   ⚠ Skipping {path.name}: {e}")
+                continue
+
+            row = {'path': str(path), 'features': signal_features(signals), 'label': label,
+                   'signal_seconds': sum(signals['timings'].values())}
+            if model is not None:
+                start = time.perf_counter()
+                row['vit_fake'] = predict_with_vit(model, signals['face_crops'])['probabilities']['fake']
+                row['vit_seconds'] = time.perf_counter() - start
+            rows.append(row)
+
+            if done % 25 == 0:
+                print(f"   {done}/{len(videos)}")
+
+    if not rows:
+        raise ValueError(f"No usable videos in {data_dir}")
+
+    data = {
+        'paths': np.array([row['path'] for row in rows]),
+        'features': np.stack([row['features'] for row in rows]),
+        'labels': np.array([row['label'] for row in rows]),
+        'signal_seconds': np.array([row['signal_seconds'] for row in rows])
+    }
+    if model is not None:
+        data['vit_fake'] = np.array([row['vit_fake'] for row in rows])
+        data['vit_seconds'] = np.array([row['vit_seconds'] for row in rows])
+    return data
+
+def weights_key(model_path: Optional[str]) -> Optional[str]:
+    """Identifies a weights file version (path, mtime, size); None for random init, which never repeats"""
+    if not model_path or not os.path.exists(model_path):
+        return None
+    stat = os.stat(model_path)
+    return f"{Path(model_path).resolve()}@{stat.st_mtime_ns}:{stat.st_size}"
+
+def load_or_collect(cache_path: Path, data_dir: str, args, model=None, model_path: Optional[str] = None) -> Dict:
+    """
+    collect_features, cached in an .npz keyed on the settings that affect it
+
+    With a model, the key includes its weights file (model_path), so
+    vit_fake / vit_seconds are recollected when the checkpoint changes; a
+    randomly initialized model is never served from the cache.
+    """
+    vit = weights_key(model_path) if model is not None else 'no-vit'
+    key = f"{Path(data_dir).resolve()}|{args.num_frames}|{vit}|{','.join(FEATURE_NAMES)}"
+    if cache_path.exists() and not args.refresh and vit is not None:
+        cached = dict(np.load(cache_path, allow_pickle=False))
+        if str(cached.pop('key')) == key:
+            print(f"✓ Using cached features from {cache_path}")
+            return cached
+
+    data = collect_features(data_dir, args.num_frames, args.workers, model)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(cache_path, key=np.array(key), **data)
+    return data
+
+def main(args):
+    output = Path(args.output)
+    data = load_or_collect(output.with_name(output.stem + '_train_features.npz'), args.train_dir, args)
+
+    labels = data['labels']
+    print(f"Training on {len(labels)} video(s) ({int(labels.sum())} fake, {int((1 - labels).sum())} real)")
+    prescreener = Prescreener.fit(data['features'], labels, l2=args.l2, epochs=args.epochs)
+
+    p_fake = prescreener.predict_proba(data['features'])
+    accuracy = float(((p_fake >= 0.5) == labels).mean())
+    print(f"\nTrain accuracy: {accuracy:.2%}")
+    print("Standardized weights:")
+    for name, weight in sorted(zip(FEATURE_NAMES, prescreener.weights), key=lambda item: -abs(item[1])):
+        print(f"   {name:28s} {weight:+.3f}")
+
+    prescreener.save(str(output), metadata={
+        'train_dir': args.train_dir,
+        'videos': int(len(labels)),
+        'num_frames': args.num_frames,
+        'train_accuracy': round(accuracy, 4),
+        'l2': args.l2
+    })
+    print(f"\n✓ Pre-screener saved to {output}")
+    print(f"  Evaluate with: python evaluate_prescreen.py --prescreen {output} --val_dir <dir>")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the cheap-signal pre-screening classifier')
+    parser.add_argument('--train_dir', type=str, default='data/train',
+                        help='Training data directory (real/ and fake/ subdirectories)')
+    parser.add_argument('--output', type=str, default='models/prescreen.json',
+                        help='Where to save the model')
+    parser.add_argument('--num_frames', type=int, default=30,
+                        help='Frames extracted per video (match the API setting)')
+    parser.add_argument('--workers', type=int, default=max(1, len(available_cores()) - 1),
+                        help='extract_signals processes')
+    parser.add_argument('--l2', type=float, default=1e-2,
+                        help='L2 regularization strength')
+    parser.add_argument('--epochs', type=int, default=2000,
+                        help='Gradient descent iterations')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Ignore cached features')
+
+    main(parser.parse_args())
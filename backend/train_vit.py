@@ -22,15 +22,44 @@ data/
 
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel as DDP
 from torch.utils.data import Dataset, DataLoader
+from torch.utils.data.distributed import DistributedSampler
+from contextlib import nullcontext
 from pathlib import Path
 import numpy as np
 from tqdm import tqdm
 import argparse
+import json
+import os
+import time
 
-from vit_model import ViTDeepfakeDetector, get_vit_transform
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from vit_model import (
+    ViTDeepfakeDetector,
+    DEFAULT_MODEL_CONFIG,
+    load_vit_model,
+    model_config_metadata,
+    get_vit_transform,
+    autocast_context,
+    bf16_autocast_supported
+)
 from enhanced_processor import extract_frames_smart, detect_and_crop_faces
+from embedding_cache import (
+    build_embedding_cache,
+    cache_is_valid,
+    CachedEmbeddingDataset,
+    CachedFeatureHead,
+    freeze_for_head_training
+)
+from weights_io import save_weights, load_weights
 
 class DeepfakeVideoDataset(Dataset):
     """Dataset for loading deepfake videos"""
@@ -100,26 +129,134 @@ class DeepfakeVideoDataset(Dataset):
             dummy = torch.zeros(self.num_frames, 3, 224, 224)
             return dummy, label
 
-def train_epoch(model, dataloader, criterion, optimizer, device):
-    """Train for one epoch"""
+def setup_distributed(threads_per_proc: int = None):
+    """
+    Join the gloo process group when launched by torchrun
+    
+    torchrun sets RANK/WORLD_SIZE/MASTER_ADDR in the environment. Without
+    them (plain `python train_vit.py`) training stays single-process.
+    
+    Returns:
+        (rank, world_size)
+    """
+    world_size = int(os.environ.get('WORLD_SIZE', 1))
+    if world_size <= 1:
+        return 0, 1
+    
+    # torchrun defaults OMP_NUM_THREADS to 1; split the node's cores instead
+    local_world_size = int(os.environ.get('LOCAL_WORLD_SIZE', world_size))
+    torch.set_num_threads(threads_per_proc or max(1, (os.cpu_count() or 1) // local_world_size))
+    
+    dist.init_process_group(backend='gloo')
+    return dist.get_rank(), dist.get_world_size()
+
+def is_main_process() -> bool:
+    """True on rank 0 (or when not distributed)"""
+    return not dist.is_initialized() or dist.get_rank() == 0
+
+def print_main(*args, **kwargs):
+    """print() on rank 0 only"""
+    if is_main_process():
+        print(*args, **kwargs)
+
+def reduce_sums(*values):
+    """Sum scalar statistics across all ranks (no-op when not distributed)"""
+    if not dist.is_initialized():
+        return values
+    tensor = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tuple(tensor.tolist())
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB (0 if unavailable)"""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def distillation_loss(student_logits, teacher_logits, labels, alpha=0.5, temperature=4.0):
+    """
+    Knowledge-distillation loss (Hinton et al.)
+    
+    alpha * T^2 * KL(teacher || student) on temperature-softened
+    distributions plus (1 - alpha) * cross-entropy on the hard labels. The
+    T^2 factor keeps the soft-target gradients on the same scale as the
+    hard-label ones whatever the temperature.
+    """
+    soft_loss = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction='batchmean'
+    ) * temperature ** 2
+    hard_loss = F.cross_entropy(student_logits, labels)
+    return alpha * soft_loss + (1 - alpha) * hard_loss
+
+def train_epoch(model, dataloader, criterion, optimizer, device, use_bf16=False, accum_steps=1,
+                teacher=None, alpha=0.5, temperature=4.0):
+    """
+    Train for one epoch
+    
+    With use_bf16 the forward pass and loss run under bfloat16 autocast.
+    Parameters, gradients and optimizer state stay in fp32 (master weights),
+    so no loss scaling is needed.
+    
+    With accum_steps > 1 gradients from several micro-batches are summed
+    before each optimizer step, so the effective batch size is
+    batch_size * accum_steps while memory stays at one micro-batch. A short
+    final group is averaged over its own micro-batches.
+    
+    Under DDP, gradient all-reduce only runs on the micro-batch that steps
+    the optimizer, and the returned loss/accuracy are aggregated over ranks.
+    
+    With a teacher model the loss is distillation_loss against the teacher's
+    logits for the same sequences (alpha/temperature) instead of criterion.
+    
+    Returns:
+        avg_loss, accuracy and a perf dict with the mean optimizer step time
+        (seconds) and the peak RSS (MB)
+    """
     model.train()
     total_loss = 0
     correct = 0
     total = 0
+    step_times = []
+    
+    optimizer.zero_grad()
+    step_start = time.perf_counter()
+    # The last accumulation group is short when len(dataloader) isn't a multiple of accum_steps
+    num_batches = len(dataloader)
+    partial_start = num_batches - num_batches % accum_steps
     
-    pbar = tqdm(dataloader, desc='Training')
-    for sequences, labels in pbar:
+    pbar = tqdm(dataloader, desc='Training', disable=not is_main_process())
+    for batch_idx, (sequences, labels) in enumerate(pbar):
         sequences = sequences.to(device)
         labels = labels.to(device)
         
-        # Forward pass
-        optimizer.zero_grad()
-        logits = model(sequences)
-        loss = criterion(logits, labels)
+        step_now = (batch_idx + 1) % accum_steps == 0 or batch_idx + 1 == num_batches
+        group_size = accum_steps if batch_idx < partial_start else num_batches - partial_start
+        # Skip the DDP gradient all-reduce on accumulation-only micro-batches
+        sync_context = model.no_sync() if isinstance(model, DDP) and not step_now else nullcontext()
         
-        # Backward pass
-        loss.backward()
-        optimizer.step()
+        with sync_context:
+            # Forward pass
+            with autocast_context(device, enabled=use_bf16):
+                logits = model(sequences)
+                if teacher is not None:
+                    with torch.no_grad():
+                        teacher_logits = teacher(sequences)
+                    loss = distillation_loss(logits.float(), teacher_logits.float(), labels,
+                                             alpha=alpha, temperature=temperature)
+                else:
+                    loss = criterion(logits.float(), labels)
+            
+            # Backward pass (scaled so accumulated gradients average over the group's micro-batches)
+            (loss / group_size).backward()
+        
+        if step_now:
+            optimizer.step()
+            optimizer.zero_grad()
+            step_times.append(time.perf_counter() - step_start)
+            step_start = time.perf_counter()
         
         # Statistics
         total_loss += loss.item()
@@ -133,12 +270,17 @@ def train_epoch(model, dataloader, criterion, optimizer, device):
             'acc': f'{100 * correct / total:.2f}%'
         })
     
-    avg_loss = total_loss / len(dataloader)
+    total_loss, num_batches, correct, total = reduce_sums(total_loss, len(dataloader), correct, total)
+    avg_loss = total_loss / num_batches
     accuracy = 100 * correct / total
+    perf = {
+        'step_time': float(np.mean(step_times)) if step_times else 0.0,
+        'peak_rss_mb': peak_rss_mb()
+    }
     
-    return avg_loss, accuracy
+    return avg_loss, accuracy, perf
 
-def validate(model, dataloader, criterion, device):
+def validate(model, dataloader, criterion, device, use_bf16=False):
     """Validate the model"""
     model.eval()
     total_loss = 0
@@ -146,14 +288,15 @@ def validate(model, dataloader, criterion, device):
     total = 0
     
     with torch.no_grad():
-        pbar = tqdm(dataloader, desc='Validation')
+        pbar = tqdm(dataloader, desc='Validation', disable=not is_main_process())
         for sequences, labels in pbar:
             sequences = sequences.to(device)
             labels = labels.to(device)
             
             # Forward pass
-            logits = model(sequences)
-            loss = criterion(logits, labels)
+            with autocast_context(device, enabled=use_bf16):
+                logits = model(sequences)
+                loss = criterion(logits.float(), labels)
             
             # Statistics
             total_loss += loss.item()
@@ -166,20 +309,112 @@ def validate(model, dataloader, criterion, device):
                 'acc': f'{100 * correct / total:.2f}%'
             })
     
-    avg_loss = total_loss / len(dataloader)
+    total_loss, num_batches, correct, total = reduce_sums(total_loss, len(dataloader), correct, total)
+    avg_loss = total_loss / num_batches
     accuracy = 100 * correct / total
     
     return avg_loss, accuracy
 
+def cached_feature_loaders(args, model, train_dataset, val_dataset, device):
+    """
+    Build (or reuse) the embedding caches for both splits
+    
+    A cache is rebuilt when its meta (frames, source dir, encoder weights,
+    model config) no longer matches the current run.
+    
+    Returns:
+        (train_loader, val_loader) over cached features
+    """
+    # --head_only requires --init_from: a random encoder's features would
+    # match no later run
+    encoder = str(Path(args.init_from).resolve())
+    encoder_mtime = Path(args.init_from).stat().st_mtime
+    
+    loaders = []
+    for split, dataset, data_dir, shuffle in (
+        ('train', train_dataset, args.train_dir, True),
+        ('val', val_dataset, args.val_dir, False)
+    ):
+        cache_dir = Path(args.cache_dir) / split
+        meta = {
+            'source': str(Path(data_dir).resolve()),
+            'num_frames': args.num_frames,
+            'num_videos': len(dataset),
+            'encoder': encoder,
+            'encoder_mtime': encoder_mtime,
+            'model_config': model.config
+        }
+        if cache_is_valid(cache_dir, meta):
+            print(f"✓ Reusing embedding cache {cache_dir}")
+        else:
+            build_embedding_cache(
+                model, dataset, cache_dir, meta,
+                batch_size=args.batch_size,
+                num_workers=args.num_workers,
+                device=device
+            )
+        loaders.append(DataLoader(
+            CachedEmbeddingDataset(cache_dir),
+            batch_size=args.batch_size,
+            shuffle=shuffle
+        ))
+    
+    return tuple(loaders)
+
+def student_config(args, base=None):
+    """DEFAULT_MODEL_CONFIG, then `base` (e.g. an --init_from checkpoint's config), then the architecture flags that were given"""
+    overrides = {
+        'patch_size': args.patch_size,
+        'embed_dim': args.embed_dim,
+        'depth': args.depth,
+        'num_heads': args.num_heads
+    }
+    return {**DEFAULT_MODEL_CONFIG, **(base or {}), **{k: v for k, v in overrides.items() if v is not None}}
+
+def load_init_checkpoint(path):
+    """
+    State dict and saved model config (or None) of an --init_from checkpoint
+
+    `.safetensors` files are read with weights_io and copied out of the
+    mapping (the weights are trained in place); anything else goes through
+    torch.load, like load_vit_model.
+    """
+    if path.endswith('.safetensors'):
+        state_dict, metadata = load_weights(path)
+        config = json.loads(metadata['model_config']) if 'model_config' in metadata else None
+        return {name: tensor.clone() for name, tensor in state_dict.items()}, config
+    checkpoint = torch.load(path, map_location='cpu')
+    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+        return checkpoint['model_state_dict'], checkpoint.get('model_config')
+    return checkpoint, None
+
 def main(args):
     """Main training function"""
     
-    # Set device
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    print(f"Using device: {device}")
+    # Join the process group if launched with torchrun
+    rank, world_size = setup_distributed(args.threads_per_proc)
+    distributed = world_size > 1
+    if distributed and args.head_only:
+        raise SystemExit("--head_only runs in a single process; launch without torchrun")
+    if args.head_only and args.distill_from:
+        raise SystemExit("--distill_from trains the whole student; it can't be combined with --head_only")
+    if args.head_only and not args.init_from:
+        raise SystemExit("--head_only trains on a frozen encoder's features; pass the trained model with --init_from")
+    
+    # Set device (DDP over gloo is CPU-only here)
+    device = torch.device('cuda' if torch.cuda.is_available() and not distributed else 'cpu')
+    print_main(f"Using device: {device}")
+    if distributed:
+        print_main(f"Distributed training: {world_size} processes (gloo), "
+                   f"{torch.get_num_threads()} threads each")
+    if args.bf16:
+        if bf16_autocast_supported(device):
+            print_main("Using bfloat16 autocast (fp32 master weights)")
+        else:
+            print_main("⚠ bfloat16 autocast not supported on this device, training in fp32")
     
     # Create datasets
-    print("\nLoading datasets...")
+    print_main("\nLoading datasets...")
     train_dataset = DeepfakeVideoDataset(
         args.train_dir,
         num_frames=args.num_frames
@@ -189,36 +424,89 @@ def main(args):
         num_frames=args.num_frames
     )
     
-    # Create dataloaders
+    # Create dataloaders (each rank sees a disjoint shard when distributed)
+    train_sampler = DistributedSampler(train_dataset, shuffle=True) if distributed else None
+    val_sampler = DistributedSampler(val_dataset, shuffle=False) if distributed else None
     train_loader = DataLoader(
         train_dataset,
         batch_size=args.batch_size,
-        shuffle=True,
+        shuffle=train_sampler is None,
+        sampler=train_sampler,
         num_workers=args.num_workers
     )
     val_loader = DataLoader(
         val_dataset,
         batch_size=args.batch_size,
         shuffle=False,
+        sampler=val_sampler,
         num_workers=args.num_workers
     )
     
     # Create model
-    print("\nInitializing model...")
-    model = ViTDeepfakeDetector(
-        img_size=224,
-        patch_size=16,
-        embed_dim=384,
-        depth=6,
-        num_heads=6,
-        dropout=0.1
-    )
+    print_main("\nInitializing model...")
+    # The architecture of an --init_from checkpoint, unless flags override it
+    init_state, init_config = None, None
+    if args.init_from:
+        try:
+            init_state, init_config = load_init_checkpoint(args.init_from)
+        except Exception as e:
+            raise SystemExit(f"Could not load --init_from {args.init_from}: {e}")
+    config = student_config(args, base=init_config)
+    model = ViTDeepfakeDetector(**config, dropout=0.1)
     model = model.to(device)
+    num_tokens = (config['img_size'] // config['patch_size']) ** 2 + 1
+    print_main(f"Architecture: depth {config['depth']}, embed_dim {config['embed_dim']}, "
+               f"patch {config['patch_size']} ({num_tokens} tokens/frame), "
+               f"{sum(p.numel() for p in model.parameters()):,} parameters")
+    if init_state is not None:
+        try:
+            model.load_state_dict(init_state)
+        except RuntimeError as e:
+            raise SystemExit(f"--init_from {args.init_from} does not fit this architecture: {e}")
+        print_main(f"✓ Initialized weights from {args.init_from}")
+    if args.grad_checkpoint:
+        model.set_grad_checkpointing(True)
+        print_main("Activation checkpointing enabled for transformer blocks")
+    
+    # Frozen teacher for knowledge distillation
+    teacher = None
+    checkpoint_prefix = ''
+    if args.distill_from:
+        # strict: a bad path must not silently distill from random weights
+        try:
+            teacher = load_vit_model(args.distill_from, device=device, strict=True)
+        except Exception as e:
+            raise SystemExit(f"Could not load teacher from --distill_from {args.distill_from}: {e}")
+        for param in teacher.parameters():
+            param.requires_grad_(False)
+        checkpoint_prefix = 'student_'
+        print_main(f"Distilling from {args.distill_from} "
+                   f"({sum(p.numel() for p in teacher.parameters()):,} parameters), "
+                   f"alpha {args.alpha}, temperature {args.temperature}")
+    print_main(f"Effective batch size: {args.batch_size * args.accum_steps * world_size} "
+               f"({args.batch_size} x {args.accum_steps} accumulation steps x {world_size} processes)")
+    
+    # Unwrapped module for checkpointing
+    base_model = model
+    trainable_params = list(model.parameters())
+    
+    if args.head_only:
+        # Encode every video once with the frozen encoder, then train the
+        # head on cached features
+        train_loader, val_loader = cached_feature_loaders(
+            args, base_model, train_dataset, val_dataset, device
+        )
+        trainable_params = freeze_for_head_training(base_model)
+        model = CachedFeatureHead(base_model)
+        print_main(f"Head-only mode: training {sum(p.numel() for p in trainable_params):,} parameters")
+    
+    if distributed:
+        model = DDP(model)
     
     # Loss and optimizer
     criterion = nn.CrossEntropyLoss()
     optimizer = optim.AdamW(
-        model.parameters(),
+        trainable_params,
         lr=args.lr,
         weight_decay=args.weight_decay
     )
@@ -230,62 +518,87 @@ def main(args):
     )
     
     # Training loop
-    print(f"\nStarting training for {args.epochs} epochs...")
+    print_main(f"\nStarting training for {args.epochs} epochs...")
     best_val_acc = 0
     
     for epoch in range(args.epochs):
-        print(f"\n{'='*60}")
-        print(f"Epoch {epoch + 1}/{args.epochs}")
-        print(f"{'='*60}")
+        print_main(f"\n{'='*60}")
+        print_main(f"Epoch {epoch + 1}/{args.epochs}")
+        print_main(f"{'='*60}")
+        
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)
         
         # Train
-        train_loss, train_acc = train_epoch(
-            model, train_loader, criterion, optimizer, device
+        train_loss, train_acc, perf = train_epoch(
+            model, train_loader, criterion, optimizer, device,
+            use_bf16=args.bf16,
+            accum_steps=args.accum_steps,
+            teacher=teacher,
+            alpha=args.alpha,
+            temperature=args.temperature
         )
         
         # Validate
         val_loss, val_acc = validate(
-            model, val_loader, criterion, device
+            model, val_loader, criterion, device,
+            use_bf16=args.bf16
         )
         
         # Update learning rate
         scheduler.step()
         
         # Print results
-        print(f"\nResults:")
-        print(f"  Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%")
-        print(f"  Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%")
-        print(f"  Learning Rate: {scheduler.get_last_lr()[0]:.6f}")
+        print_main(f"\nResults:")
+        print_main(f"  Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%")
+        print_main(f"  Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%")
+        print_main(f"  Learning Rate: {scheduler.get_last_lr()[0]:.6f}")
+        print_main(f"  Step Time: {perf['step_time']:.2f}s, Peak RSS: {perf['peak_rss_mb']:.0f} MB")
+        
+        # Metrics are already aggregated, so every rank agrees on "best";
+        # only rank 0 writes checkpoints
+        if not is_main_process():
+            best_val_acc = max(best_val_acc, val_acc)
+            continue
         
         # Save best model
         if val_acc > best_val_acc:
             best_val_acc = val_acc
             checkpoint = {
                 'epoch': epoch,
-                'model_state_dict': model.state_dict(),
+                'model_state_dict': base_model.state_dict(),
+                'model_config': base_model.config,
                 'optimizer_state_dict': optimizer.state_dict(),
                 'val_acc': val_acc,
                 'val_loss': val_loss
             }
-            torch.save(checkpoint, 'models/model_best.pt')
+            torch.save(checkpoint, f'models/{checkpoint_prefix}model_best.pt')
+            # Inference-only copy that load_vit_model memory-maps
+            save_weights(base_model.state_dict(), f'models/{checkpoint_prefix}model_best.safetensors',
+                         metadata={'epoch': epoch, 'val_acc': val_acc, 'val_loss': val_loss,
+                                   **model_config_metadata(base_model)})
             print(f"  ✓ Saved best model (Val Acc: {val_acc:.2f}%)")
         
         # Save checkpoint
         if (epoch + 1) % args.save_every == 0:
             checkpoint = {
                 'epoch': epoch,
-                'model_state_dict': model.state_dict(),
+                'model_state_dict': base_model.state_dict(),
+                'model_config': base_model.config,
                 'optimizer_state_dict': optimizer.state_dict(),
                 'val_acc': val_acc,
                 'val_loss': val_loss
             }
-            torch.save(checkpoint, f'models/checkpoint_epoch_{epoch+1}.pt')
+            torch.save(checkpoint, f'models/{checkpoint_prefix}checkpoint_epoch_{epoch+1}.pt')
             print(f"  ✓ Saved checkpoint")
     
-    print(f"\n{'='*60}")
-    print(f"Training complete!")
-    print(f"Best validation accuracy: {best_val_acc:.2f}%")
-    print(f"{'='*60}")
+    print_main(f"\n{'='*60}")
+    print_main(f"Training complete!")
+    print_main(f"Best validation accuracy: {best_val_acc:.2f}%")
+    print_main(f"{'='*60}")
+    
+    if distributed:
+        dist.destroy_process_group()
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Train Vision Transformer for Deepfake Detection')
@@ -311,8 +624,43 @@ if __name__ == '__main__':
                         help='Number of data loading workers')
     parser.add_argument('--save_every', type=int, default=5,
                         help='Save checkpoint every N epochs')
+    parser.add_argument('--bf16', action='store_true',
+                        help='Use bfloat16 autocast for forward/loss (CPU or GPU)')
+    parser.add_argument('--accum_steps', type=int, default=1,
+                        help='Micro-batches to accumulate per optimizer step')
+    parser.add_argument('--grad_checkpoint', action='store_true',
+                        help='Recompute transformer block activations in backward to save memory')
+    parser.add_argument('--init_from', type=str, default=None,
+                        help='Checkpoint to initialize weights from (.pt or .safetensors; its architecture is used)')
+    parser.add_argument('--head_only', action='store_true',
+                        help='Cache frozen encoder features once and train only the temporal/fusion head (needs --init_from)')
+    parser.add_argument('--cache_dir', type=str, default='cache/embeddings',
+                        help='Embedding cache directory for --head_only')
+    parser.add_argument('--threads_per_proc', type=int, default=None,
+                        help='torch threads per process under torchrun (default: cores / processes)')
+    
+    # Architecture (defaults: vit_model.DEFAULT_MODEL_CONFIG)
+    parser.add_argument('--patch_size', type=int, default=None,
+                        help='Patch size (32 gives 50 tokens per frame instead of 197)')
+    parser.add_argument('--embed_dim', type=int, default=None,
+                        help='Embedding size')
+    parser.add_argument('--depth', type=int, default=None,
+                        help='Transformer blocks')
+    parser.add_argument('--num_heads', type=int, default=None,
+                        help='Attention heads (must divide embed_dim)')
+    
+    # Knowledge distillation
+    parser.add_argument('--distill_from', type=str, default=None,
+                        help='Teacher weights; trains the model above as a student '
+                             '(saved as models/student_model_best.*)')
+    parser.add_argument('--alpha', type=float, default=0.5,
+                        help='Weight of the soft teacher loss (1 - alpha on the hard labels)')
+    parser.add_argument('--temperature', type=float, default=4.0,
+                        help='Softmax temperature for the teacher/student distributions')
     
     args = parser.parse_args()
+    if args.accum_steps < 1:
+        parser.error(f"--accum_steps must be at least 1, got {args.accum_steps}")
     
     # Create models directory
     Path('models').mkdir(exist_ok=True)
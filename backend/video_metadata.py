@@ -0,0 +1,385 @@
+"""
+Container Header Metadata Without Opening a Decoder
+
+Reads frame count, fps, size, duration and codec straight from the
+container: the MP4/MOV box tree (moov -> trak -> mdhd/stsd/stsz) or the
+WebM/Matroska EBML header (Info and Tracks). Only the header boxes are
+read, so even a large upload costs a few small reads. mdat and Cluster
+payloads are skipped with a seek. Files the parsers can't handle fall
+back to the configured decoder's probe (cv2 by default). Examples are
+AVI, fragmented MP4, and browser-recorded WebM without a frame duration.
+
+validate_video runs on every /api/predict/ upload before any decode work,
+and smart_mock_prediction uses the same single read (including the hash of
+the file head it derives its verdict from) instead of two file opens.
+
+Environment:
+    UPLOAD_MAX_BYTES    - Largest accepted upload in bytes (default: 2 GB; 0 = no limit)
+    UPLOAD_MAX_DURATION - Longest accepted video in seconds (default: 3600; 0 = no limit)
+    UPLOAD_MAX_SIDE     - Largest accepted frame width/height in pixels (default: 7680; 0 = no limit)
+"""
+
+import hashlib
+import logging
+import os
+import struct
+from typing import BinaryIO, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(2 * 1024 ** 3)))
+UPLOAD_MAX_DURATION = float(os.getenv("UPLOAD_MAX_DURATION", "3600"))
+UPLOAD_MAX_SIDE = int(os.getenv("UPLOAD_MAX_SIDE", "7680"))
+
+# Bytes of the file head hashed for smart_mock_prediction's deterministic verdict
+HEAD_HASH_BYTES = 4096
+
+# Header boxes/elements larger than this are not read into memory
+# (a moov for an hour of 30 fps video is well under 1 MB)
+MAX_HEADER_BYTES = 64 * 1024 * 1024
+
+class InvalidVideo(ValueError):
+    """Upload rejected by validate_video; `reason` is 'invalid' or 'too_large'"""
+
+    def __init__(self, message: str, reason: str = 'invalid'):
+        super().__init__(message)
+        self.reason = reason
+
+# -- MP4 / MOV ---------------------------------------------------------------
+
+# Boxes whose payload is just more boxes, on the path to the ones we read
+_MP4_CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+# Top-level box types that identify an ISO BMFF / QuickTime file
+_MP4_TOP_LEVEL = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot'}
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Yield (type, payload start, payload end) for the boxes in data[start:end]"""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            return
+        yield box_type, offset + header, offset + size
+        offset += size
+
+def _read_moov(f: BinaryIO, file_size: int) -> Optional[bytes]:
+    """Payload of the top-level moov box, seeking over mdat and the rest"""
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size:
+            return None
+        if box_type == b'moov':
+            if size > MAX_HEADER_BYTES:
+                return None
+            f.seek(offset + header_size)
+            return f.read(size - header_size)
+        offset += size
+    return None
+
+def _parse_video_track(data: bytes, start: int, end: int) -> Optional[Dict]:
+    """Frame count, duration, size and codec of a trak box, or None if not video"""
+    track = {'handler': None, 'timescale': 0, 'duration': 0, 'frames': 0,
+             'width': 0, 'height': 0, 'codec': None}
+
+    def walk(box_start: int, box_end: int):
+        for box_type, payload, payload_end in _iter_boxes(data, box_start, box_end):
+            if box_type in _MP4_CONTAINERS:
+                walk(payload, payload_end)
+            elif box_type == b'tkhd':
+                # Presentation size (16.16 fixed point); used if stsd has none
+                offset = payload + (88 if data[payload] == 1 else 76)
+                if offset + 8 <= payload_end:
+                    width, height = struct.unpack_from('>II', data, offset)
+                    track['width'] = track['width'] or width >> 16
+                    track['height'] = track['height'] or height >> 16
+            elif box_type == b'mdhd':
+                if data[payload] == 1:
+                    track['timescale'], track['duration'] = struct.unpack_from('>IQ', data, payload + 20)
+                else:
+                    track['timescale'], track['duration'] = struct.unpack_from('>II', data, payload + 12)
+            elif box_type == b'hdlr':
+                # mdia's handler ('vide'); QuickTime adds a data handler
+                # ('alis') in minf after it
+                track['handler'] = track['handler'] or data[payload + 8:payload + 12]
+            elif box_type == b'stsd':
+                # First sample entry: codec FourCC and coded width/height
+                entry = payload + 8
+                if entry + 36 <= payload_end:
+                    track['codec'] = data[entry + 4:entry + 8].decode('latin-1').strip()
+                    track['width'], track['height'] = struct.unpack_from('>HH', data, entry + 32)
+            elif box_type in (b'stsz', b'stz2'):
+                track['frames'] = struct.unpack_from('>I', data, payload + 8)[0]
+
+    walk(start, end)
+    if track['handler'] != b'vide':
+        return None
+    return track
+
+def parse_mp4(f: BinaryIO, file_size: int) -> Optional[Dict]:
+    """Metadata of the first video track of an MP4/MOV file, or None"""
+    moov = _read_moov(f, file_size)
+    if moov is None:
+        return None
+    for box_type, start, end in _iter_boxes(moov):
+        if box_type != b'trak':
+            continue
+        track = _parse_video_track(moov, start, end)
+        # Fragmented MP4 keeps its samples in moof boxes: leave it to the fallback
+        if track is None or not track['frames'] or not track['timescale'] or not track['duration']:
+            continue
+        duration = track['duration'] / track['timescale']
+        return {
+            'container': 'mp4',
+            'codec': track['codec'],
+            'width': track['width'],
+            'height': track['height'],
+            'total_frames': track['frames'],
+            'fps': track['frames'] / duration,
+            'duration': duration
+        }
+    return None
+
+# -- WebM / Matroska (EBML) --------------------------------------------------
+
+_EBML_HEADER = 0x1A45DFA3
+_EBML_DOCTYPE = 0x4282
+_MKV_SEGMENT = 0x18538067
+_MKV_INFO = 0x1549A966
+_MKV_TIMECODE_SCALE = 0x2AD7B1
+_MKV_DURATION = 0x4489
+_MKV_TRACKS = 0x1654AE6B
+_MKV_TRACK_ENTRY = 0xAE
+_MKV_TRACK_TYPE = 0x83
+_MKV_CODEC_ID = 0x86
+_MKV_DEFAULT_DURATION = 0x23E383
+_MKV_VIDEO = 0xE0
+_MKV_PIXEL_WIDTH = 0xB0
+_MKV_PIXEL_HEIGHT = 0xBA
+_MKV_CLUSTER = 0x1F43B675
+
+def _read_vint(data: bytes, offset: int, keep_marker: bool):
+    """(value, length) of an EBML variable-length integer; value None if 'unknown' size"""
+    first = data[offset]
+    length = 1
+    while length <= 8 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 8 or offset + length > len(data):
+        raise ValueError("Bad EBML variable-length integer")
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    if not keep_marker and value == (1 << (7 * length)) - 1:
+        return None, length
+    return value, length
+
+def _read_element_header(data: bytes, offset: int):
+    """(element id, payload size or None, header length)"""
+    element_id, id_length = _read_vint(data, offset, keep_marker=True)
+    size, size_length = _read_vint(data, offset + id_length, keep_marker=False)
+    return element_id, size, id_length + size_length
+
+def _iter_elements(data: bytes, start: int, end: int):
+    offset = start
+    while offset < end:
+        element_id, size, header = _read_element_header(data, offset)
+        payload = offset + header
+        payload_end = end if size is None else min(payload + size, end)
+        yield element_id, payload, payload_end
+        offset = payload_end
+
+def _uint(data: bytes, start: int, end: int) -> int:
+    return int.from_bytes(data[start:end], 'big')
+
+def _float(data: bytes, start: int, end: int) -> float:
+    return struct.unpack('>f' if end - start == 4 else '>d', data[start:end])[0]
+
+def parse_webm(f: BinaryIO, file_size: int) -> Optional[Dict]:
+    """Metadata of the first video track of a WebM/MKV file, or None"""
+    f.seek(0)
+    head = f.read(64)
+    element_id, size, header = _read_element_header(head, 0)
+    if element_id != _EBML_HEADER or size is None:
+        return None
+    doc_type = 'matroska'
+    for child, start, end in _iter_elements(head, header, min(header + size, len(head))):
+        if child == _EBML_DOCTYPE:
+            doc_type = head[start:end].decode('latin-1').rstrip('\x00')
+
+    # Segment header, then walk its children with seeks until Info and Tracks are read
+    f.seek(header + size)
+    segment_head = f.read(12)
+    element_id, _, segment_header = _read_element_header(segment_head, 0)
+    if element_id != _MKV_SEGMENT:
+        return None
+    offset = header + size + segment_header
+
+    timecode_scale, duration, track = 1000000, None, None
+    while offset < file_size and (duration is None or track is None):
+        f.seek(offset)
+        element_head = f.read(12)
+        if len(element_head) < 2:
+            break
+        element_id, element_size, element_header = _read_element_header(element_head, 0)
+        if element_size is None or element_id == _MKV_CLUSTER:
+            # Media data starts here; Info and Tracks always come before it
+            break
+        payload = offset + element_header
+        if element_id in (_MKV_INFO, _MKV_TRACKS) and element_size <= MAX_HEADER_BYTES:
+            f.seek(payload)
+            data = f.read(element_size)
+            if element_id == _MKV_INFO:
+                for child, start, end in _iter_elements(data, 0, len(data)):
+                    if child == _MKV_TIMECODE_SCALE:
+                        timecode_scale = _uint(data, start, end)
+                    elif child == _MKV_DURATION:
+                        duration = _float(data, start, end)
+            else:
+                track = _first_video_track(data)
+        offset = payload + element_size
+
+    # Browser recordings often have no Duration/DefaultDuration: nothing to count frames from
+    if duration is None or track is None or not track.get('frame_ns'):
+        return None
+    seconds = duration * timecode_scale / 1e9
+    fps = 1e9 / track['frame_ns']
+    return {
+        'container': doc_type,
+        'codec': track.get('codec'),
+        'width': track.get('width', 0),
+        'height': track.get('height', 0),
+        'total_frames': int(round(seconds * fps)),
+        'fps': fps,
+        'duration': seconds
+    }
+
+def _first_video_track(data: bytes) -> Optional[Dict]:
+    for element_id, start, end in _iter_elements(data, 0, len(data)):
+        if element_id != _MKV_TRACK_ENTRY:
+            continue
+        track, track_type = {}, None
+        for child, child_start, child_end in _iter_elements(data, start, end):
+            if child == _MKV_TRACK_TYPE:
+                track_type = _uint(data, child_start, child_end)
+            elif child == _MKV_CODEC_ID:
+                track['codec'] = data[child_start:child_end].decode('latin-1').rstrip('\x00')
+            elif child == _MKV_DEFAULT_DURATION:
+                track['frame_ns'] = _uint(data, child_start, child_end)
+            elif child == _MKV_VIDEO:
+                for video_child, video_start, video_end in _iter_elements(data, child_start, child_end):
+                    if video_child == _MKV_PIXEL_WIDTH:
+                        track['width'] = _uint(data, video_start, video_end)
+                    elif video_child == _MKV_PIXEL_HEIGHT:
+                        track['height'] = _uint(data, video_start, video_end)
+        if track_type == 1:
+            return track
+    return None
+
+# -- Entry points ------------------------------------------------------------
+
+def read_video_metadata(video_path: str) -> Dict:
+    """
+    Container metadata of a video, from its header when possible
+
+    Args:
+        video_path: Path to video
+
+    Returns:
+        Dict with total_frames, fps, width, height, duration, codec,
+        container, bytes, head_sha256 (SHA-256 of the first HEAD_HASH_BYTES)
+        and source ('header', or the fallback decoder's name)
+
+    Raises:
+        ValueError: if neither the header parsers nor the decoder can read it
+    """
+    with open(video_path, 'rb') as f:
+        file_size = os.fstat(f.fileno()).st_size
+        head = f.read(HEAD_HASH_BYTES)
+        metadata = None
+        try:
+            if head[:4] == b'\x1a\x45\xdf\xa3':
+                metadata = parse_webm(f, file_size)
+            elif head[4:8] in _MP4_TOP_LEVEL:
+                metadata = parse_mp4(f, file_size)
+        except (ValueError, IndexError, struct.error) as e:
+            logger.debug("Header parse failed for %s: %s", video_path, e)
+            metadata = None
+
+    if metadata is not None:
+        metadata['source'] = 'header'
+    else:
+        # AVI, fragmented MP4, live WebM, ... : ask the decoder
+        from enhanced_processor import open_video
+
+        with open_video(video_path) as decoder:
+            info = decoder.probe()
+            name = decoder.name
+        fps = info['fps'] or 0.0
+        metadata = {
+            'container': os.path.splitext(video_path)[1].lstrip('.').lower() or None,
+            'codec': None,
+            'width': info['width'],
+            'height': info['height'],
+            'total_frames': info['total_frames'],
+            'fps': fps,
+            'duration': info['total_frames'] / fps if fps > 0 else 0.0,
+            'source': name
+        }
+
+    metadata['bytes'] = file_size
+    metadata['head_sha256'] = hashlib.sha256(head).hexdigest()
+    return metadata
+
+def validate_video(
+    video_path: str,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+    max_duration: float = UPLOAD_MAX_DURATION,
+    max_side: int = UPLOAD_MAX_SIDE
+) -> Dict:
+    """
+    Check an upload is a readable video within the size limits
+
+    Returns:
+        read_video_metadata's dict
+
+    Raises:
+        InvalidVideo: reason 'invalid' (unreadable, no frames) or 'too_large'
+    """
+    size = os.path.getsize(video_path)
+    if max_bytes and size > max_bytes:
+        raise InvalidVideo(f"Video is {size / 1e6:.0f} MB; the limit is {max_bytes / 1e6:.0f} MB", 'too_large')
+
+    try:
+        metadata = read_video_metadata(video_path)
+    except ValueError:
+        raise InvalidVideo("Could not read video")
+    if metadata['total_frames'] <= 0 or metadata['width'] <= 0 or metadata['height'] <= 0:
+        raise InvalidVideo("Video has no frames")
+
+    if max_duration and metadata['duration'] > max_duration:
+        raise InvalidVideo(f"Video is {metadata['duration']:.0f}s long; the limit is {max_duration:.0f}s", 'too_large')
+    if max_side and max(metadata['width'], metadata['height']) > max_side:
+        raise InvalidVideo(
+            f"Video is {metadata['width']}x{metadata['height']}; the limit is {max_side} pixels per side",
+            'too_large'
+        )
+    return metadata
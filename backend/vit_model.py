@@ -7,15 +7,34 @@ Unique Multi-Modal Architecture with:
 4. Attention Visualization for explainability
 """
 
+import json
+import os
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
+
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
-from torchvision import transforms
+from torch.utils.checkpoint import checkpoint
 import numpy as np
 from typing import Tuple, List, Dict
 import cv2
 from scipy import fftpack
 
+# Inference precision for predict_with_vit: "fp32" (default) or "bf16"
+VIT_PRECISION = os.getenv("VIT_PRECISION", "fp32").lower()
+
+# Early-exit (progressive) inference settings
+VIT_EARLY_EXIT = os.getenv("VIT_EARLY_EXIT", "false").lower() in ("1", "true", "yes")
+VIT_EARLY_EXIT_MARGIN = float(os.getenv("VIT_EARLY_EXIT_MARGIN", "0.5"))
+VIT_EARLY_EXIT_INITIAL = int(os.getenv("VIT_EARLY_EXIT_INITIAL", "4"))
+VIT_EARLY_EXIT_STEP = int(os.getenv("VIT_EARLY_EXIT_STEP", "4"))
+
+# Spatial token pruning (see ViTDeepfakeDetector.set_token_pruning); 1.0 disables
+VIT_TOKEN_KEEP_RATIO = float(os.getenv("VIT_TOKEN_KEEP_RATIO", "1.0"))
+VIT_TOKEN_PRUNE_AFTER = int(os.getenv("VIT_TOKEN_PRUNE_AFTER", "2"))
+VIT_TOKEN_PRUNE_MODE = os.getenv("VIT_TOKEN_PRUNE_MODE", "merge").lower()
+
 class PatchEmbedding(nn.Module):
     """Split image into patches and embed them"""
     def __init__(self, img_size=224, patch_size=16, in_channels=3, embed_dim=768):
@@ -111,6 +130,30 @@ class TemporalAttention(nn.Module):
         attn_out, attn_weights = self.attention(x, x, x)
         x = self.norm(x + attn_out)
         return x, attn_weights
+    
+    def project(self, x):
+        """Q/K/V in-projection of frame features (..., embed_dim) -> (..., 3 * embed_dim)"""
+        return F.linear(x, self.attention.in_proj_weight, self.attention.in_proj_bias)
+    
+    def attend(self, x, qkv):
+        """
+        Same result as forward(x), from Q/K/V projections computed earlier
+        
+        Args:
+            x: (B, T, embed_dim) frame features
+            qkv: (B, T, 3 * embed_dim) from project(x)
+        
+        Returns:
+            (B, T, embed_dim) features and (B, T, T) head-averaged attention weights
+        """
+        B, T, E = x.shape
+        heads = self.attention.num_heads
+        q, k, v = (t.reshape(B, T, heads, E // heads).transpose(1, 2) for t in qkv.chunk(3, dim=-1))
+        
+        weights = torch.softmax(q @ k.transpose(-2, -1) / (E // heads) ** 0.5, dim=-1)  # (B, heads, T, T)
+        attn_out = (weights @ v).transpose(1, 2).reshape(B, T, E)
+        attn_out = self.attention.out_proj(attn_out)
+        return self.norm(x + attn_out), weights.mean(dim=1)
 
 class FrequencyAnalyzer(nn.Module):
     """Analyze frequency domain for deepfake artifacts"""
@@ -166,6 +209,46 @@ class FrequencyAnalyzer(nn.Module):
         
         return freq_features
 
+class StreamState:
+    """
+    Ring buffer of per-frame features for incremental (streaming) inference
+    
+    Holds the spatial CLS embedding, frequency features and temporal-attention
+    Q/K/V projections of the last `window` frames of one stream. Temporal
+    attention has no positional encoding and the head mean-pools over time,
+    so slot order doesn't affect the logits: a new frame just overwrites the
+    oldest slot.
+    
+    Args:
+        window: Frames kept
+        embed_dim: Model embedding size
+        device: Device for the buffers
+    """
+    
+    def __init__(self, window: int = 20, embed_dim: int = 768, device=None):
+        self.window = window
+        self.frame_features = torch.zeros(window, embed_dim, device=device)
+        self.freq_features = torch.zeros(window, embed_dim, device=device)
+        self.qkv = torch.zeros(window, 3 * embed_dim, device=device)
+        self.count = 0
+        self.next_slot = 0
+        self.frames_seen = 0
+    
+    def write(self, frame_features, freq_features, qkv):
+        """Store k frames' features (k <= window), evicting the oldest"""
+        for i in range(frame_features.shape[0]):
+            self.frame_features[self.next_slot] = frame_features[i]
+            self.freq_features[self.next_slot] = freq_features[i]
+            self.qkv[self.next_slot] = qkv[i]
+            self.next_slot = (self.next_slot + 1) % self.window
+            self.count = min(self.count + 1, self.window)
+            self.frames_seen += 1
+    
+    def reset(self):
+        self.count = 0
+        self.next_slot = 0
+        self.frames_seen = 0
+
 class ViTDeepfakeDetector(nn.Module):
     """
     Vision Transformer + Temporal Attention for Deepfake Detection
@@ -232,19 +315,107 @@ class ViTDeepfakeDetector(nn.Module):
             nn.Linear(256, num_classes)
         )
         
+        # Architecture, saved with the weights so load_vit_model can rebuild it
+        self.config = {
+            'img_size': img_size,
+            'patch_size': patch_size,
+            'embed_dim': embed_dim,
+            'depth': depth,
+            'num_heads': num_heads,
+            'mlp_ratio': mlp_ratio
+        }
+        
         # Initialize weights
         nn.init.trunc_normal_(self.pos_embed, std=0.02)
         nn.init.trunc_normal_(self.cls_token, std=0.02)
         
-    def forward(self, x, return_attention=False):
+        # Activation checkpointing for the spatial blocks (training only)
+        self.grad_checkpointing = False
+        
+        # Spatial token pruning (off by default)
+        self.token_keep_ratio = 1.0
+        self.token_prune_after = 2
+        self.token_prune_mode = 'merge'
+        
+    def set_grad_checkpointing(self, enabled: bool = True):
+        """
+        Recompute TransformerBlock activations during backward instead of
+        storing them for all T x depth blocks. Trades extra compute for a
+        much lower peak memory when training with many frames.
+        """
+        self.grad_checkpointing = enabled
+    
+    def set_token_pruning(self, keep_ratio: float = 1.0, prune_after: int = 2, mode: str = 'merge'):
+        """
+        Drop low-attention patch tokens after the early blocks
+        
+        After block `prune_after`, only the keep_ratio share of patch tokens
+        that receive the most attention from the CLS token (averaged over
+        heads) go through the remaining blocks, so their cost falls roughly
+        in proportion. Face crops carry 30% padding of background, which is
+        what the CLS token attends to least.
+        
+        Args:
+            keep_ratio: Share of patch tokens kept, in (0, 1]; 1.0 disables
+            prune_after: Number of blocks run on all tokens, in [1, depth)
+                  when pruning (0 or depth would never prune)
+            mode: "merge" folds the pruned tokens into one extra token
+                  (their CLS-attention-weighted mean, as in EViT);
+                  "drop" discards them
         """
+        if not 0.0 < keep_ratio <= 1.0:
+            raise ValueError(f"keep_ratio must be in (0, 1], got {keep_ratio}")
+        if keep_ratio < 1.0 and not 1 <= prune_after < len(self.blocks):
+            raise ValueError(f"prune_after must be in [1, {len(self.blocks)}) to prune a "
+                             f"{len(self.blocks)}-block model, got {prune_after}")
+        if mode not in ('merge', 'drop'):
+            raise ValueError(f"Unknown token pruning mode: {mode}")
+        self.token_keep_ratio = keep_ratio
+        self.token_prune_after = prune_after
+        self.token_prune_mode = mode
+    
+    def prune_tokens(self, x, attn):
+        """
+        Keep the most-attended patch tokens of x (see set_token_pruning)
+        
+        Args:
+            x: (B, 1 + N, embed_dim) CLS + patch tokens
+            attn: (B, heads, 1 + N, 1 + N) attention of the block that produced x
+        
+        Returns:
+            (B, 1 + k [+ 1], embed_dim) CLS, kept tokens [, merged token]
+        """
+        B, N, C = x.shape
+        num_keep = max(1, int(round((N - 1) * self.token_keep_ratio)))
+        if num_keep >= N - 1:
+            return x
+        
+        cls_attn = attn[:, :, 0, 1:].mean(dim=1)  # (B, N - 1)
+        order = cls_attn.argsort(dim=1, descending=True)
+        keep_idx = order[:, :num_keep].sort(dim=1).values
+        kept = x[:, 1:].gather(1, keep_idx.unsqueeze(-1).expand(-1, -1, C))
+        tokens = [x[:, :1], kept]
+        
+        if self.token_prune_mode == 'merge':
+            drop_idx = order[:, num_keep:]
+            dropped = x[:, 1:].gather(1, drop_idx.unsqueeze(-1).expand(-1, -1, C))
+            weights = cls_attn.gather(1, drop_idx)
+            weights = weights / weights.sum(dim=1, keepdim=True).clamp_min(1e-12)
+            tokens.append((dropped * weights.unsqueeze(-1)).sum(dim=1, keepdim=True))
+        
+        return torch.cat(tokens, dim=1)
+        
+    def encode_frames(self, x, return_attention=False):
+        """
+        Run each frame through the spatial ViT encoder
+        
         Args:
             x: (B, T, C, H, W) - Batch of video sequences
-            return_attention: Whether to return attention maps
+            return_attention: Whether to collect last-block attention maps
         
         Returns:
-            logits: (B, num_classes)
-            attention_maps: Dict of attention visualizations (if return_attention=True)
+            frame_features: (B, T, embed_dim) CLS embedding per frame
+            spatial_attentions: List of (B, heads, N, N) per frame (empty if not requested)
         """
         B, T, C, H, W = x.shape
         
@@ -267,10 +438,15 @@ class ViTDeepfakeDetector(nn.Module):
             patches = self.pos_drop(patches)
             
             # Transformer blocks
-            for block in self.blocks:
-                patches, attn = block(patches)
+            for i, block in enumerate(self.blocks):
+                if self.grad_checkpointing and self.training and torch.is_grad_enabled():
+                    patches, attn = checkpoint(block, patches, use_reentrant=False)
+                else:
+                    patches, attn = block(patches)
+                if self.token_keep_ratio < 1.0 and i + 1 == self.token_prune_after:
+                    patches = self.prune_tokens(patches, attn)
                 
-            # Store attention from last block
+            # Store attention from last block (over the kept tokens when pruning)
             if return_attention:
                 spatial_attentions.append(attn)
             
@@ -281,12 +457,27 @@ class ViTDeepfakeDetector(nn.Module):
         # Stack frame features
         frame_features = torch.stack(frame_features, dim=1)  # (B, T, embed_dim)
         
+        return frame_features, spatial_attentions
+    
+    def classify_features(self, frame_features, freq_features):
+        """
+        Temporal attention, fusion and classification head
+        
+        Args:
+            frame_features: (B, T, embed_dim) from encode_frames
+            freq_features: (B, T, embed_dim) from freq_analyzer
+        
+        Returns:
+            logits: (B, num_classes)
+            temporal_attn: (B, T, T) temporal attention weights
+        """
         # Temporal attention
         temporal_features, temporal_attn = self.temporal_attn(frame_features)
         
-        # Frequency analysis
-        freq_features = self.freq_analyzer(x)
-        
+        return self.fuse_and_classify(temporal_features, freq_features), temporal_attn
+    
+    def fuse_and_classify(self, temporal_features, freq_features):
+        """Fusion, average pooling over time and classification head -> (B, num_classes) logits"""
         # Fusion
         combined = torch.cat([temporal_features, freq_features], dim=-1)
         fused = self.fusion(combined)
@@ -296,7 +487,66 @@ class ViTDeepfakeDetector(nn.Module):
         
         # Classification
         pooled = self.norm(pooled)
-        logits = self.head(pooled)
+        return self.head(pooled)
+    
+    def encode_stream_frames(self, frames):
+        """
+        Per-frame features for incremental inference (see StreamState)
+        
+        Args:
+            frames: (k, C, H, W) new frames of one stream
+        
+        Returns:
+            frame_features, freq_features: (k, embed_dim); qkv: (k, 3 * embed_dim)
+        """
+        batch = frames.unsqueeze(0)
+        frame_features, _ = self.encode_frames(batch)
+        freq_features = self.freq_analyzer(batch)
+        return frame_features[0], freq_features[0], self.temporal_attn.project(frame_features[0])
+    
+    def classify_stream_state(self, state: StreamState):
+        """
+        Logits (1, num_classes) for the frames held in a StreamState
+        
+        Only the temporal attention scores (T x T), fusion and head run here;
+        the per-frame encoders and Q/K/V projections come from the cache.
+        """
+        n = state.count
+        frame_features = state.frame_features[:n].unsqueeze(0)
+        temporal_features, _ = self.temporal_attn.attend(frame_features, state.qkv[:n].unsqueeze(0))
+        return self.fuse_and_classify(temporal_features, state.freq_features[:n].unsqueeze(0))
+    
+    def init_stream_state(self, window: int = 20) -> StreamState:
+        """Empty StreamState sized and placed for this model"""
+        return StreamState(window, self.cls_token.shape[-1], device=self.cls_token.device)
+    
+    def stream_update(self, state: StreamState, frames):
+        """
+        Add new frames (k, C, H, W) to `state` and return logits for the window
+        
+        Equivalent to forward() on the last state.window frames, but only the
+        new frames are encoded: the cost per update grows with k, not the window.
+        """
+        features = self.encode_stream_frames(frames[-state.window:])
+        state.write(*features)
+        return self.classify_stream_state(state)
+        
+    def forward(self, x, return_attention=False):
+        """
+        Args:
+            x: (B, T, C, H, W) - Batch of video sequences
+            return_attention: Whether to return attention maps
+        
+        Returns:
+            logits: (B, num_classes)
+            attention_maps: Dict of attention visualizations (if return_attention=True)
+        """
+        frame_features, spatial_attentions = self.encode_frames(x, return_attention)
+        
+        # Frequency analysis
+        freq_features = self.freq_analyzer(x)
+        
+        logits, temporal_attn = self.classify_features(frame_features, freq_features)
         
         if return_attention:
             attention_maps = {
@@ -307,44 +557,139 @@ class ViTDeepfakeDetector(nn.Module):
         
         return logits
 
-def load_vit_model(model_path: str = None, device: str = None) -> ViTDeepfakeDetector:
-    """Load Vision Transformer model"""
+def load_vit_model(model_path: str = None, device: str = None, strict: bool = False) -> ViTDeepfakeDetector:
+    """
+    Load Vision Transformer model
+    
+    `.safetensors` files (see export_model.py) are memory-mapped and loaded
+    without unpickling; anything else goes through torch.load. The
+    architecture comes from the `model_config` saved with the weights
+    (e.g. a distilled student from train_vit.py --distill_from), falling
+    back to DEFAULT_MODEL_CONFIG for files written before it was recorded.
+    
+    Missing or unloadable weights fall back to random initialization with a
+    warning, unless strict is set: then they raise (FileNotFoundError, or
+    the loading error), for callers such as a distillation teacher where
+    random weights would silently ruin the run.
+    """
     if device is None:
         device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     
-    # Initialize model with smaller size for faster inference
-    model = ViTDeepfakeDetector(
-        img_size=224,
-        patch_size=16,
-        embed_dim=384,  # Smaller than standard ViT
-        depth=6,        # Fewer layers
-        num_heads=6,
-        dropout=0.1
-    )
+    if strict and not (model_path and os.path.exists(model_path)):
+        raise FileNotFoundError(f"Model weights not found: {model_path}")
     
-    # Try to load weights
+    if model_path and model_path.endswith('.safetensors') and os.path.exists(model_path):
+        return _load_mapped_model(model_path, device)
+    
+    checkpoint = None
     if model_path and os.path.exists(model_path):
         try:
             checkpoint = torch.load(model_path, map_location=device)
-            if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
-                model.load_state_dict(checkpoint['model_state_dict'])
-            else:
-                model.load_state_dict(checkpoint)
-            print(f"✓ Loaded ViT model from {model_path}")
         except Exception as e:
+            if strict:
+                raise
             print(f"⚠ Could not load weights: {e}")
             print("  Using pre-trained initialization")
     else:
         print("⚠ No model weights found. Using random initialization.")
         print("  Note: For production, train the model on deepfake datasets!")
     
+    # Initialize model
+    config = None
+    if isinstance(checkpoint, dict) and 'model_state_dict' in checkpoint:
+        config = checkpoint.get('model_config')
+        checkpoint = checkpoint['model_state_dict']
+    model = _build_model(config)
+    
+    if checkpoint is not None:
+        try:
+            model.load_state_dict(checkpoint)
+            print(f"✓ Loaded ViT model from {model_path}")
+        except Exception as e:
+            if strict:
+                raise
+            print(f"⚠ Could not load weights: {e}")
+            print("  Using pre-trained initialization")
+    
     model = model.to(device)
     model.eval()
     
     return model
 
+# Inference-size detector (smaller than a standard ViT)
+DEFAULT_MODEL_CONFIG = {
+    'img_size': 224,
+    'patch_size': 16,
+    'embed_dim': 384,  # Smaller than standard ViT
+    'depth': 6,        # Fewer layers
+    'num_heads': 6,
+    'mlp_ratio': 4.0
+}
+
+def _build_model(config: Dict = None) -> ViTDeepfakeDetector:
+    """
+    Detector with DEFAULT_MODEL_CONFIG, overridden by `config`, and the
+    VIT_TOKEN_* pruning settings
+    """
+    model = ViTDeepfakeDetector(**{**DEFAULT_MODEL_CONFIG, **(config or {})}, dropout=0.1)
+    model.set_token_pruning(VIT_TOKEN_KEEP_RATIO, VIT_TOKEN_PRUNE_AFTER, VIT_TOKEN_PRUNE_MODE)
+    return model
+
+def model_config_metadata(model: ViTDeepfakeDetector) -> Dict[str, str]:
+    """model.config as string metadata for weights_io.save_weights"""
+    return {'model_config': json.dumps(model.config)}
+
+_INIT_FUNCTIONS = (
+    'kaiming_uniform_', 'uniform_', 'normal_', 'trunc_normal_',
+    'xavier_uniform_', 'zeros_', 'ones_', 'constant_'
+)
+
+@contextmanager
+def _skip_weight_init():
+    """
+    Make torch.nn.init a no-op while modules are constructed
+    
+    Parameters stay uninitialized torch.empty buffers, which are never
+    touched (so never become resident) before being replaced. Cheaper than
+    building on the meta device, whose first use costs ~0.4s of setup.
+    Not thread-safe; only used while loading the model.
+    """
+    saved = {name: getattr(nn.init, name) for name in _INIT_FUNCTIONS}
+    for name in _INIT_FUNCTIONS:
+        setattr(nn.init, name, lambda tensor, *args, **kwargs: tensor)
+    try:
+        yield
+    finally:
+        for name, fn in saved.items():
+            setattr(nn.init, name, fn)
+
+def _load_mapped_model(model_path: str, device) -> ViTDeepfakeDetector:
+    """Build the model without random init and adopt memory-mapped weights as its parameters"""
+    from weights_io import load_weights
+    
+    state_dict, metadata = load_weights(model_path)
+    config = json.loads(metadata['model_config']) if 'model_config' in metadata else None
+    
+    with _skip_weight_init():
+        model = _build_model(config)
+    # strict (the default) guarantees every uninitialized parameter is replaced
+    model.load_state_dict(state_dict, assign=True)
+    print(f"✓ Mapped ViT weights from {model_path}")
+    
+    model = model.to(device)
+    model.eval()
+    return model
+
+@lru_cache(maxsize=None)
 def get_vit_transform():
-    """Get preprocessing transform for ViT"""
+    """Get preprocessing transform for ViT (built once)"""
+    # torchvision is imported here rather than at module level: it roughly
+    # doubles the import time of this module, and tools that never
+    # preprocess frames (export, benchmarks on random tensors) skip it.
+    # preprocess_faces needs it on every prediction, so the server builds it
+    # in load_ml_stack before reporting ready.
+    from torchvision import transforms
+
     return transforms.Compose([
         transforms.ToPILImage(),
         transforms.Resize((224, 224)),
@@ -355,36 +700,55 @@ def get_vit_transform():
         )
     ])
 
-def predict_with_vit(
-    model: ViTDeepfakeDetector,
-    face_images: List[np.ndarray],
-    device: str = None,
-    return_attention: bool = False
-) -> Dict:
+_BF16_SUPPORT = {}
+
+def bf16_autocast_supported(device=None) -> bool:
     """
-    Predict using Vision Transformer
-    
-    Args:
-        model: ViT model
-        face_images: List of face images
-        device: Device to run on
-        return_attention: Whether to return attention maps
+    Check whether bfloat16 autocast works on the given device
     
-    Returns:
-        Dictionary with prediction, confidence, and optional attention maps
+    Runs a tiny matmul under autocast once per device type and caches the
+    result, so unsupported CPUs/builds fall back to fp32 instead of failing.
     """
-    if device is None:
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    
-    if not face_images:
-        raise ValueError("No face images provided")
+    device_type = torch.device(device).type if device is not None else 'cpu'
+    if device_type not in _BF16_SUPPORT:
+        try:
+            with torch.autocast(device_type=device_type, dtype=torch.bfloat16):
+                probe = torch.ones(4, 4, device=device_type) @ torch.ones(4, 4, device=device_type)
+            _BF16_SUPPORT[device_type] = probe.dtype == torch.bfloat16
+        except Exception:
+            _BF16_SUPPORT[device_type] = False
+    return _BF16_SUPPORT[device_type]
+
+def autocast_context(device=None, enabled: bool = True):
+    """
+    Get a bfloat16 autocast context for the device
     
-    # Limit to 20 frames for efficiency
-    if len(face_images) > 20:
-        indices = np.linspace(0, len(face_images) - 1, 20, dtype=int)
+    Weights stay in fp32; autocast only lowers eligible ops (matmul, conv,
+    linear) to bf16 and keeps numerically sensitive ops in fp32. Returns a
+    no-op context when disabled or when bf16 is not supported.
+    """
+    if not enabled or not bf16_autocast_supported(device):
+        return nullcontext()
+    device_type = torch.device(device).type if device is not None else 'cpu'
+    return torch.autocast(device_type=device_type, dtype=torch.bfloat16)
+
+def sample_frames(face_images: List[np.ndarray], max_frames: int = 20) -> List[np.ndarray]:
+    """Uniformly subsample face images down to max_frames"""
+    if len(face_images) > max_frames:
+        indices = np.linspace(0, len(face_images) - 1, max_frames, dtype=int)
         face_images = [face_images[i] for i in indices]
+    return face_images
+
+def preprocess_faces(face_images: List[np.ndarray]) -> torch.Tensor:
+    """
+    Convert face crops to a normalized tensor sequence
     
-    # Preprocess images
+    Args:
+        face_images: List of face images (RGB, grayscale or RGBA)
+    
+    Returns:
+        (T, C, H, W) tensor; unreadable images are skipped
+    """
     transform = get_vit_transform()
     processed_images = []
     
@@ -405,23 +769,31 @@ def predict_with_vit(
     if not processed_images:
         raise ValueError("Failed to process any images")
     
-    # Stack into batch
-    sequence = torch.stack(processed_images).unsqueeze(0)  # (1, T, C, H, W)
-    sequence = sequence.to(device)
+    return torch.stack(processed_images)
+
+def run_with_precision(fn, device=None, precision: str = None):
+    """
+    Call fn() under bf16 autocast when requested
     
-    # Run inference
-    with torch.no_grad():
-        if return_attention:
-            logits, attention_maps = model(sequence, return_attention=True)
-        else:
-            logits = model(sequence)
-            attention_maps = None
-        
-        probabilities = torch.softmax(logits, dim=1)
-        prediction = torch.argmax(probabilities, dim=1).item()
-        confidence = probabilities[0, prediction].item()
+    Retries in fp32 if a kernel has no bf16 implementation on this CPU.
+    """
+    use_bf16 = (precision or VIT_PRECISION) == 'bf16'
+    try:
+        with autocast_context(device, enabled=use_bf16):
+            return fn()
+    except RuntimeError as e:
+        if not use_bf16:
+            raise
+        print(f"⚠ bf16 inference failed ({e}), falling back to fp32")
+        return fn()
+
+def _result_from_logits(logits: torch.Tensor) -> Dict:
+    """Prediction dict for a single-sequence batch of logits"""
+    probabilities = torch.softmax(logits.float(), dim=1)
+    prediction = torch.argmax(probabilities, dim=1).item()
+    confidence = probabilities[0, prediction].item()
     
-    result = {
+    return {
         'prediction': prediction,
         'confidence': confidence,
         'probabilities': {
@@ -429,10 +801,252 @@ def predict_with_vit(
             'fake': probabilities[0, 1].item()
         }
     }
+
+def predict_with_vit(
+    model: ViTDeepfakeDetector,
+    face_images: List[np.ndarray],
+    device: str = None,
+    return_attention: bool = False,
+    precision: str = None
+) -> Dict:
+    """
+    Predict using Vision Transformer
+    
+    Args:
+        model: ViT model
+        face_images: List of face images
+        device: Device to run on
+        return_attention: Whether to return attention maps
+        precision: "fp32" or "bf16" (defaults to VIT_PRECISION env var)
+    
+    Returns:
+        Dictionary with prediction, confidence, frames_used, and optional attention maps
+    """
+    if device is None:
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    
+    if not face_images:
+        raise ValueError("No face images provided")
+    
+    # Limit to 20 frames for efficiency
+    face_images = sample_frames(face_images, 20)
+    
+    # Stack into batch
+    sequence = preprocess_faces(face_images).unsqueeze(0)  # (1, T, C, H, W)
+    sequence = sequence.to(device)
+    
+    def run_model():
+        if return_attention:
+            return model(sequence, return_attention=True)
+        return model(sequence), None
+    
+    # Run inference
+    with torch.no_grad():
+        logits, attention_maps = run_with_precision(run_model, device, precision)
+    
+    result = _result_from_logits(logits)
+    result['frames_used'] = sequence.shape[1]
     
     if attention_maps:
         result['attention_maps'] = attention_maps
     
     return result
 
-import os
+def predict_with_vit_batch(
+    model: ViTDeepfakeDetector,
+    face_image_lists: List[List[np.ndarray]],
+    device: str = None,
+    precision: str = None,
+    batch_size: int = 8,
+    max_frames: int = 20
+) -> List[Dict]:
+    """
+    Score several videos with batched forward passes
+    
+    Sequences are bucketed by frame count (after sampling to max_frames) so
+    each forward pass stacks videos of equal length without padding; results
+    match predict_with_vit on each video individually.
+    
+    Args:
+        model: ViT model
+        face_image_lists: One list of face crops per video (each non-empty)
+        device: Device to run on
+        precision: "fp32" or "bf16" (defaults to VIT_PRECISION env var)
+        batch_size: Maximum videos per forward pass
+        max_frames: Frames sampled per video
+    
+    Returns:
+        One prediction dict per video, in input order
+    """
+    if device is None:
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    
+    sequences = [preprocess_faces(sample_frames(faces, max_frames)) for faces in face_image_lists]
+    
+    buckets = {}
+    for index, sequence in enumerate(sequences):
+        buckets.setdefault(sequence.shape[0], []).append(index)
+    
+    results = [None] * len(sequences)
+    for num_frames, indices in buckets.items():
+        for start in range(0, len(indices), batch_size):
+            chunk = indices[start:start + batch_size]
+            batch = torch.stack([sequences[i] for i in chunk]).to(device)
+            with torch.no_grad():
+                logits = run_with_precision(lambda: model(batch), device, precision)
+            for row, index in enumerate(chunk):
+                result = _result_from_logits(logits[row:row + 1])
+                result['frames_used'] = num_frames
+                results[index] = result
+    
+    return results
+
+def predict_with_vit_incremental(
+    model: ViTDeepfakeDetector,
+    state: StreamState,
+    face_images: List[np.ndarray],
+    device: str = None,
+    precision: str = None
+) -> Dict:
+    """
+    Add new face crops to a stream's StreamState and score its window
+    
+    Only the new crops go through the spatial encoder and frequency
+    analyzer; frames already in the state are reused.
+    
+    Args:
+        model: ViT model
+        state: Per-stream feature buffer from model.init_stream_state()
+        face_images: Face crops added since the last call (may be empty)
+        device: Device to run on
+        precision: "fp32" or "bf16" (defaults to VIT_PRECISION env var)
+    
+    Returns:
+        Same keys as predict_with_vit plus frames_encoded (new frames this call)
+    """
+    if device is None:
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    
+    face_images = face_images[-state.window:]
+    with torch.no_grad():
+        if face_images:
+            frames = preprocess_faces(face_images).to(device)
+            # Encode and classify separately so a bf16 retry never writes twice
+            features = run_with_precision(lambda: model.encode_stream_frames(frames), device, precision)
+            state.write(*(f.float() for f in features))
+        if state.count == 0:
+            raise ValueError("No face images provided")
+        logits = run_with_precision(lambda: model.classify_stream_state(state), device, precision)
+    
+    result = _result_from_logits(logits)
+    result['frames_used'] = state.count
+    result['frames_encoded'] = len(face_images)
+    return result
+
+def progressive_order(num_frames: int, initial_frames: int) -> List[int]:
+    """
+    Order frame indices coarse-to-fine
+    
+    The first initial_frames entries are spread uniformly over the clip;
+    later entries fill the largest remaining gaps, so every prefix of the
+    order is a roughly uniform temporal subsample.
+    """
+    order = list(dict.fromkeys(np.linspace(0, num_frames - 1, min(initial_frames, num_frames), dtype=int).tolist()))
+    chosen = set(order)
+    
+    while len(order) < num_frames:
+        # Midpoint of the widest gap between already chosen frames (frame 0
+        # is always chosen; num_frames acts as the right sentinel)
+        points = sorted(chosen) + [num_frames]
+        _, left, right = max((b - a, a, b) for a, b in zip(points, points[1:]) if b - a > 1)
+        idx = (left + right) // 2
+        order.append(idx)
+        chosen.add(idx)
+    
+    return order
+
+def predict_with_vit_progressive(
+    model: ViTDeepfakeDetector,
+    face_images: List[np.ndarray],
+    device: str = None,
+    margin_threshold: float = None,
+    initial_frames: int = None,
+    step_frames: int = None,
+    max_frames: int = 20,
+    precision: str = None
+) -> Dict:
+    """
+    Early-exit prediction over growing frame subsets
+    
+    Scores a small, evenly spread subset of the face crops first and stops
+    as soon as the softmax margin |p_fake - p_real| reaches margin_threshold.
+    Otherwise more frames are added. Spatial and frequency features are
+    cached per frame, so each round only encodes the newly added frames;
+    only the (cheap) temporal attention and head are re-run.
+    
+    Args:
+        model: ViT model
+        face_images: List of face images
+        device: Device to run on
+        margin_threshold: Softmax margin to stop at (default VIT_EARLY_EXIT_MARGIN)
+        initial_frames: Frames in the first round (default VIT_EARLY_EXIT_INITIAL)
+        step_frames: Frames added per round (default VIT_EARLY_EXIT_STEP)
+        max_frames: Upper bound, same as predict_with_vit
+        precision: "fp32" or "bf16" (defaults to VIT_PRECISION env var)
+    
+    Returns:
+        Same keys as predict_with_vit plus frames_available, early_exit,
+        margin and cache_hits (frame features reused across rounds)
+    """
+    if device is None:
+        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    if margin_threshold is None:
+        margin_threshold = VIT_EARLY_EXIT_MARGIN
+    initial_frames = initial_frames or VIT_EARLY_EXIT_INITIAL
+    step_frames = step_frames or VIT_EARLY_EXIT_STEP
+    
+    if not face_images:
+        raise ValueError("No face images provided")
+    
+    sequence = preprocess_faces(sample_frames(face_images, max_frames)).to(device)  # (T, C, H, W)
+    num_frames = sequence.shape[0]
+    order = progressive_order(num_frames, initial_frames)
+    
+    # Per-frame feature cache: index -> (spatial CLS, frequency features)
+    cache = {}
+    cache_hits = 0
+    used = initial_frames
+    
+    with torch.no_grad():
+        while True:
+            selected = sorted(order[:min(used, num_frames)])
+            new = [i for i in selected if i not in cache]
+            cache_hits += len(selected) - len(new)
+            
+            if new:
+                batch = sequence[new].unsqueeze(0)  # (1, k, C, H, W)
+                frame_features, _ = run_with_precision(lambda: model.encode_frames(batch), device, precision)
+                freq_features = run_with_precision(lambda: model.freq_analyzer(batch), device, precision)
+                for j, idx in enumerate(new):
+                    cache[idx] = (frame_features[0, j], freq_features[0, j])
+            
+            frame_features = torch.stack([cache[i][0] for i in selected]).unsqueeze(0)
+            freq_features = torch.stack([cache[i][1] for i in selected]).unsqueeze(0)
+            logits, _ = run_with_precision(
+                lambda: model.classify_features(frame_features, freq_features), device, precision
+            )
+            
+            result = _result_from_logits(logits)
+            margin = abs(result['probabilities']['fake'] - result['probabilities']['real'])
+            
+            if margin >= margin_threshold or len(selected) >= num_frames:
+                break
+            used += step_frames
+    
+    result['frames_used'] = len(selected)
+    result['frames_available'] = num_frames
+    result['early_exit'] = len(selected) < num_frames
+    result['margin'] = margin
+    result['cache_hits'] = cache_hits
+    
+    return result
@@ -0,0 +1,129 @@
+"""
+Memory-Mapped Weight Files (safetensors layout)
+
+Inference-only weights are stored in the safetensors format so loading
+the model never unpickles anything:
+
+    [8 bytes]  little-endian u64 N = header length
+    [N bytes]  JSON header: {name: {"dtype", "shape", "data_offsets": [begin, end]},
+                             "__metadata__": {str: str}}
+    [rest]     raw little-endian tensor data, offsets relative to this point
+
+load_weights() maps the file copy-on-write and returns tensors that are
+views of the mapping. Pages are read from disk only when touched and are
+shared with every other process mapping the same file. Files written here
+can be read by the `safetensors` package and the other way round, but that
+package is not required.
+"""
+
+import json
+import struct
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import torch
+
+_DTYPES = {
+    torch.float32: 'F32',
+    torch.float16: 'F16',
+    torch.bfloat16: 'BF16',
+    torch.float64: 'F64',
+    torch.int64: 'I64',
+    torch.int32: 'I32',
+    torch.int16: 'I16',
+    torch.int8: 'I8',
+    torch.uint8: 'U8',
+    torch.bool: 'BOOL'
+}
+_TORCH_DTYPES = {name: dtype for dtype, name in _DTYPES.items()}
+
+# The data section starts on this boundary so every tensor view is aligned
+_ALIGNMENT = 8
+
+def save_weights(
+    state_dict: Dict[str, torch.Tensor],
+    path: str,
+    metadata: Optional[Dict[str, str]] = None
+) -> Path:
+    """
+    Write a state dict as a safetensors file
+
+    Args:
+        state_dict: Tensors to store (moved to CPU, made contiguous)
+        path: Output file
+        metadata: Optional string-to-string metadata stored in the header
+
+    Returns:
+        Path to the written file
+    """
+    header = {}
+    tensors = []
+    offset = 0
+    for name, tensor in state_dict.items():
+        tensor = tensor.detach().cpu().contiguous()
+        if tensor.dtype not in _DTYPES:
+            raise ValueError(f"Unsupported dtype {tensor.dtype} for {name}")
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {
+            'dtype': _DTYPES[tensor.dtype],
+            'shape': list(tensor.shape),
+            'data_offsets': [offset, offset + nbytes]
+        }
+        tensors.append(tensor)
+        offset += nbytes
+    if metadata:
+        header['__metadata__'] = {str(k): str(v) for k, v in metadata.items()}
+
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(8 + len(header_bytes)) % _ALIGNMENT)
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for tensor in tensors:
+            # Reinterpret as bytes so bfloat16 (which numpy lacks) works too
+            f.write(tensor.view(-1).view(torch.uint8).numpy().tobytes())
+    tmp_path.replace(path)
+    return path
+
+def read_header(path: str) -> Tuple[Dict, int]:
+    """Parse the JSON header; returns (header, byte offset of the data section)"""
+    with open(path, 'rb') as f:
+        (header_len,) = struct.unpack('<Q', f.read(8))
+        if header_len > 100 * 1024 * 1024:
+            raise ValueError(f"{path}: implausible header length {header_len}")
+        header = json.loads(f.read(header_len))
+    return header, 8 + header_len
+
+def load_weights(path: str) -> Tuple[Dict[str, torch.Tensor], Dict[str, str]]:
+    """
+    Map a safetensors file without reading or unpickling it
+
+    Returns:
+        (state_dict of CPU tensors backed by the mapping, metadata dict)
+    """
+    header, data_start = read_header(path)
+    metadata = header.pop('__metadata__', {})
+
+    # Copy-on-write: writable views (torch warns on read-only numpy arrays)
+    # whose pages stay shared with the file unless something writes to them
+    data = np.memmap(path, dtype=np.uint8, mode='c', offset=data_start)
+
+    state_dict = {}
+    for name, info in header.items():
+        begin, end = info['data_offsets']
+        if not 0 <= begin <= end <= len(data):
+            raise ValueError(f"{path}: tensor {name} lies outside the file")
+        if info['dtype'] not in _TORCH_DTYPES:
+            raise ValueError(f"{path}: unsupported dtype {info['dtype']} for {name}")
+        dtype = _TORCH_DTYPES[info['dtype']]
+        if end - begin != int(np.prod(info['shape'])) * dtype.itemsize:
+            raise ValueError(f"{path}: tensor {name} has {end - begin} bytes for shape {info['shape']}")
+        raw = torch.from_numpy(data[begin:end])
+        state_dict[name] = raw.view(dtype).reshape(info['shape'])
+
+    return state_dict, metadata
@@ -11,6 +11,17 @@ const nextConfig = {
       },
     ],
   },
+  // Face previews are linked as /api/previews/... paths (backend/previews.py);
+  // proxy them to the backend like app/api/predict/route.ts does for predictions
+  async rewrites() {
+    const backendUrl = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000'
+    return [
+      {
+        source: '/api/previews/:path*',
+        destination: `${backendUrl}/api/previews/:path*`,
+      },
+    ]
+  },
 }
 
 module.exports = nextConfig